@@ -1,34 +1,41 @@
 import os
 import json
-from io import BytesIO
+from collections import deque
 from datetime import date, timedelta, datetime
 
 import pandas as pd
 import streamlit as st
 
-# PDF
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.units import mm
-from reportlab.pdfgen import canvas
-from reportlab.lib.colors import HexColor
-
-# PNG
-import matplotlib.pyplot as plt
-
-# Google Sheets
-import gspread
-from google.oauth2.service_account import Credentials
+# reportlab (PDF), matplotlib (PNG), openpyxl (Excel) and gspread/google-auth (Sheets)
+# are imported inside the functions that use them, so a cold start doesn't pay for them.
+# PNG (matplotlib is only imported if png_renderer = "matplotlib")
+from png_render import RENDERERS as PNG_RENDERERS
+import pdf_render
 
 #whats app
 import urllib.parse
-import webbrowser
-
-from google.oauth2.service_account import Credentials
-import streamlit as st
-import gspread
 
 import calendar
-from datetime import date
+
+from storage import (
+    StorageBackend, SheetsBackend, SQLiteBackend, copy_all, SCHEMA_VERSION,
+    summary_headers, ledger_log_headers, settings_payload,
+    SETTINGS_VERSION_KEY, ITEM_KINDS, migrate_items, rebuild_rollups, month_key, posting_entries,
+)
+from sync import Outbox, SyncWorker, WriteBehindBackend, sheets_handlers
+from offline import Mirror, versioned_handlers, same_cell, pull as pull_mirror, resolve as resolve_conflict
+from ledger import LedgerProjection, Statement
+from ledger_import import BULK_COLUMNS, validate_bulk_transactions, fold_batch, ledger_frame, post_batch
+from archive import SummaryArchive
+from render_cache import RenderCache
+from settings_cache import SettingsCache
+from month_cache import MonthCache
+from sheets_io import Counted, RateLimiter, WorksheetCache, action as sheets_action, STATS as SHEETS_STATS
+from diagnostics import import_profile, loaded_lazy_modules
+from profiling import begin as profile_begin, end as profile_end, timed, op_table, to_jsonl
+from reports import (
+    explode_details, items_frames, financial_year, fy_bounds, quarter_bounds, month_spans, range_table,
+)
 
 
 # =========================
@@ -38,21 +45,66 @@ st.set_page_config(page_title="HP Bunk Daily Calculator", layout="wide")
 
 GSHEET_ID = "1zW5y3xMNCFd5cvbaIy7VKkOD3aUDtAHbEXNytqWNYTE"
 
-SUMMARY_SHEET = "Summary"
-SETTINGS_SHEET = "Settings"
-LEDGER_SHEET = "Ledger"
-LEDGER_LOG_SHEET = "Ledger_Log"
-
 DATA_DIR = "hp_bunk_data"
-EXCEL_FILE = os.path.join(DATA_DIR, "hp_bunk_daily.xlsx")
+EXCEL_FILE = os.path.join(DATA_DIR, "hp_bunk_daily.xlsx")   # legacy; imported into ARCHIVE_DIR once
+ARCHIVE_DIR = os.path.join(DATA_DIR, "summary")
+RENDER_CACHE_DIR = os.path.join(DATA_DIR, "render_cache")
+SQLITE_FILE = os.path.join(DATA_DIR, "hp_bunk.sqlite3")
+OUTBOX_FILE = os.path.join(DATA_DIR, "outbox.sqlite3")   # older standalone outbox, moved into SQLITE_FILE
+MIRROR_FILE = os.path.join(DATA_DIR, "mirror_state.sqlite3")
+SHEETS_INDEX_DIR = os.path.join(DATA_DIR, f"index_{GSHEET_ID}")
 os.makedirs(DATA_DIR, exist_ok=True)
 
 
+def _cfg(key: str, default: str) -> str:
+    """App config: env var HP_<KEY> wins, then [app] in secrets.toml, then the default."""
+    env = os.environ.get(f"HP_{key.upper()}")
+    if env:
+        return env
+    try:
+        return str(st.secrets.get("app", {}).get(key, default))
+    except Exception:
+        return default
+
+
+# "sheets" = Google Sheets is the primary store, "sqlite" = local indexed file (hp_bunk_data/)
+STORAGE_BACKEND = _cfg("storage_backend", "sheets").strip().lower()
+# with "sqlite": also push every write to Google Sheets from a background outbox worker
+SYNC_TO_SHEETS = _cfg("sync_to_sheets", "0").strip().lower() in ("1", "true", "yes")
+# read from / write to a local mirror of the sheet; Google is synced in the background when reachable
+OFFLINE_FIRST = _cfg("offline_first", "0").strip().lower() in ("1", "true", "yes")
+MIRROR_REFRESH = float(_cfg("mirror_refresh", "300"))
+# "incremental" = a transaction writes only that customer's row, "rewrite" = old clear + rewrite
+LEDGER_WRITES = _cfg("ledger_writes", "incremental").strip().lower()
+# claim Ledger rows (compare-and-swap on their Rev cell) before writing, so concurrent attendants can't lose updates
+LEDGER_CAS = _cfg("ledger_cas", "1").strip().lower() in ("1", "true", "yes")
+# "balances" = Ledger tab holds balances, "events" = balances are folded from Ledger_Log (+ snapshots)
+LEDGER_MODE = _cfg("ledger_mode", "balances").strip().lower()
+# "pillow" = fast direct drawing, "matplotlib" = the original figure (same layout)
+PNG_RENDERER = _cfg("png_renderer", "pillow").strip().lower()
+# seconds a session trusts the shared Settings before re-checking the version cell
+SETTINGS_TTL = float(_cfg("settings_ttl", "300"))
+MONTH_CACHE_TTL = float(_cfg("month_cache_ttl", "300"))
+LOG_PAGE_SIZE = int(_cfg("log_page_size", "500"))
+# post each Daily Entry's customer credit/collection lines to the ledger when it is saved
+AUTO_POST_LEDGER = _cfg("auto_post_ledger", "0").strip().lower() in ("1", "true", "yes")
+# client-side Sheets quota (Google's default is 60 reads and 60 writes per minute per user)
+SHEETS_READS_PER_MIN = float(_cfg("sheets_reads_per_min", "60"))
+SHEETS_WRITES_PER_MIN = float(_cfg("sheets_writes_per_min", "60"))
+# keep timing spans (Sheets calls, renders, archive writes) of this many reruns per session; 0 = off
+PROFILE_RERUNS = int(_cfg("profile_reruns", "0"))
+
+if PROFILE_RERUNS:
+    profile_begin(st.session_state.setdefault("_profile_runs", deque(maxlen=PROFILE_RERUNS)))
+
+
 # =========================
 # HELPERS
 # =========================
 
 def whatsapp_share(message: str):
+    import webbrowser
+
     text = urllib.parse.quote(message)
     url = f"https://wa.me/?text={text}"
     webbrowser.open_new_tab(url)
@@ -84,14 +136,6 @@ def parse_date(s: str) -> date:
     return date.fromisoformat(str(s)[:10])
 
 
-def col_letter(num: int) -> str:
-    s = ""
-    while num:
-        num, r = divmod(num - 1, 26)
-        s = chr(65 + r) + s
-    return s
-
-
 def safe_float_cell(v) -> float:
     try:
         if v is None:
@@ -118,27 +162,39 @@ def clean_rows(rows, key1: str, key2: str):
 # GOOGLE (connection cached, NOT data)
 # =========================
 @st.cache_resource
-def _open_spreadsheet():
+def get_rate_limiter() -> RateLimiter:
+    """Read/write token buckets shared by every session (and the sync worker)."""
+    return RateLimiter(SHEETS_READS_PER_MIN, SHEETS_WRITES_PER_MIN)
+
+
+@st.cache_resource
+def _connect_spreadsheet():
+    """Open the sheet or raise (failures aren't cached, so the next call tries again)."""
     scopes = [
         "https://www.googleapis.com/auth/spreadsheets",
         "https://www.googleapis.com/auth/drive",
     ]
 
     if "gcp_service_account" not in st.secrets:
-        st.error("❌ Missing Streamlit secret: [gcp_service_account].")
-        st.stop()
+        raise RuntimeError("Missing Streamlit secret: [gcp_service_account].")
 
-    try:
-        creds = Credentials.from_service_account_info(
-            st.secrets["gcp_service_account"],
-            scopes=scopes
-        )
-        client = gspread.authorize(creds)
-       
-        # Try opening sheet
-        sh = client.open_by_key(GSHEET_ID)
-        return sh
+    import gspread
+    from google.oauth2.service_account import Credentials
+
+    creds = Credentials.from_service_account_info(
+        st.secrets["gcp_service_account"],
+        scopes=scopes
+    )
+    client = gspread.authorize(creds)
 
+    # Try opening sheet; every API call made through it is counted per action and rate limited
+    sh = get_rate_limiter().call("fetch_sheet_metadata", client.open_by_key, GSHEET_ID)
+    return Counted(sh, limiter=get_rate_limiter())
+
+
+def _open_spreadsheet():
+    try:
+        return _connect_spreadsheet()
     except Exception as e:
         st.error("❌ Failed to open Google Sheet by key.")
         import traceback
@@ -165,33 +221,121 @@ def ensure_headers(ws, headers):
         ws.update("A1", [headers])
 
 
+@st.cache_resource
+def get_worksheet_cache() -> WorksheetCache:
+    """Worksheet handles + verified headers, shared by all sessions (see SCHEMA_VERSION)."""
+    return WorksheetCache(SCHEMA_VERSION)
+
+
 def safe_worksheet(sh, name: str, headers: list[str]):
     if sh is None:
         st.error("❌ Spreadsheet handle is None. Google auth/open_by_key failed.")
         st.stop()
 
-    try:
-        ws = sh.worksheet(name)
-    except Exception:
-        st.error(f"❌ Worksheet '{name}' not found.")
-        st.info(
-            f"Create a sheet tab named '{name}' manually and set row 1 headers:\n\n"
-            + ", ".join(headers)
-        )
-        st.stop()
+    def open_tab(tab):
+        try:
+            return sh.worksheet(tab)
+        except Exception:
+            st.error(f"❌ Worksheet '{name}' not found.")
+            st.info(
+                f"Create a sheet tab named '{name}' manually and set row 1 headers:\n\n"
+                + ", ".join(headers)
+            )
+            st.stop()
+
+    return get_worksheet_cache().get(name, headers, open_tab, ensure_headers)
 
-    ensure_headers(ws, headers)
-    return ws
+
+def _worker_worksheet(name: str, headers: list[str]):
+    """Worksheet opener for background threads: raise instead of st.stop()."""
+    sh = _connect_spreadsheet()
+    if sh is None:
+        raise RuntimeError("Google Sheet is not reachable")
+    return get_worksheet_cache().get(name, headers, sh.worksheet, ensure_headers)
+
+
+def sheets_backend(open_ws) -> SheetsBackend:
+    return SheetsBackend(open_ws, SHEETS_INDEX_DIR, forget_ws=get_worksheet_cache().forget, cas=LEDGER_CAS)
+
+
+@st.cache_resource
+def get_mirror() -> Mirror:
+    """Row versions / sync conflicts of the offline-first mirror."""
+    return Mirror(MIRROR_FILE)
+
+
+@st.cache_resource
+def get_backend() -> StorageBackend:
+    """Process-wide store selected by OFFLINE_FIRST / STORAGE_BACKEND / SYNC_TO_SHEETS."""
+    if STORAGE_BACKEND != "sqlite" and not OFFLINE_FIRST:
+        return sheets_backend(lambda name, headers: safe_worksheet(get_sh(), name, headers))
+
+    local = SQLiteBackend(SQLITE_FILE)
+    if not SYNC_TO_SHEETS and not OFFLINE_FIRST:
+        return local
+
+    remote = sheets_backend(_worker_worksheet)
+    if OFFLINE_FIRST:
+        mirror, month_cache = get_mirror(), get_month_cache()
+        handlers = versioned_handlers(remote, local, mirror)
+
+        def refresh_mirror(full: bool = False):
+            # "Refresh local copy now" re-reads everything, for edits made on Sheets by hand
+            if pull_mirror(remote, local, mirror, full=full)["summary"]:
+                month_cache.invalidate()
+    else:
+        handlers = sheets_handlers(remote)
+    # entries queued by older versions, before the archive was written inline
+    handlers["upsert_excel"] = lambda reports: [upsert_archive(r) for r in reports]
+    outbox = Outbox(OUTBOX_FILE, store=local)   # same database: a save and its outbox entry commit together
+    worker = SyncWorker(outbox, handlers, idle=refresh_mirror if OFFLINE_FIRST else None, idle_every=MIRROR_REFRESH)
+    worker.start()
+    backend = WriteBehindBackend(local, outbox, worker)
+    if OFFLINE_FIRST:
+        backend.name = f"{local.name} mirror ⇄ sheets (offline-first)"
+    return backend
+
+
+@st.cache_resource
+def get_ledger_projection() -> LedgerProjection:
+    """Process-wide event-sourced balances (LEDGER_MODE = "events")."""
+    return LedgerProjection(get_backend())
+
+
+def sync_status() -> dict | None:
+    """Outbox counts for the pending-sync indicator (None when write-behind is off)."""
+    backend = get_backend()
+    if not isinstance(backend, WriteBehindBackend):
+        return None
+    status = {**backend.pending(), "last_error": backend.outbox.last_error(), "last_sync": backend.worker.last_sync}
+    if OFFLINE_FIRST:
+        status.update(
+            online=not backend.worker.failures and not backend.worker.idle_error,
+            conflicts=get_mirror().counts(), last_pull=backend.worker.last_idle, pull_error=backend.worker.idle_error,
+        )
+    return status
+
+
+def conflict_diff(conflict: dict) -> pd.DataFrame:
+    """The fields a sync conflict disagrees on: local value vs Google's."""
+    if conflict["tab"] in ("Summary", "Ledger"):
+        headers = summary_headers() if conflict["tab"] == "Summary" else ["Customer", "Outstanding"]
+        mine = dict(zip(headers, conflict["local"] or []))
+        google = dict(zip(headers, conflict["remote"] or []))
+    else:   # Settings: [[Key, Value], ...]
+        mine, google = dict(conflict["local"] or []), dict(conflict["remote"] or [])
+    rows = [
+        {"Field": k, "Mine": str(mine.get(k, "")), "Google": str(google.get(k, ""))}
+        for k in dict.fromkeys(list(mine) + list(google))
+        if k != SETTINGS_VERSION_KEY and not same_cell(mine.get(k, ""), google.get(k, ""))
+    ]
+    return pd.DataFrame(rows, columns=["Field", "Mine", "Google"])
 
 
 # =========================
 # SETTINGS (NO PIN)
 # =========================
-def read_settings_from_google() -> dict:
-    sh = get_sh()
-    ws = safe_worksheet(sh, SETTINGS_SHEET, ["Key", "Value"])
-
-    rows = ws.get_all_records()
+def _parse_settings(rows: list[dict]) -> dict:
     d = {"employees": [], "customers": [], "expense_names": [], "oil_prices": []}
 
     for r in rows:
@@ -217,40 +361,43 @@ def read_settings_from_google() -> dict:
     return d
 
 
-def write_settings_to_google(settings: dict):
-    sh = get_sh()
-    ws = safe_worksheet(sh, SETTINGS_SHEET, ["Key", "Value"])
-
-    payload = [
-        ["employees", json.dumps(settings.get("employees", []), ensure_ascii=False)],
-        ["customers", json.dumps(settings.get("customers", []), ensure_ascii=False)],
-        ["expense_names", json.dumps(settings.get("expense_names", []), ensure_ascii=False)],
-        ["oil_prices", json.dumps(settings.get("oil_prices", []), ensure_ascii=False)],
-    ]
+@sheets_action("load_settings")
+def _load_settings():
+    rows = get_backend().read_settings()
+    version = next((str(r.get("Value") or "") for r in rows if r.get("Key") == SETTINGS_VERSION_KEY), "")
+    return _parse_settings(rows), (version or None)
+
+
+@st.cache_resource
+def get_settings_cache() -> SettingsCache:
+    return SettingsCache(_load_settings, lambda: get_backend().read_settings_version(), ttl=SETTINGS_TTL)
+
 
-    ws.clear()
-    ws.update("A1", [["Key", "Value"]])
-    ws.update("A2", payload)
+def get_settings(refresh: bool = False) -> dict:
+    """Settings shared by all sessions (one Sheets read per change / TTL, not per session)."""
+    cache = get_settings_cache()
+    if refresh:
+        cache.invalidate()
+    return cache.get()
+
+
+@sheets_action("save_settings")
+def write_settings_to_google(settings: dict):
+    payload = settings_payload(settings)
+    get_backend().write_settings(payload)
+    # every session picks this up on its next rerun; other processes via the version cell
+    get_settings_cache().put(settings, payload[0][1])
 
 
 # =========================
 # SUMMARY MODEL
 # =========================
-def summary_headers():
-    return [
-        "date",
-        "employee_name",
-        "notes",
-        "p_open", "p_close", "p_test", "p_rate",
-        "d_open", "d_close", "d_test", "d_rate",
-        "petrol_liters_sold", "petrol_amount",
-        "diesel_liters_sold", "diesel_amount",
-        "oil_packets", "oil_price", "oil_amount",
-        "qr_amount", "advance_paid", "owner_phonepay_amount", "yesterday_balance_amount",
-        "customer_credit_total", "debt_collections_total", "other_expenses_total",
-        "total_sales", "cash_to_deposit",
-        "details_json",
-    ]
+def day_items(report: dict) -> dict:
+    """Credit / collection / expense lines of a report -> kind -> [[name, amount], ...] for the item tables."""
+    return {
+        kind: [[r[name_col], r["Amount"]] for r in clean_rows(report.get(key, []), name_col, "Amount")]
+        for kind, (_, name_col, key) in ITEM_KINDS.items()
+    }
 
 
 def build_summary_row(report: dict) -> dict:
@@ -300,75 +447,50 @@ def build_summary_row(report: dict) -> dict:
     }
 
 
+@sheets_action("fetch_day")
 def fetch_summary_by_date(d: date):
-    sh = get_sh()
-    ws = safe_worksheet(sh, SUMMARY_SHEET, summary_headers())
-
-    colA = ws.col_values(1)
-    dates = colA[1:] if len(colA) > 1 else []
-    ds = date_str(d)
-
-    if ds not in dates:
-        return None, None
-
-    row_no = dates.index(ds) + 2
-    values = ws.row_values(row_no)
-    headers = summary_headers()
-    if len(values) < len(headers):
-        values = values + [""] * (len(headers) - len(values))
-
-    row = dict(zip(headers, values))
-    return row, row_no
+    return get_backend().fetch_summary(date_str(d))
 
 
+@sheets_action("daily_save")
 def upsert_summary_to_google(report: dict):
-    sh = get_sh()
-    ws = safe_worksheet(sh, SUMMARY_SHEET, summary_headers())
-
-    headers = summary_headers()
-    ds = report["date"]
+    row_data = build_summary_row(report)
+    values = [row_data.get(h, "") for h in summary_headers()]
+    backend = get_backend()
+    result = backend.upsert_summary(values)
+    backend.replace_day_items(row_data["date"], day_items(report))
+    get_month_cache().invalidate(month_key(row_data["date"]))
+    return result
 
-    colA = ws.col_values(1)
-    dates = colA[1:] if len(colA) > 1 else []
 
-    row_data = build_summary_row(report)
-    values = [row_data.get(h, "") for h in headers]
-    last_col = col_letter(len(headers))
+@st.cache_resource
+def get_month_cache() -> MonthCache:
+    """Reports month data shared by all sessions (closed months pinned, open month MONTH_CACHE_TTL)."""
+    return MonthCache(ttl=MONTH_CACHE_TTL)
 
-    if ds in dates:
-        row_no = dates.index(ds) + 2
-        ws.update(f"A{row_no}:{last_col}{row_no}", [values], value_input_option="USER_ENTERED")
-        return "updated"
 
-    ws.append_row(values, value_input_option="USER_ENTERED")
-    return "appended"
+@st.cache_resource
+def ensure_derived_tables() -> dict:
+    """Once per process: build the item tables (from details_json) and Monthly_Rollup if still empty."""
+    backend = get_backend()
+    done = {}
+    if backend.items_empty():
+        done.update(migrate_items(backend))
+    if not backend.load_rollups("0000-00", "9999-99"):
+        done["monthly_rollup"] = rebuild_rollups(backend)
+    return done
 
 
 # =========================
 # LEDGER (Standalone system)
 # =========================
-def ledger_headers():
-    return ["Customer", "Outstanding"]
-
-
-def ledger_log_headers():
-    return [
-        "Log_Timestamp",
-        "Entry_Date",
-        "Type",            # CREDIT or PAYMENT
-        "Customer",
-        "Amount",
-        "Balance_Before",
-        "Balance_After",
-        "Employee",
-        "Notes",
-    ]
-
-
+@sheets_action("load_ledger")
 def load_ledger() -> pd.DataFrame:
-    sh = get_sh()
-    ws = safe_worksheet(sh, LEDGER_SHEET, ledger_headers())
-    df = pd.DataFrame(ws.get_all_records())
+    if LEDGER_MODE == "events":
+        balances = get_ledger_projection().refresh().balances
+        df = pd.DataFrame([{"Customer": c, "Outstanding": money(v)} for c, v in balances.items()])
+    else:
+        df = pd.DataFrame(get_backend().load_ledger())
     if df.empty:
         return pd.DataFrame(columns=["Customer", "Outstanding"])
     df["Customer"] = df.get("Customer", "").astype(str).str.strip()
@@ -378,14 +500,11 @@ def load_ledger() -> pd.DataFrame:
     return df
 
 
+@sheets_action("save_ledger")
 def save_ledger(df: pd.DataFrame):
-    sh = get_sh()
-    ws = safe_worksheet(sh, LEDGER_SHEET, ledger_headers())
-
     out = df.copy()
     if out.empty:
-        ws.clear()
-        ws.update("A1", [ledger_headers()])
+        get_backend().save_ledger([])
         return
 
     out["Customer"] = out["Customer"].astype(str).str.strip()
@@ -393,17 +512,12 @@ def save_ledger(df: pd.DataFrame):
     out = out[out["Customer"] != ""].copy()
     out = out.sort_values(["Outstanding", "Customer"], ascending=[False, True]).reset_index(drop=True)
 
-    ws.clear()
-    ws.update("A1", [ledger_headers()])
-    ws.update("A2", out[["Customer", "Outstanding"]].values.tolist())
-
+    get_backend().save_ledger(out[["Customer", "Outstanding"]].values.tolist())
 
-def append_ledger_log(entry_date: date, typ: str, customer: str, amount: float,
-                      before: float, after: float, employee: str, notes: str):
-    sh = get_sh()
-    ws = safe_worksheet(sh, LEDGER_LOG_SHEET, ledger_log_headers())
 
-    row = [
+def ledger_log_row(entry_date: date, typ: str, customer: str, amount: float,
+                   before: float, after: float, employee: str, notes: str) -> list:
+    return [
         datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         date_str(entry_date),
         typ,
@@ -414,19 +528,43 @@ def append_ledger_log(entry_date: date, typ: str, customer: str, amount: float,
         employee,
         notes,
     ]
-    ws.append_row(row, value_input_option="USER_ENTERED")
 
 
-def load_ledger_logs(limit: int = 5000) -> pd.DataFrame:
-    sh = get_sh()
-    ws = safe_worksheet(sh, LEDGER_LOG_SHEET, ledger_log_headers())
-    df = pd.DataFrame(ws.get_all_records())
+def append_ledger_log(entry_date: date, typ: str, customer: str, amount: float,
+                      before: float, after: float, employee: str, notes: str):
+    get_backend().append_ledger_log(ledger_log_row(entry_date, typ, customer, amount, before, after, employee, notes))
+
+
+def _logs_frame(rows: list[dict]) -> pd.DataFrame:
+    df = pd.DataFrame(rows)
     if df.empty:
         return pd.DataFrame(columns=ledger_log_headers())
     if "Log_Timestamp" in df.columns:
         df["Log_Timestamp"] = pd.to_datetime(df["Log_Timestamp"], errors="coerce")
-        df = df.sort_values("Log_Timestamp", ascending=False)
-    return df.head(limit).reset_index(drop=True)
+        df = df.sort_values("Log_Timestamp", ascending=False, kind="stable")
+    return df.reset_index(drop=True)
+
+
+@sheets_action("load_ledger_logs")
+def load_ledger_logs(limit: int = LOG_PAGE_SIZE, offset: int = 0) -> tuple[pd.DataFrame, int]:
+    """The `limit` most recent log rows after skipping `offset`, and the total row count."""
+    rows, total = get_backend().ledger_log_page(offset, limit)
+    return _logs_frame(rows), total
+
+
+@sheets_action("customer_log")
+def load_customer_logs(customer: str) -> pd.DataFrame:
+    return _logs_frame(get_backend().ledger_log_for_customer(customer))
+
+
+@sheets_action("statements")
+def build_customer_statements(start: date, end: date, customers: list[str] | None = None) -> list[Statement]:
+    """Running-balance statements from one read of Ledger_Log, all customers in a single pass.
+
+    Openings are the projection's balances as of the day before `start`, so a
+    closing balance always matches "Balances as of a date" for `end`.
+    """
+    return list(get_ledger_projection().statements(start, end, customers).values())
 
 
 def apply_ledger_transaction(ledger_df: pd.DataFrame, customer: str, typ: str, amount: float) -> tuple[pd.DataFrame, float, float]:
@@ -467,32 +605,144 @@ def apply_ledger_transaction(ledger_df: pd.DataFrame, customer: str, typ: str, a
     return df, before, after
 
 
+def post_ledger_transaction(ledger_df: pd.DataFrame, customer: str, typ: str, amount: float,
+                            entry_date: date, employee: str, notes: str) -> tuple[pd.DataFrame, float, float]:
+    """Apply + persist one transaction and its Ledger_Log row. Returns (new_df, before, after).
+
+    Incremental mode reads and writes only this customer's row (on Sheets: one read,
+    one claim of the row, one batched write for Ledger + Ledger_Log; re-read and retried
+    if another attendant got there first); `ledger_df` (the on-screen table) is
+    patched with the fresh balance instead of being reloaded.
+    """
+    customer = (customer or "").strip()
+    if LEDGER_MODE == "events":
+        # the event itself is the write (append_ledger_log); nothing to read-modify-write here
+        new_df, before, after = apply_ledger_transaction(load_ledger(), customer, typ, amount)
+        append_ledger_log(entry_date, typ, customer, amount, before, after, employee, notes)
+        return new_df, before, after
+
+    if LEDGER_WRITES == "rewrite":
+        new_df, before, after = apply_ledger_transaction(load_ledger(), customer, typ, amount)
+        save_ledger(new_df)
+        append_ledger_log(entry_date, typ, customer, amount, before, after, employee, notes)
+        return new_df, before, after
+
+    base = ledger_df.copy() if ledger_df is not None and not ledger_df.empty else pd.DataFrame(columns=["Customer", "Outstanding"])
+    base = base[base["Customer"].astype(str).str.strip() != customer]
+    # validates customer/amount/type before anything is written
+    _, _, delta = apply_ledger_transaction(base.iloc[0:0], customer, typ, amount)
+
+    before, after = get_backend().post_ledger_entry(
+        customer, delta,
+        lambda b, a: ledger_log_row(entry_date, typ, customer, amount, b, a, employee, notes),
+    )
+    base = pd.concat([base, pd.DataFrame([{"Customer": customer, "Outstanding": before}])], ignore_index=True)
+    new_df, _, _ = apply_ledger_transaction(base, customer, typ, amount)
+    return new_df, before, after
+
+
+def post_ledger_batch(ledger_df: pd.DataFrame, txs: list[dict]) -> tuple[pd.DataFrame, list[tuple[float, float]]]:
+    """Apply + persist validated transactions in order. Returns (new_df, (before, after) per transaction).
+
+    One in-memory pass, then one ledger write and one batched Ledger_Log append
+    (incremental mode on Sheets: one read of the touched rows + one batchUpdate).
+    """
+    def log_row(i, before, after):
+        tx = txs[i]
+        return ledger_log_row(tx["date"], tx["type"], tx["customer"], tx["amount"], before, after,
+                              tx["employee"], tx["notes"])
+
+    if LEDGER_MODE == "events" or LEDGER_WRITES == "rewrite":
+        current = load_ledger()
+        balances = dict(zip(current["Customer"], current["Outstanding"].astype(float)))
+        results, logs = fold_batch(balances, txs, log_row)
+        new_df = ledger_frame(balances)
+        if LEDGER_MODE != "events":   # in events mode the log rows are the write
+            save_ledger(new_df)
+        get_backend().append_ledger_logs(logs)
+        return new_df, results
+
+    return post_batch(get_backend(), ledger_df, txs, log_row)
+
+
+def day_ledger_net(report: dict) -> dict:
+    """Net ledger change of a Daily Entry per customer: credit given minus collected."""
+    net = {}
+    for key, sign in (("customer_credit_rows", 1), ("debt_collection_rows", -1)):
+        for r in clean_rows(report.get(key, []), "Customer", "Amount"):
+            net[r["Customer"]] = net.get(r["Customer"], 0.0) + sign * r["Amount"]
+    return {c: money(v) for c, v in net.items() if money(v)}
+
+
+@sheets_action("ledger_autopost")
+def post_day_to_ledger(ledger_df: pd.DataFrame | None, report: dict) -> tuple[pd.DataFrame | None, list[tuple]]:
+    """Post a saved Daily Entry's net per-customer change to the ledger, idempotent per date.
+
+    Ledger_Postings remembers what each date has posted, so saving the same date
+    again posts only the difference (and nothing if the lines didn't change).
+    Returns (patched `ledger_df`, (customer, delta, before, after) per posted change).
+    """
+    ds, net = report["date"], day_ledger_net(report)
+    entry_date, employee = parse_date(ds), report.get("employee_name", "")
+
+    def log_row(customer, delta, before, after):
+        typ = "CREDIT" if delta > 0 else "PAYMENT"
+        return ledger_log_row(entry_date, typ, customer, abs(delta), before, after, employee, f"Daily Entry {ds}")
+
+    backend = get_backend()
+    if LEDGER_MODE == "events" or LEDGER_WRITES == "rewrite":
+        entries = posting_entries(backend.day_postings(ds), net)
+        if not entries:
+            return ledger_df, []
+        current = load_ledger()
+        balances = dict(zip(current["Customer"], current["Outstanding"].astype(float)))
+        results, logs = [], []
+        for customer, delta in entries:
+            before = balances.get(customer, 0.0)
+            balances[customer] = before + delta
+            results.append((customer, delta, before, balances[customer]))
+            logs.append(log_row(*results[-1]))
+        new_df = ledger_frame(balances)
+        if LEDGER_MODE != "events":   # in events mode the log rows are the write
+            save_ledger(new_df)
+        backend.append_ledger_logs(logs)
+        backend.replace_day_postings(ds, net)
+        return new_df, results
+
+    results = backend.post_day_ledger(ds, net, log_row)
+    if ledger_df is None or not results:
+        return ledger_df, results
+    balances = dict(zip(ledger_df["Customer"].astype(str).str.strip(), pd.to_numeric(ledger_df["Outstanding"], errors="coerce").fillna(0.0)))
+    balances.update({customer: after for customer, _, _, after in results})
+    return ledger_frame(balances), results
+
+
+@sheets_action("compact_ledger")
+def compact_ledger() -> pd.DataFrame:
+    """Rewrite the whole Ledger tab sorted (the old save path, now an explicit maintenance step)."""
+    df = load_ledger()
+    save_ledger(df)
+    return df
+
+
 # =========================
-# EXCEL
+# LOCAL ARCHIVE (Parquet per month, xlsx on demand)
 # =========================
-def upsert_excel(report: dict):
-    row = build_summary_row(report)
-    headers = summary_headers()
-    new_df = pd.DataFrame([[row.get(h, "") for h in headers]], columns=headers)
-
-    if os.path.exists(EXCEL_FILE):
+@st.cache_resource
+def get_archive() -> SummaryArchive:
+    archive = SummaryArchive(ARCHIVE_DIR, summary_headers())
+    # one-time migration of the old rewrite-everything workbook
+    if archive.is_empty() and os.path.exists(EXCEL_FILE):
         try:
-            old = pd.read_excel(EXCEL_FILE, sheet_name="Summary")
+            archive.import_frame(pd.read_excel(EXCEL_FILE, sheet_name="Summary"))
         except Exception:
-            old = pd.DataFrame(columns=headers)
-    else:
-        old = pd.DataFrame(columns=headers)
-
-    if not old.empty and "date" in old.columns:
-        old["date"] = old["date"].astype(str)
-        old = old[old["date"] != str(report["date"])]
+            pass
+    return archive
 
-    out = pd.concat([old, new_df], ignore_index=True)
-    out["date"] = out["date"].astype(str)
-    out = out.sort_values("date").reset_index(drop=True)
 
-    with pd.ExcelWriter(EXCEL_FILE, engine="openpyxl", mode="w") as writer:
-        out.to_excel(writer, sheet_name="Summary", index=False)
+@timed("archive", size=None)
+def upsert_archive(report: dict):
+    get_archive().upsert(build_summary_row(report))
 
 
 # =========================
@@ -546,175 +796,43 @@ def reset_daily_entry_state():
 # =========================
 # PDF / PNG
 # =========================
+@timed("render")
 def pdf_bytes(report: dict) -> bytes:
-    buf = BytesIO()
-    c = canvas.Canvas(buf, pagesize=A4)
-    W, H = A4
-
-    PRIMARY = HexColor("#111111")
-    GRAY = HexColor("#555555")
-    LINE = HexColor("#DDDDDD")
-    RED = HexColor("#C62828")
-    GREEN = HexColor("#2E7D32")
-
-    def text(x, y, s, size=11, bold=False, color=PRIMARY):
-        c.setFillColor(color)
-        c.setFont("Helvetica-Bold" if bold else "Helvetica", size)
-        c.drawString(x, y, s)
-
-    def rtext(x, y, s, size=11, bold=False, color=PRIMARY):
-        c.setFillColor(color)
-        c.setFont("Helvetica-Bold" if bold else "Helvetica", size)
-        c.drawRightString(x, y, s)
-
-    def hline(y):
-        c.setStrokeColor(LINE)
-        c.setLineWidth(1)
-        c.line(15 * mm, y, W - 15 * mm, y)
-
-    def row_line(label, value, big=False, color=PRIMARY):
-        nonlocal y
-        size = 14 if big else 12
-        text(20 * mm, y, label, size=size)
-        rtext(W - 20 * mm, y, value, size=size, bold=big, color=color)
-        y -= 7 * mm
-
-    y = H - 20 * mm
-    text(15 * mm, y, "HP PETROL BUNK", size=18, bold=True)
-    y -= 8 * mm
-    text(15 * mm, y, "Daily Sales Statement", size=14, bold=True, color=GRAY)
-
-    y -= 10 * mm
-    hline(y)
-    y -= 10 * mm
-
-    text(15 * mm, y, "Date:", bold=True)
-    text(35 * mm, y, report["date"])
-    rtext(W - 15 * mm, y, f"Employee: {report.get('employee_name','')}", bold=True)
-
-    y -= 8 * mm
-    hline(y)
-    y -= 10 * mm
-
-    text(15 * mm, y, "FUEL SALES", size=13, bold=True)
-    y -= 8 * mm
-    row_line("Petrol Liters Sold", f"{report['petrol_liters_sold']:.3f} L")
-    row_line("Petrol Amount", f"₹ {report['petrol_amount']:.2f}")
-    row_line("Diesel Liters Sold", f"{report['diesel_liters_sold']:.3f} L")
-    row_line("Diesel Amount", f"₹ {report['diesel_amount']:.2f}")
-
-    y -= 6 * mm
-    hline(y)
-    y -= 8 * mm
-
-    text(15 * mm, y, "OTHER SALES", size=13, bold=True)
-    y -= 8 * mm
-    row_line("2T Oil Packets", f"{int(report.get('oil_packets', 0))}")
-    row_line("2T Oil Price", f"₹ {report.get('oil_price', 0.0):.2f}")
-    row_line("2T Oil Amount", f"₹ {report['oil_amount']:.2f}")
-
-    y -= 6 * mm
-    hline(y)
-    y -= 8 * mm
-
-    text(15 * mm, y, "CASH FLOW", size=13, bold=True)
-    y -= 8 * mm
-    row_line("Total Sales", f"₹ {report['total_sales']:.2f}", big=True)
-
-    row_line("QR / UPI", f"- ₹ {report['qr_amount']:.2f}", color=RED)
-    row_line("Advance Paid", f"- ₹ {report['advance_paid']:.2f}", color=RED)
-    row_line("Owner PhonePay", f"- ₹ {report.get('owner_phonepay_amount', 0.0):.2f}", color=RED)
-    row_line("Expenses", f"- ₹ {report['other_expenses_total']:.2f}", color=RED)
-    row_line("Credit Given", f"- ₹ {report['customer_credit_total']:.2f}", color=RED)
-
-    row_line("Collections", f"+ ₹ {report['debt_collections_total']:.2f}", color=GREEN)
-    row_line("Yesterday Balance", f"+ ₹ {report.get('yesterday_balance_amount', 0.0):.2f}", color=GREEN)
-
-    y -= 4 * mm
-    hline(y)
-    y -= 10 * mm
-
-    text(15 * mm, y, "CASH TO DEPOSIT", size=16, bold=True, color=GREEN)
-    rtext(W - 15 * mm, y, f"₹ {report['cash_to_deposit']:.2f}", size=20, bold=True, color=GREEN)
-
-    c.showPage()
-    c.save()
-    return buf.getvalue()
+    return pdf_render.daily_statement(report)
 
 
-def png_bytes(report: dict) -> bytes:
-    fig = plt.figure(figsize=(7.5, 9.5), dpi=200)
-    ax = fig.add_axes([0, 0, 1, 1])
-    ax.axis("off")
-
-    def put(y, left, right=None, size=12, bold=False):
-        ax.text(0.05, y, left, fontsize=size,
-                fontweight=("bold" if bold else "normal"),
-                va="top", family="DejaVu Sans")
-        if right is not None:
-            ax.text(0.95, y, right, fontsize=size,
-                    fontweight=("bold" if bold else "normal"),
-                    va="top", ha="right", family="DejaVu Sans")
-
-    def line(y):
-        ax.plot([0.05, 0.95], [y, y], linewidth=1)
-
-    y = 0.97
-    put(y, "HP PETROL BUNK", size=18, bold=True); y -= 0.045
-    put(y, "Daily Sales Statement", size=13, bold=True); y -= 0.04
-
-    put(y, "Date", report["date"], bold=True); y -= 0.03
-    put(y, "Employee", report.get("employee_name", ""), bold=True); y -= 0.03
-    
-    if report.get("notes"):
-        put(y, "Notes", str(report.get("notes"))[:80]); y -= 0.03
+def statement_pdf_bytes(statements: list[Statement]) -> bytes:
+    """Running-balance statements, one or more pages per customer, in one PDF (pdf_bytes styling)."""
+    return pdf_render.customer_statements(statements)
 
-    y -= 0.01
-    line(y); y -= 0.03
 
-    put(y, "FUEL SALES", size=13, bold=True); y -= 0.035
+@timed("render")
+def png_bytes(report: dict) -> bytes:
+    render = PNG_RENDERERS.get(PNG_RENDERER, PNG_RENDERERS["pillow"])
+    return render(report)
 
-    put(y, f"Petrol ({p_rate})", f"{report['petrol_liters_sold']:.3f} L (O:{report['p_open']:.3f} C:{report['p_close']:.3f} T:{report['p_test']:.3f}) | ₹ {report['petrol_amount']:.2f}"); y -= 0.028
 
-    put(y, f"Diesel ({d_rate})", f"{report['diesel_liters_sold']:.3f} L (O:{report['d_open']:.3f} C:{report['d_close']:.3f} T:{report['d_test']:.3f}) | ₹ {report['diesel_amount']:.2f}"); y -= 0.04
-    
-    put(y, "2T oil SALES", size=13, bold=True); y -= 0.035
-    put(y, "Packets", f"{int(report.get('oil_packets', 0))} | price (₹ {report.get('oil_price', 0.0):.2f}) - Total ₹ {report['oil_amount']:.2f}"); y -= 0.028
+@st.cache_resource
+def get_render_cache() -> RenderCache:
+    return RenderCache(max_items=64, disk_dir=RENDER_CACHE_DIR)
 
-    line(y); y -= 0.03
-    put(y, "TOTAL SALES", f"₹ {report['total_sales']:.2f}", size=14, bold=True); y -= 0.04
 
-    put(y, "DEDUCTIONS / ADJUSTMENTS", size=13, bold=True); y -= 0.035
-    put(y, "QR / UPI", f"- ₹ {report['qr_amount']:.2f}"); y -= 0.028
-    put(y, "Advance Paid", f"- ₹ {report['advance_paid']:.2f}"); y -= 0.028
-    put(y, "Owner PhonePay", f"- ₹ {report.get('owner_phonepay_amount', 0.0):.2f}"); y -= 0.028
-    put(y, "Expenses", f"- ₹ {report['other_expenses_total']:.2f}"); y -= 0.028
-    put(y, "Credit Given", f"- ₹ {report['customer_credit_total']:.2f}"); y -= 0.028
-    put(y, "Collections", f"+ ₹ {report['debt_collections_total']:.2f}"); y -= 0.028
-    put(y, "Yesterday Balance", f"+ ₹ {report.get('yesterday_balance_amount', 0.0):.2f}"); y -= 0.04
+def cached_png(report: dict) -> bytes:
+    return get_render_cache().get_or_render(f"png-{PNG_RENDERER}", report, png_bytes)
 
-    line(y); y -= 0.03
-    put(y, "CASH TO DEPOSIT", f"₹ {report['cash_to_deposit']:.2f}", size=15, bold=True); y -= 0.03
 
-    out = BytesIO()
-    fig.savefig(out, format="png", bbox_inches="tight")
-    plt.close(fig)
-    return out.getvalue()
+def cached_pdf(report: dict) -> bytes:
+    return get_render_cache().get_or_render("pdf", report, pdf_bytes)
 
 
 # =========================
 # APP STATE (INIT)
 # =========================
-if "settings" not in st.session_state:
-    st.session_state.settings = {}
-
-if "settings_loaded" not in st.session_state:
-    st.session_state.settings_loaded = False
-
-# Auto-load settings globally ONCE (fixes dropdown dependency)
-if not st.session_state.settings_loaded:
-    st.session_state.settings = read_settings_from_google()
-    st.session_state.settings_loaded = True
+# Settings come from the process-wide cache on every run (fixes dropdown dependency),
+# so a save in any session shows up everywhere on the next interaction
+st.session_state.settings = get_settings()
+# one-time build of the line-item tables and the monthly rollup (no-op once they hold data)
+ensure_derived_tables()
 
 if "edit_mode" not in st.session_state:
     st.session_state.edit_mode = False
@@ -745,7 +863,7 @@ with st.sidebar:
     st.caption("Settings auto-load at app start. Use refresh/save if needed.")
 
     if st.button("🔄 Refresh Settings from Google", width='stretch'):
-        st.session_state.settings = read_settings_from_google()
+        st.session_state.settings = get_settings(refresh=True)
         st.success("Settings refreshed.")
 
     settings = st.session_state.settings
@@ -769,6 +887,112 @@ with st.sidebar:
         st.session_state.settings = new_settings
         st.success("Saved Settings.")
 
+    st.divider()
+    st.caption(f"Storage: **{get_backend().name}**")
+    sync = sync_status()
+    if sync is not None:
+        if sync["pending"]:
+            st.warning(f"☁️ {sync['pending']} change(s) waiting to sync to Google")
+        else:
+            st.caption("☁️ All changes synced to Google")
+        if sync["dead"]:
+            st.error(f"❌ {sync['dead']} change(s) failed to sync: {sync['last_error']}")
+            if st.button("🔁 Retry failed sync", width='stretch'):
+                get_backend().outbox.retry_dead()
+                get_backend().worker.notify()
+                st.rerun()
+        elif sync["pending"] and sync["last_error"]:
+            st.caption(f"Last sync error (retrying): {sync['last_error']}")
+        if OFFLINE_FIRST:
+            if not sync["online"]:
+                st.warning("📴 Google Sheets not reachable: working from the local copy, changes sync when it is back.")
+            elif sync["last_pull"]:
+                st.caption(f"🪞 Local copy refreshed from Google at {datetime.fromtimestamp(sync['last_pull']):%H:%M:%S}")
+            if st.button("🪞 Refresh local copy now", width='stretch', disabled=bool(sync["pending"])):
+                get_backend().worker.run_idle(force=True)
+                get_month_cache().invalidate()
+                st.session_state.settings = get_settings(refresh=True)
+                st.rerun()
+            if sync["conflicts"]["merged"]:
+                st.caption(f"🔀 {sync['conflicts']['merged']} ledger balance(s) merged with changes made elsewhere")
+            if sync["conflicts"]["open"]:
+                with st.expander(f"⚠️ {sync['conflicts']['open']} sync conflict(s)", expanded=True):
+                    st.caption("Changed here and in Google Sheets since the last sync.")
+                    for c in get_mirror().conflicts():
+                        st.markdown(f"**{c['tab']}** · {c['key']}")
+                        st.dataframe(conflict_diff(c), hide_index=True, width='stretch')
+                        k1, k2 = st.columns(2)
+                        if k1.button("Keep mine", key=f"conflict_mine_{c['id']}", width='stretch'):
+                            resolve_conflict(c, "mine", get_backend(), get_mirror())
+                            st.rerun()
+                        if k2.button("Keep Google", key=f"conflict_theirs_{c['id']}", width='stretch'):
+                            resolve_conflict(c, "theirs", get_backend(), get_mirror())
+                            get_month_cache().invalidate(month_key(c["key"]) if c["tab"] == "Summary" else None)
+                            st.session_state.settings = get_settings(refresh=True)
+                            st.rerun()
+    if STORAGE_BACKEND == "sqlite" and not OFFLINE_FIRST:
+        if st.button("📥 Import Google Sheet into local store", width='stretch'):
+            google = sheets_backend(lambda name, headers: safe_worksheet(get_sh(), name, headers))
+            counts = copy_all(google, get_backend())
+            st.session_state.settings = get_settings(refresh=True)
+            get_month_cache().invalidate()
+            st.success("Imported: " + ", ".join(f"{k} {v}" for k, v in counts.items()))
+
+    with st.expander("🩺 Startup diagnostics"):
+        st.caption("Cold import cost, measured in a fresh Python process (`-X importtime`).")
+        if st.button("⏱️ Measure import times", width='stretch'):
+            with st.spinner("Importing in a fresh process..."):
+                st.session_state["import_profile"] = import_profile()
+        prof = st.session_state.get("import_profile")
+        if prof:
+            st.write(f"Startup imports: **{prof['startup_ms']:.0f} ms** · deferred until used: **{prof['deferred_ms']:.0f} ms**")
+            st.dataframe(pd.DataFrame(prof["breakdown"]), hide_index=True, width='stretch')
+            st.caption("Slowest modules (self time)")
+            st.dataframe(pd.DataFrame(prof["slowest"]), hide_index=True, width='stretch')
+        loaded = loaded_lazy_modules()
+        st.caption("Loaded in this process: " + (", ".join(loaded) if loaded else "none of the lazy modules yet"))
+
+    with st.expander("📡 Google Sheets calls per action"):
+        calls = SHEETS_STATS.table()
+        if calls:
+            st.dataframe(pd.DataFrame(calls), hide_index=True, width='stretch')
+            if st.button("Reset counters", width='stretch'):
+                SHEETS_STATS.reset()
+                st.rerun()
+        else:
+            st.caption("No Google Sheets calls in this process yet.")
+
+    with st.expander("🚦 Google Sheets quota"):
+        st.caption(
+            f"Client-side limit: {SHEETS_READS_PER_MIN:g} reads and {SHEETS_WRITES_PER_MIN:g} writes per minute. "
+            "Saves go first; reports and reloads wait when the quota runs low."
+        )
+        st.dataframe(pd.DataFrame(get_rate_limiter().headroom()), hide_index=True, width='stretch')
+        waiting = get_rate_limiter().waiting()
+        if any(waiting.values()):
+            st.caption("Waiting for quota: " + ", ".join(f"{n} {p}" for p, n in waiting.items() if n))
+
+    if PROFILE_RERUNS:
+        with st.expander("⏱️ Rerun profile"):
+            runs = [r for r in st.session_state["_profile_runs"] if r.wall_ms is not None]
+            if runs:
+                st.caption(f"Last {len(runs)} rerun(s) of this session; \"≥\" = ended by a rerun/stop, timed up to its last span.")
+                st.dataframe(pd.DataFrame([r.summary() for r in reversed(runs)]), hide_index=True, width='stretch')
+                st.caption("Per operation (Sheets calls, renders, archive writes)")
+                st.dataframe(pd.DataFrame(op_table(runs)), hide_index=True, width='stretch')
+                st.download_button(
+                    "⬇️ Export spans (JSON lines)",
+                    data=to_jsonl(runs).encode("utf-8"),
+                    file_name=f"rerun_profile_{datetime.now():%Y%m%d_%H%M%S}.jsonl",
+                    mime="application/x-ndjson",
+                    width='stretch',
+                )
+                if st.button("Clear profile", width='stretch'):
+                    st.session_state["_profile_runs"].clear()
+                    st.rerun()
+            else:
+                st.caption("No finished reruns yet.")
+
 
 # =========================
 # DAILY ENTRY TAB
@@ -1042,8 +1266,25 @@ with tab_entry:
 
     if save_clicked:
         action = upsert_summary_to_google(report=report)
-        upsert_excel(report)
-        st.success(f"✅ Saved (Summary {action} + Excel updated)")
+        upsert_archive(report)
+        backend = get_backend()
+        if isinstance(backend, WriteBehindBackend):
+            st.success(f"✅ Saved locally (Summary {action} + archive) — {backend.pending()['pending']} change(s) queued for Google")
+        else:
+            st.success(f"✅ Saved (Summary {action} + archive updated)")
+
+        if AUTO_POST_LEDGER:
+            new_df, posted = post_day_to_ledger(st.session_state.get("_ledger_df"), report)
+            if posted:
+                if new_df is not None:
+                    st.session_state["_ledger_df"] = new_df
+                for customer, _, _, _ in posted:
+                    st.session_state.get("_customer_logs", {}).pop(customer, None)
+                st.success("📒 Ledger: " + ", ".join(
+                    f"{c} {'+' if d > 0 else '−'}₹{abs(d):.2f} (→ ₹{money(after):.2f})" for c, d, _, after in posted
+                ))
+            else:
+                st.caption("📒 Ledger already matches this day's credit/collection lines.")
 
     st.divider()
     wa_msg = (
@@ -1082,13 +1323,14 @@ with tab_entry:
     f"— HP PETROL BUNK"
 )
 
-    # Downloads row
+    # Downloads row (PNG/PDF are rendered only when clicked, then served from the render cache)
     c1, c2, c3, c4 = st.columns([1, 1, 1, 1])
+    statement = {k: v for k, v in report.items() if not k.endswith("_rows")}
 
     with c1:
         st.download_button(
             "⬇️ PNG",
-            data=png_bytes(report),
+            data=lambda: cached_png(statement),
             file_name=f"hp_bunk_{report['date']}.png",
             mime="image/png",
             width='stretch',
@@ -1097,22 +1339,22 @@ with tab_entry:
     with c2:
         st.download_button(
             "⬇️ PDF",
-            data=pdf_bytes(report),
+            data=lambda: cached_pdf(statement),
             file_name=f"hp_bunk_{report['date']}.pdf",
             mime="application/pdf",
             width='stretch',
         )
 
     with c3:
-        if os.path.exists(EXCEL_FILE):
-            with open(EXCEL_FILE, "rb") as f:
-                st.download_button(
-                    "⬇️ Excel",
-                    data=f.read(),
-                    file_name="hp_bunk_daily.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    width='stretch',
-                )
+        if not get_archive().is_empty():
+            # built from the Parquet partitions only when clicked
+            st.download_button(
+                "⬇️ Excel",
+                data=get_archive().to_xlsx_bytes,
+                file_name="hp_bunk_daily.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                width='stretch',
+            )
         else:
             st.caption("Excel after first Save")
 
@@ -1128,7 +1370,7 @@ with tab_ledger:
     if "_ledger_df" not in st.session_state:
         st.session_state["_ledger_df"] = load_ledger()
 
-    top1, top2 = st.columns([1.2, 1.2])
+    top1, top2, top3 = st.columns([1.2, 1.2, 1.2])
 
     with top1:
         if st.button("🔄 Load Ledger", width='stretch'):
@@ -1137,9 +1379,15 @@ with tab_ledger:
 
     with top2:
         if st.button("📜 Load Ledger Logs", width='stretch'):
-            st.session_state["_ledger_logs_df"] = load_ledger_logs()
+            st.session_state["_ledger_logs_df"], st.session_state["_ledger_logs_total"] = load_ledger_logs()
+            st.session_state["_customer_logs"] = {}
             st.success("Ledger logs loaded.")
 
+    with top3:
+        if st.button("🧹 Compact Ledger", width='stretch', help="Rewrite the Ledger tab sorted by outstanding."):
+            st.session_state["_ledger_df"] = compact_ledger()
+            st.success("Ledger compacted.")
+
     ledger_df = st.session_state.get("_ledger_df", pd.DataFrame(columns=["Customer", "Outstanding"]))
 
     total_outstanding = pd.to_numeric(ledger_df.get("Outstanding", 0), errors="coerce").fillna(0.0)
@@ -1228,13 +1476,14 @@ with tab_ledger:
         elif emp is None or not isinstance(emp, str) or not emp.strip():
             st.error("❌ Select an employee.")
         else:
-            current_ledger = load_ledger()
             tx_type = "CREDIT" if typ.startswith("CREDIT") else "PAYMENT"
             try:
-                new_df, before, after = apply_ledger_transaction(current_ledger, customer.strip(), tx_type, float(amount))
-                save_ledger(new_df)
-                append_ledger_log(entry_d, tx_type, customer.strip(), float(amount), before, after, emp, notes)
+                with sheets_action("ledger_tx"):
+                    new_df, before, after = post_ledger_transaction(
+                        ledger_df, customer.strip(), tx_type, float(amount), entry_d, emp, notes
+                    )
                 st.session_state["_ledger_df"] = new_df
+                st.session_state.get("_customer_logs", {}).pop(customer.strip(), None)
                 st.success(f"✅ Applied {tx_type} for {customer.strip()} | Before ₹{money(before):.2f} → After ₹{money(after):.2f}")
                 
                 wa_msg_ledger = (
@@ -1253,6 +1502,61 @@ with tab_ledger:
             except Exception as e:
                 st.error(f"❌ Failed: {e}")
 
+    with st.expander("📥 Bulk Import Transactions"):
+        st.caption(
+            "Upload a CSV or type into the grid: Date (YYYY-MM-DD or DD-MM-YYYY), Customer, "
+            "Type (CREDIT / PAYMENT), Amount, Employee (optional), Notes (optional). "
+            "All rows are checked first; nothing is written if any row is invalid."
+        )
+        st.download_button(
+            "⬇️ CSV template",
+            data=pd.DataFrame(columns=BULK_COLUMNS).to_csv(index=False).encode("utf-8"),
+            file_name="ledger_bulk_template.csv",
+            mime="text/csv",
+        )
+        bulk_file = st.file_uploader("CSV file", type=["csv"], key="bulk_csv")
+        if bulk_file is not None and st.session_state.get("_bulk_file_id") != bulk_file.file_id:
+            st.session_state["_bulk_file_id"] = bulk_file.file_id
+            try:
+                uploaded = pd.read_csv(bulk_file, dtype=str, keep_default_na=False)
+                uploaded.columns = [str(c).strip().title() for c in uploaded.columns]
+                st.session_state["_bulk_df"] = uploaded.reindex(columns=BULK_COLUMNS, fill_value="")
+                st.session_state["_bulk_gen"] = st.session_state.get("_bulk_gen", 0) + 1
+            except Exception as e:
+                st.error(f"❌ Could not read CSV: {e}")
+        bulk_df = st.data_editor(
+            st.session_state.get("_bulk_df", pd.DataFrame([{c: "" for c in BULK_COLUMNS}])),
+            num_rows="dynamic",
+            width='stretch',
+            key=f"bulk_editor_{st.session_state.get('_bulk_gen', 0)}",   # new key = fresh grid
+        )
+        bulk_emp = st.selectbox("Default employee", settings.get("employees", []), key="bulk_emp")
+
+        if st.button("✅ Apply All Transactions", width='stretch'):
+            known = set(settings.get("customers", [])) | set(ledger_df.get("Customer", pd.Series(dtype=str)).astype(str))
+            txs, errors = validate_bulk_transactions(bulk_df, known, bulk_emp or "")
+            if errors:
+                st.error("❌ Nothing applied. Fix these rows:\n\n" + "\n".join(f"- {e}" for e in errors))
+            elif not txs:
+                st.warning("No transactions to apply.")
+            else:
+                try:
+                    with sheets_action("ledger_bulk"):
+                        new_df, results = post_ledger_batch(ledger_df, txs)
+                    st.session_state["_ledger_df"] = new_df
+                    for tx in txs:
+                        st.session_state.get("_customer_logs", {}).pop(tx["customer"], None)
+                    st.session_state.pop("_bulk_df", None)
+                    st.session_state["_bulk_gen"] = st.session_state.get("_bulk_gen", 0) + 1
+                    credits = sum(t["amount"] for t in txs if t["type"] == "CREDIT")
+                    payments = sum(t["amount"] for t in txs if t["type"] == "PAYMENT")
+                    st.success(
+                        f"✅ Applied {len(txs)} transactions for {len({t['customer'] for t in txs})} customers "
+                        f"| Credits ₹{money(credits):.2f} | Payments ₹{money(payments):.2f}"
+                    )
+                except Exception as e:
+                    st.error(f"❌ Failed: {e}")
+
     st.divider()
     st.markdown("### Ledger Table")
     if ledger_df is None or ledger_df.empty:
@@ -1280,18 +1584,48 @@ with tab_ledger:
             mime="text/csv",
         )
 
+    if LEDGER_MODE == "events":
+        with st.expander("🕰️ Balances as of a date (from Ledger_Log)"):
+            proj = get_ledger_projection()
+            st.caption(
+                f"Log position {proj.seq} · {len(proj.snapshots)} snapshot(s)"
+                + (f", latest at {proj.snapshots[-1].seq}" if proj.snapshots else "")
+            )
+            as_of = st.date_input("As of", value=date.today(), key="ledger_as_of")
+            if st.button("Compute balances", key="ledger_as_of_btn"):
+                bal = proj.refresh().balance_as_of(as_of)
+                as_of_df = pd.DataFrame([{"Customer": c, "Outstanding": money(v)} for c, v in bal.items()])
+                if as_of_df.empty:
+                    st.info("No events on or before this date.")
+                else:
+                    st.dataframe(as_of_df.sort_values(["Outstanding", "Customer"], ascending=[False, True]),
+                                 width='stretch', hide_index=True)
+
+            b1, b2 = st.columns(2)
+            with b1:
+                if st.button("📸 Snapshot now", width='stretch'):
+                    snap = proj.refresh().snapshot()
+                    st.success(f"Snapshot at log position {snap.seq}.")
+            with b2:
+                if st.button("📥 Seed from Ledger tab", width='stretch',
+                             help="One-time switch-over: adopt the current Ledger tab balances as of the latest log entry."):
+                    rows = get_backend().load_ledger()
+                    proj.seed({str(r.get("Customer", "")).strip(): safe_float_cell(r.get("Outstanding"))
+                               for r in rows if str(r.get("Customer", "")).strip()})
+                    st.session_state["_ledger_df"] = load_ledger()
+                    st.success("Seeded balances from the Ledger tab.")
+
     st.divider()
     st.markdown("### Ledger Logs")
     logs_df = st.session_state.get("_ledger_logs_df", pd.DataFrame(columns=ledger_log_headers()))
     if logs_df is None or logs_df.empty:
         st.info("No logs loaded. Click 'Load Ledger Logs'.")
     else:
+        # every known customer, not only those in the loaded pages: a customer's history is read by index
+        known = set(settings.get("customers", [])) | set(ledger_df.get("Customer", pd.Series(dtype=str)).astype(str))
         if "Customer" in logs_df.columns:
-            log_customers = ["(All)"] + sorted(
-                logs_df["Customer"].astype(str).str.strip().replace("", pd.NA).dropna().unique().tolist()
-            )
-        else:
-            log_customers = ["(All)"]
+            known |= set(logs_df["Customer"].astype(str))
+        log_customers = ["(All)"] + sorted(c for c in {str(x).strip() for x in known} if c)
 
         sel_log_customer = st.selectbox(
             "Filter customer (Logs)",
@@ -1300,9 +1634,24 @@ with tab_ledger:
             key="ledger_logs_filter_customer",
         )
 
-        logs_view = logs_df.copy()
-        if sel_log_customer != "(All)" and "Customer" in logs_view.columns:
-            logs_view = logs_view[logs_view["Customer"].astype(str).str.strip().eq(sel_log_customer)].copy()
+        if sel_log_customer == "(All)":
+            logs_view = logs_df.copy()
+            total = st.session_state.get("_ledger_logs_total", len(logs_df))
+            st.caption(f"Latest {len(logs_df)} of {total} log rows.")
+            if len(logs_df) < total and st.button(f"⬇️ Load {LOG_PAGE_SIZE} older", width='stretch'):
+                older, new_total = load_ledger_logs(offset=len(logs_df))
+                if new_total > total:   # rows appended since: skip past them too
+                    older, new_total = load_ledger_logs(offset=len(logs_df) + new_total - total)
+                total = new_total
+                st.session_state["_ledger_logs_df"] = pd.concat([logs_df, older], ignore_index=True)
+                st.session_state["_ledger_logs_total"] = total
+                st.rerun()
+        else:
+            by_customer = st.session_state.setdefault("_customer_logs", {})
+            if sel_log_customer not in by_customer:
+                by_customer[sel_log_customer] = load_customer_logs(sel_log_customer)
+            logs_view = by_customer[sel_log_customer].copy()
+            st.caption(f"{len(logs_view)} log rows for {sel_log_customer}.")
 
         st.dataframe(logs_view, width='stretch', hide_index=True)
 
@@ -1312,127 +1661,78 @@ with tab_ledger:
             file_name="ledger_logs.csv",
             mime="text/csv",
         )
+
+    st.divider()
+    st.markdown("### Customer Statements")
+    stmt_customers = sorted(
+        {str(c).strip() for c in settings.get("customers", [])}
+        | {str(c).strip() for c in ledger_df.get("Customer", pd.Series(dtype=str))}
+        - {""}
+    )
+    sc1, sc2, sc3 = st.columns([1, 1, 1.4])
+    with sc1:
+        stmt_from = st.date_input("From", value=date.today().replace(day=1), key="stmt_from")
+    with sc2:
+        stmt_to = st.date_input("To", value=date.today(), key="stmt_to")
+    with sc3:
+        stmt_customer = st.selectbox("Customer", ["(All customers)"] + stmt_customers, key="stmt_customer")
+
+    if st.button("🧾 Build Statements", width='stretch'):
+        if stmt_from > stmt_to:
+            st.error("❌ 'From' must be on or before 'To'.")
+        else:
+            stmts = build_customer_statements(
+                stmt_from, stmt_to, None if stmt_customer == "(All customers)" else [stmt_customer]
+            )
+            st.session_state["_statements"] = {
+                "label": f"{date_str(stmt_from)}_{date_str(stmt_to)}",
+                "summary": pd.DataFrame([{
+                    "Customer": x.customer, "Opening": round(x.opening, 2), "Credits": x.credits,
+                    "Payments": x.payments, "Closing": x.closing, "Entries": len(x.lines),
+                } for x in stmts]),
+                "csv": pd.DataFrame([r for x in stmts for r in x.rows()]).to_csv(index=False).encode("utf-8"),
+                "pdf": statement_pdf_bytes(stmts) if stmts else b"",
+            }
+
+    stmt = st.session_state.get("_statements")
+    if stmt is not None:
+        if stmt["summary"].empty:
+            st.info("No ledger activity for this selection.")
+        else:
+            st.dataframe(stmt["summary"], width='stretch', hide_index=True)
+            d1, d2 = st.columns(2)
+            d1.download_button(
+                "⬇️ Download Statements PDF",
+                data=stmt["pdf"],
+                file_name=f"statements_{stmt['label']}.pdf",
+                mime="application/pdf",
+                width='stretch',
+            )
+            d2.download_button(
+                "⬇️ Download Statements CSV",
+                data=stmt["csv"],
+                file_name=f"statements_{stmt['label']}.csv",
+                mime="text/csv",
+                width='stretch',
+            )
 # =========================
 # REPORTS TAB (with sub-tabs)
 # =========================
 with tab_reports:
     # ---------- helpers ----------
-    def _safe_json_load(x):
-        try:
-            if x is None:
-                return {}
-            if isinstance(x, dict):
-                return x
-            s = str(x).strip()
-            if not s:
-                return {}
-            return json.loads(s)
-        except Exception:
-            return {}
-
-    def _safe_num(v):
-        try:
-            if v is None or (isinstance(v, str) and v.strip() == ""):
-                return 0.0
-            return float(v)
-        except Exception:
-            return 0.0
-
     def _sum_col(df_, col):
         return float(pd.to_numeric(df_.get(col, 0), errors="coerce").fillna(0).sum())
 
-    def _explode_details(month_df: pd.DataFrame):
-        credits, colls, exps = [], [], []
-        if month_df is None or month_df.empty:
-            return (
-                pd.DataFrame(columns=["date", "Customer", "Amount"]),
-                pd.DataFrame(columns=["date", "Customer", "Amount"]),
-                pd.DataFrame(columns=["date", "Expense", "Amount"]),
-            )
-
-        for _, r in month_df.iterrows():
-            ds = str(r.get("date", ""))[:10]
-            details = _safe_json_load(r.get("details_json", ""))
-
-            for item in (details.get("customer_credit_rows") or []):
-                cust = str(item.get("Customer", "")).strip()
-                amt = _safe_num(item.get("Amount"))
-                if cust and amt > 0:
-                    credits.append({"date": ds, "Customer": cust, "Amount": amt})
-
-            for item in (details.get("debt_collection_rows") or []):
-                cust = str(item.get("Customer", "")).strip()
-                amt = _safe_num(item.get("Amount"))
-                if cust and amt > 0:
-                    colls.append({"date": ds, "Customer": cust, "Amount": amt})
-
-            for item in (details.get("other_expense_rows") or []):
-                exp = str(item.get("Expense", "")).strip()
-                amt = _safe_num(item.get("Amount"))
-                if exp and amt > 0:
-                    exps.append({"date": ds, "Expense": exp, "Amount": amt})
-
-        cdf = pd.DataFrame(credits) if credits else pd.DataFrame(columns=["date", "Customer", "Amount"])
-        ldf = pd.DataFrame(colls) if colls else pd.DataFrame(columns=["date", "Customer", "Amount"])
-        edf = pd.DataFrame(exps) if exps else pd.DataFrame(columns=["date", "Expense", "Amount"])
-
-        for df_ in (cdf, ldf, edf):
-            if "Amount" in df_.columns:
-                df_["Amount"] = pd.to_numeric(df_["Amount"], errors="coerce").fillna(0.0)
-
-        return cdf, ldf, edf
-    
-    def _sheet_row_to_dict(headers: list[str], values: list[str]) -> dict:
-        if len(values) < len(headers):
-            values = values + [""] * (len(headers) - len(values))
-        return dict(zip(headers, values))
-
-
+    @sheets_action("month_report")
     def fetch_summary_for_month(month_any_date: date) -> pd.DataFrame:
-        """Fetch ONLY the selected month rows from Google Summary sheet."""
-        sh = get_sh()
-        ws = safe_worksheet(sh, SUMMARY_SHEET, summary_headers())
-
+        """Fetch ONLY the selected month rows from the Summary store."""
         headers = summary_headers()
 
-        # Get date column only (col A) to find which rows belong to the month
-        colA = ws.col_values(1)  # includes header at index 0
-        if len(colA) <= 1:
-            return pd.DataFrame(columns=headers)
-
         # month boundaries
         m1 = pd.Timestamp(month_any_date).replace(day=1).date()
         m2 = (pd.Timestamp(m1) + pd.offsets.MonthBegin(1)).date()
 
-        # Find row numbers that match selected month
-        target_rows = []
-        for i, ds in enumerate(colA[1:], start=2):  # start=2 because sheet row 2 is first data
-            try:
-                d = parse_date(ds)
-                if m1 <= d < m2:
-                    target_rows.append(i)
-            except Exception:
-                continue
-
-        if not target_rows:
-            return pd.DataFrame(columns=headers)
-
-        # Read only the matching rows (min..max). Then filter again in python to be safe.
-        start_row = min(target_rows)
-        end_row = max(target_rows)
-        last_col = col_letter(len(headers))
-
-        values = ws.get(f"A{start_row}:{last_col}{end_row}")  # list of rows
-        rows = []
-        for row_vals in values:
-            row_dict = _sheet_row_to_dict(headers, row_vals)
-            try:
-                d = parse_date(row_dict.get("date", ""))
-                if m1 <= d < m2:
-                    rows.append(row_dict)
-            except Exception:
-                pass
-
+        rows = get_backend().fetch_summary_range(m1, m2)
         df = pd.DataFrame(rows)
         if df.empty:
             return pd.DataFrame(columns=headers)
@@ -1441,6 +1741,32 @@ with tab_reports:
         df["date"] = pd.to_datetime(df["date"], errors="coerce")
         df = df.sort_values("date").reset_index(drop=True)
         return df
+
+    @sheets_action("month_items")
+    def fetch_items_for_month(month_any_date: date):
+        """Credit / collection / expense line items of the month, straight from the item tables."""
+        m1 = pd.Timestamp(month_any_date).replace(day=1).date()
+        m2 = (pd.Timestamp(m1) + pd.offsets.MonthBegin(1)).date()
+        backend = get_backend()
+        return items_frames({kind: backend.load_items(kind, m1, m2) for kind in ITEM_KINDS})
+
+    @sheets_action("range_report")
+    def fetch_range_report(start: date, end: date) -> pd.DataFrame:
+        """Per-month totals for [start, end): rollup rows for whole months, raw rows only for partial ones."""
+        backend = get_backend()
+        spans = month_spans(start, end)
+        whole = [m for m, _, _, full in spans if full]
+        rollups = [r for r in backend.load_rollups(whole[0], whole[-1]) if r.get("month") in whole] if whole else []
+        partial = [r for _, lo, hi, full in spans if not full for r in backend.fetch_summary_range(lo, hi)]
+        return range_table(rollups, partial)
+
+    def load_month(month_any_date: date):
+        """(month_df, item frames) from the shared cache; each session gets its own copies."""
+        month_df, items = get_month_cache().get(
+            month_any_date.strftime("%Y-%m"),
+            lambda: (fetch_summary_for_month(month_any_date), fetch_items_for_month(month_any_date)),
+        )
+        return month_df.copy(), tuple(f.copy() for f in items)
     
     st.subheader("Reports")
     m1, m2 = st.columns(2)
@@ -1466,8 +1792,13 @@ with tab_reports:
     if "reports_month_df" not in st.session_state:
         st.session_state["reports_month_df"] = pd.DataFrame()
     # ---------- load ----------
-    if st.button("🔄 Refresh Reports from Google", width='stretch'):
-        st.session_state["reports_month_df"] = fetch_summary_for_month(pick)
+    b1, b2 = st.columns([3, 1])
+    reload_month = b2.button("♻️ Re-read from source", width='stretch',
+                             help="Skip the shared cache, e.g. after editing the sheet by hand.")
+    if b1.button("🔄 Refresh Reports from Google", width='stretch') or reload_month:
+        if reload_month:
+            get_month_cache().invalidate(pick.strftime("%Y-%m"))
+        st.session_state["reports_month_df"], st.session_state["reports_items"] = load_month(pick)
         if st.session_state["reports_month_df"] is None or st.session_state["reports_month_df"].empty:
             st.warning("No data found for selected month.")
         else:
@@ -1481,8 +1812,9 @@ with tab_reports:
         m1 = pd.Timestamp(pick).replace(day=1)
         m2 = (m1 + pd.offsets.MonthBegin(1))
         
-        # Parse JSON once
-        credit_df, coll_df, exp_df = _explode_details(month_df)
+        # Line items from the item tables; details_json only for data loaded before they existed
+        items = st.session_state.get("reports_items")
+        credit_df, coll_df, exp_df = items if items is not None else explode_details(month_df)
 
         # Sub-tabs
         t_sum, t_cash, t_fuel, t_credit, t_exp, t_emp = st.tabs([
@@ -1664,3 +1996,64 @@ with tab_reports:
                     mime="text/csv",
                     width='stretch',
                 )
+
+    # =========================
+    # Range reports (quarter / financial year / custom)
+    # =========================
+    st.divider()
+    st.markdown("### Range Reports")
+
+    r1, r2 = st.columns(2)
+    with r1:
+        range_kind = st.selectbox(
+            "Period", ["Quarter", "Financial Year (Apr–Mar)", "Custom Range"], key="reports_range_kind"
+        )
+    this_fy = financial_year(date.today())
+    fy_options = list(range(this_fy, this_fy - 6, -1))
+    with r2:
+        if range_kind == "Custom Range":
+            picked = st.date_input(
+                "From – To", value=(date.today().replace(day=1), date.today()), key="reports_range_dates"
+            )
+            r_start, r_last = (picked[0], picked[-1]) if isinstance(picked, (list, tuple)) and picked else (picked, picked)
+            r_end = r_last + timedelta(days=1)
+        else:
+            fy = st.selectbox("Financial Year", fy_options, format_func=lambda y: f"FY {y}-{str(y + 1)[-2:]}",
+                              key="reports_range_fy")
+            if range_kind == "Quarter":
+                q = st.selectbox("Quarter", [1, 2, 3, 4],
+                                 format_func=lambda q: ["Q1 (Apr–Jun)", "Q2 (Jul–Sep)", "Q3 (Oct–Dec)", "Q4 (Jan–Mar)"][q - 1],
+                                 key="reports_range_q")
+                r_start, r_end = quarter_bounds(fy, q)
+            else:
+                r_start, r_end = fy_bounds(fy)
+
+    if st.button("🔄 Load Range Report", width='stretch'):
+        st.session_state["reports_range_df"] = fetch_range_report(r_start, r_end)
+        st.session_state["reports_range_label"] = f"{r_start.isoformat()} → {(r_end - timedelta(days=1)).isoformat()}"
+
+    range_df = st.session_state.get("reports_range_df")
+    if range_df is not None:
+        st.caption(st.session_state.get("reports_range_label", ""))
+        if range_df.empty:
+            st.info("No data found for selected range.")
+        else:
+            k1, k2, k3, k4 = st.columns(4)
+            k1.metric("Total Sales", f"₹ {money(_sum_col(range_df, 'total_sales')):.2f}")
+            k2.metric("Cash Deposit", f"₹ {money(_sum_col(range_df, 'cash_to_deposit')):.2f}")
+            k3.metric("QR Total", f"₹ {money(_sum_col(range_df, 'qr_amount')):.2f}")
+            k4.metric("Entries", f"{int(range_df['days'].sum())}")
+
+            st.bar_chart(range_df.set_index("month")[["total_sales", "cash_to_deposit"]])
+            st.dataframe(range_df, width='stretch', hide_index=True)
+
+            st.download_button(
+                "⬇️ Download Range Report CSV",
+                data=range_df.to_csv(index=False).encode("utf-8"),
+                file_name=f"range_{st.session_state.get('reports_range_label', '').replace(' → ', '_')}.csv",
+                mime="text/csv",
+                width='stretch',
+            )
+
+# the script ran to its last line (st.rerun()/st.stop() never get here)
+profile_end()
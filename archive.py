@@ -0,0 +1,98 @@
+"""Local columnar archive of Summary rows.
+
+One Parquet file per month (hp_bunk_data/summary/YYYY-MM.parquet), so saving a
+day rewrites at most ~31 rows instead of the whole history. The xlsx export is
+built from the partitions only when someone asks for it.
+"""
+import os
+import threading
+from io import BytesIO
+
+import pandas as pd
+
+
+# Summary columns kept as text; every other column is stored as a number
+TEXT_COLUMNS = ("date", "employee_name", "notes", "details_json")
+
+
+class SummaryArchive:
+    def __init__(self, root: str, headers: list[str], text_columns=TEXT_COLUMNS):
+        self.root = root
+        self.headers = headers
+        self.text_columns = set(text_columns)
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def partition_path(self, ds: str) -> str:
+        return os.path.join(self.root, f"{str(ds)[:7]}.parquet")
+
+    def partitions(self) -> list[str]:
+        return sorted(
+            os.path.join(self.root, f) for f in os.listdir(self.root) if f.endswith(".parquet")
+        )
+
+    def is_empty(self) -> bool:
+        return not self.partitions()
+
+    def _typed(self, df: pd.DataFrame) -> pd.DataFrame:
+        """One schema across partitions: text columns as str ("" for blanks), the rest float (NaN for blanks).
+
+        Also converts partitions written before numbers were kept (all text).
+        """
+        df = df.reindex(columns=self.headers)
+        for h in self.headers:
+            if h in self.text_columns:
+                df[h] = df[h].fillna("").astype(str)
+            else:
+                df[h] = pd.to_numeric(df[h], errors="coerce").astype("float64")
+        return df
+
+    def _read(self, path: str) -> pd.DataFrame:
+        if not os.path.exists(path):
+            return self._typed(pd.DataFrame(columns=self.headers))
+        return self._typed(pd.read_parquet(path))
+
+    def _write(self, path: str, df: pd.DataFrame):
+        df = self._typed(df)
+        tmp = path + ".tmp"
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+
+    def upsert(self, row: dict):
+        """Replace/insert one day in its month partition."""
+        ds = str(row["date"])
+        path = self.partition_path(ds)
+        with self._lock:
+            old = self._read(path)
+            old = old[old["date"].astype(str) != ds]
+            new = self._typed(pd.DataFrame([[row.get(h, "") for h in self.headers]], columns=self.headers))
+            out = pd.concat([old, new], ignore_index=True) if not old.empty else new
+            self._write(path, out.sort_values("date").reset_index(drop=True))
+
+    def read_all(self) -> pd.DataFrame:
+        parts = [self._read(p) for p in self.partitions()]
+        if not parts:
+            return pd.DataFrame(columns=self.headers)
+        return pd.concat(parts, ignore_index=True).sort_values("date").reset_index(drop=True)
+
+    def import_frame(self, df: pd.DataFrame) -> int:
+        """Bulk load (e.g. the legacy xlsx); later rows win on duplicate dates."""
+        if df is None or df.empty or "date" not in df.columns:
+            return 0
+        df = df.copy()
+        df["date"] = df["date"].astype(str).str[:10]
+        df = df.drop_duplicates("date", keep="last")
+        with self._lock:
+            for month, part in df.groupby(df["date"].str[:7]):
+                path = os.path.join(self.root, f"{month}.parquet")
+                old = self._read(path)
+                old = old[~old["date"].astype(str).isin(part["date"])]
+                out = pd.concat([old, self._typed(part)], ignore_index=True) if not old.empty else self._typed(part)
+                self._write(path, out.sort_values("date").reset_index(drop=True))
+        return len(df)
+
+    def to_xlsx_bytes(self) -> bytes:
+        buf = BytesIO()
+        with pd.ExcelWriter(buf, engine="openpyxl") as writer:
+            self.read_all().to_excel(writer, sheet_name="Summary", index=False)
+        return buf.getvalue()
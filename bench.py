@@ -0,0 +1,191 @@
+"""Benchmark: a day at the bunk replayed against an in-memory Google Sheet.
+
+Seeds fake_gspread with a history of Summary days (plus the item tabs,
+Monthly_Rollup, Ledger and Ledger_Log built from them), then drives
+SheetsBackend through what app.py does on a normal day, with worksheet handles
+kept in a WorksheetCache and row indexes on disk as in the app:
+
+    fetch         Daily Entry "Fetch" of a date                      (fetch_day)
+    save          Daily Entry save: Summary + rollup + line items    (daily_save)
+    ledger_tx     one CREDIT / PAYMENT                               (ledger_tx)
+    month_report  Reports month load on a cache miss: rows + items   (month_report, month_items)
+
+Every API call waits a simulated round-trip (`latency` + up to `jitter`), so
+wall time is roughly calls x latency + local work. `python bench.py` prints
+round-trips and wall time per flow and fails if a warm run of a flow needs more
+round-trips than its BUDGET.
+"""
+import json
+import random
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from fake_gspread import FakeSpreadsheet
+from reports import items_frames, synthetic_summary
+from sheets_io import WorksheetCache
+from storage import (
+    ITEM_KINDS, LEDGER_LOG_SHEET, LEDGER_SHEET, ROLLUP_SHEET, SCHEMA_VERSION, SUMMARY_SHEET,
+    SheetsBackend, item_headers, items_from_details, ledger_headers, ledger_log_headers,
+    migrate_items, rebuild_rollups, rollup_headers, summary_headers,
+)
+
+FLOWS = ["fetch", "save", "ledger_tx", "month_report"]
+# Sheets round-trips a warm run (indexes built, tabs verified) may take; more is a regression
+BUDGET = {"fetch": 1, "save": 4, "ledger_tx": 3, "month_report": 4}
+
+
+def summary_values(ds: str, details_json: str, rnd: random.Random) -> list:
+    """A plausible Summary row for `ds` around the given details_json."""
+    details = json.loads(details_json)
+    totals = {
+        key: round(sum(r["Amount"] for r in details.get(key, [])), 2)
+        for key in ("customer_credit_rows", "debt_collection_rows", "other_expense_rows")
+    }
+    p_open = rnd.randint(10000, 90000)
+    d_open = rnd.randint(10000, 90000)
+    p_liters, d_liters = round(rnd.uniform(300, 900), 2), round(rnd.uniform(500, 1500), 2)
+    row = {
+        "date": ds, "employee_name": rnd.choice(["Ravi", "Sita", "Manoj"]), "notes": "",
+        "p_open": p_open, "p_close": round(p_open + p_liters + 5, 2), "p_test": 5, "p_rate": 102.5,
+        "d_open": d_open, "d_close": round(d_open + d_liters + 5, 2), "d_test": 5, "d_rate": 89.6,
+        "petrol_liters_sold": p_liters, "petrol_amount": round(p_liters * 102.5, 2),
+        "diesel_liters_sold": d_liters, "diesel_amount": round(d_liters * 89.6, 2),
+        "oil_packets": rnd.randint(0, 12), "oil_price": 350, "oil_amount": 0,
+        "qr_amount": round(rnd.uniform(5000, 40000), 2), "advance_paid": 0,
+        "owner_phonepay_amount": 0, "yesterday_balance_amount": 0,
+        "customer_credit_total": totals["customer_credit_rows"],
+        "debt_collections_total": totals["debt_collection_rows"],
+        "other_expenses_total": totals["other_expense_rows"],
+        "details_json": details_json,
+    }
+    row["oil_amount"] = row["oil_packets"] * row["oil_price"]
+    row["total_sales"] = round(row["petrol_amount"] + row["diesel_amount"] + row["oil_amount"], 2)
+    row["cash_to_deposit"] = round(
+        row["total_sales"] - row["qr_amount"] - totals["customer_credit_rows"]
+        + totals["debt_collection_rows"] - totals["other_expense_rows"], 2)
+    return [row.get(h, "") for h in summary_headers()]
+
+
+def _log_row(customer: str, delta: float, before: float, after: float) -> list:
+    now = datetime.now()
+    return [now.strftime("%Y-%m-%d %H:%M:%S"), now.strftime("%Y-%m-%d"), "CREDIT" if delta > 0 else "PAYMENT",
+            customer, abs(delta), before, after, "bench", ""]
+
+
+def seed(sh: FakeSpreadsheet, days: int, seed_: int = 7) -> tuple[list[str], date]:
+    """History of `days` days ending yesterday; returns (customers, today)."""
+    rnd = random.Random(seed_)
+    history = synthetic_summary(years=max(1, -(-days // 365)), seed=seed_).tail(days)
+    first = date.today() - timedelta(days=days)
+    summary = sh.add_worksheet(SUMMARY_SHEET, summary_headers())
+    for i, details_json in enumerate(history["details_json"]):
+        summary.rows.append(summary_values((first + timedelta(days=i)).isoformat(), details_json, rnd))
+    for kind in ITEM_KINDS:
+        sh.add_worksheet(ITEM_KINDS[kind][0], item_headers(kind))
+    sh.add_worksheet(ROLLUP_SHEET, rollup_headers())
+
+    loader = SheetsBackend(lambda name, headers: sh.worksheet(name))
+    migrate_items(loader)
+    rebuild_rollups(loader)
+
+    customers = sorted({
+        name for details_json in history["details_json"]
+        for name, _ in items_from_details(details_json).get("credit", [])
+    })
+    ledger = sh.add_worksheet(LEDGER_SHEET, ledger_headers())
+    ledger.rows += [[c, round(rnd.uniform(0, 20000), 2), "0"] for c in customers]
+    log = sh.add_worksheet(LEDGER_LOG_SHEET, ledger_log_headers())
+    log.rows += [_log_row(rnd.choice(customers), round(rnd.uniform(-2000, 2000), 2), 0, 0) for _ in range(days * 4)]
+    sh.reset_calls()
+    return customers, date.today()
+
+
+def _verify_headers(ws, headers):
+    # what app.ensure_headers does the first time a tab is opened
+    if ws.row_values(1) != headers:
+        ws.update("A1", [headers])
+
+
+def run(days: int = 730, latency: float = 0.12, jitter: float = 0.04, ledger_txs: int = 12, seed_: int = 7) -> dict:
+    """Replay one day; returns {flow: {runs, cold/warm calls, wall times}} plus the totals."""
+    sh = FakeSpreadsheet(seed=seed_)
+    customers, today = seed(sh, days, seed_)
+    sh.latency, sh.jitter = latency, jitter
+    rnd = random.Random(seed_ + 1)
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        cache = WorksheetCache(SCHEMA_VERSION)
+        backend = SheetsBackend(lambda name, headers: cache.get(name, headers, sh.worksheet, _verify_headers),
+                                index_dir, forget_ws=cache.forget)
+        today_s, yesterday = today.isoformat(), (today - timedelta(days=1)).isoformat()
+        details = synthetic_summary(years=1, seed=seed_ + 2)["details_json"].iloc[0]
+        values = summary_values(today_s, details, rnd)
+        month_start = today.replace(day=1)
+        prev_month = (month_start - timedelta(days=1)).replace(day=1)
+
+        def month_report(start: date):
+            end = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+            rows = backend.fetch_summary_range(start, end)
+            return rows, items_frames({kind: backend.load_items(kind, start, end) for kind in ITEM_KINDS})
+
+        def save():
+            backend.upsert_summary(values)
+            backend.replace_day_items(today_s, items_from_details(details))
+
+        def ledger_tx():
+            customer = rnd.choice(customers)
+            delta = round(rnd.choice((1, -1)) * rnd.uniform(50, 3000), 2)
+            backend.post_ledger_entry(customer, delta, lambda before, after: _log_row(customer, delta, before, after))
+
+        day = (
+            [("fetch", lambda: backend.fetch_summary(yesterday))]     # opening readings
+            + [("ledger_tx", ledger_tx)] * (ledger_txs // 2)
+            + [("save", save)]                                         # first save: appends the day
+            + [("ledger_tx", ledger_tx)] * (ledger_txs - ledger_txs // 2)
+            + [("fetch", lambda: backend.fetch_summary(today_s))]
+            + [("save", save)]                                         # a correction: rewrites it in place
+            + [("month_report", lambda: month_report(month_start)),
+               ("month_report", lambda: month_report(prev_month))]
+        )
+
+        res = {f: {"runs": 0, "calls": [], "ms": [], "last": {}} for f in FLOWS}
+        t_day = time.perf_counter()
+        for flow, fn in day:
+            sh.reset_calls()
+            t0 = time.perf_counter()
+            fn()
+            res[flow]["ms"].append((time.perf_counter() - t0) * 1000)
+            calls = sh.reset_calls()
+            res[flow]["calls"].append(sum(calls.values()))
+            res[flow]["last"] = dict(calls)
+            res[flow]["runs"] += 1
+        day_ms = (time.perf_counter() - t_day) * 1000
+
+    out = {}
+    for flow, r in res.items():
+        warm_calls, warm_ms = r["calls"][1:] or r["calls"], r["ms"][1:] or r["ms"]
+        out[flow] = {
+            "runs": r["runs"],
+            "cold_calls": r["calls"][0],
+            "warm_calls": max(warm_calls),
+            "cold_ms": round(r["ms"][0], 1),
+            "warm_ms": round(sum(warm_ms) / len(warm_ms), 1),
+            "last_run": r["last"],
+        }
+    out["day"] = {"calls": sum(sum(r["calls"]) for r in res.values()), "ms": round(day_ms, 1)}
+    return out
+
+
+if __name__ == "__main__":
+    for latency in (0.0, 0.12):
+        r = run(latency=latency, jitter=0.04 if latency else 0.0)
+        print(f"latency {latency * 1000:.0f} ms/call:")
+        for flow in FLOWS:
+            f = r[flow]
+            print(f"  {flow:<13} x{f['runs']:<3} round-trips cold {f['cold_calls']:>3} warm {f['warm_calls']:>2} "
+                  f"(budget {BUDGET[flow]}) | wall cold {f['cold_ms']:8.1f} ms warm {f['warm_ms']:8.1f} ms | "
+                  + ", ".join(f"{m} {n}" for m, n in sorted(f["last_run"].items())))
+        print(f"  whole day: {r['day']['calls']} round-trips, {r['day']['ms']:.0f} ms")
+        over = {flow: r[flow]["warm_calls"] for flow in FLOWS if r[flow]["warm_calls"] > BUDGET[flow]}
+        assert not over, f"round-trip budget exceeded: {over}"
@@ -0,0 +1,202 @@
+"""Concurrency harness for ledger writes: N attendants posting at once.
+
+Every thread gets its own SheetsBackend (its own row indexes, like separate app
+processes) over one shared in-memory spreadsheet (fake_gspread), and posts random
+CREDIT/PAYMENT deltas for a few customers. Each call sleeps a random latency first
+so threads interleave between reads and writes as they do over the network.
+The Ledger starts empty, so the first posts to a customer race to append its row.
+Afterwards each customer's Ledger balance must equal the sum of every delta that
+was reported as posted, the Ledger must hold one row per customer, and Ledger_Log
+one row per posted entry.
+
+`run_fresh` is the worst case for appends: every round, all threads wait at a
+barrier and then post to the same customer nobody has seen yet. `run_day` has
+them save the same Daily Entry date at once (post_day_ledger): Ledger_Postings
+must end up with one row per (date, customer), and every balance must equal the
+sum of its postings.
+
+`python concurrency.py` runs both with compare-and-swap on (must lose nothing) and
+off (shows how many updates the plain read-modify-write loses).
+"""
+import random
+import threading
+import time
+from datetime import datetime
+
+from fake_gspread import FakeSpreadsheet
+from storage import (
+    LEDGER_LOG_SHEET, LEDGER_POSTINGS_SHEET, LEDGER_SHEET, SheetsBackend, _num, ledger_headers,
+    ledger_log_headers, ledger_posting_headers,
+)
+
+
+def _log_row(customer: str, delta: float, before: float, after: float, employee: str) -> list:
+    return [
+        datetime.now().strftime("%Y-%m-%d %H:%M:%S"), datetime.now().strftime("%Y-%m-%d"),
+        "CREDIT" if delta > 0 else "PAYMENT", customer, abs(delta), before, after, employee, "harness",
+    ]
+
+
+def run(threads: int = 8, txs: int = 20, customers: int = 4, cas: bool = True,
+        latency: float = 0.005, seed: int = 11) -> dict:
+    sh = FakeSpreadsheet(jitter=latency, seed=seed)
+    sh.add_worksheet(LEDGER_SHEET, ledger_headers())
+    sh.add_worksheet(LEDGER_LOG_SHEET, ledger_log_headers())
+    names = [f"Customer {i}" for i in range(customers)]
+
+    posted: list[tuple[str, float]] = []
+    busy = []
+    lock = threading.Lock()
+
+    def attendant(n: int):
+        rnd = random.Random(seed * 1000 + n)
+        backend = SheetsBackend(lambda name, headers: sh.worksheet(name), cas=cas)
+        employee = f"attendant {n}"
+        for _ in range(txs):
+            entries = [(c, round(rnd.choice((1, -1)) * rnd.uniform(1, 500), 2))
+                       for c in rnd.sample(names, rnd.randint(1, 2))]
+            try:
+                backend.post_ledger_entries(
+                    entries, lambda i, before, after: _log_row(*entries[i], before, after, employee))
+            except RuntimeError:
+                with lock:
+                    busy.append(entries)
+                continue
+            with lock:
+                posted.extend(entries)
+
+    t0 = time.perf_counter()
+    workers = [threading.Thread(target=attendant, args=(n,)) for n in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - t0
+    return _check(sh, names, posted, busy, cas, elapsed)
+
+
+def run_fresh(threads: int = 4, rounds: int = 20, cas: bool = True, latency: float = 0.005, seed: int = 11) -> dict:
+    """Each round, `threads` attendants released together post to one customer new to the Ledger."""
+    sh = FakeSpreadsheet(jitter=latency, seed=seed)
+    sh.add_worksheet(LEDGER_SHEET, ledger_headers())
+    sh.add_worksheet(LEDGER_LOG_SHEET, ledger_log_headers())
+    names = [f"New Guy {i}" for i in range(rounds)]
+
+    posted: list[tuple[str, float]] = []
+    busy = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def attendant(n: int):
+        backend = SheetsBackend(lambda name, headers: sh.worksheet(name), cas=cas)
+        employee = f"attendant {n}"
+        for name in names:
+            entries = [(name, 100.0)]
+            barrier.wait()
+            try:
+                backend.post_ledger_entries(
+                    entries, lambda i, before, after: _log_row(*entries[i], before, after, employee))
+            except RuntimeError:
+                with lock:
+                    busy.append(entries)
+                continue
+            with lock:
+                posted.extend(entries)
+
+    t0 = time.perf_counter()
+    workers = [threading.Thread(target=attendant, args=(n,)) for n in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - t0
+    return _check(sh, names, posted, busy, cas, elapsed)
+
+
+def run_day(threads: int = 4, rounds: int = 15, customers: int = 3, cas: bool = True,
+            latency: float = 0.005, seed: int = 11) -> dict:
+    """Each round, `threads` attendants released together save one of two dates with their own lines."""
+    sh = FakeSpreadsheet(jitter=latency, seed=seed)
+    sh.add_worksheet(LEDGER_SHEET, ledger_headers())
+    sh.add_worksheet(LEDGER_LOG_SHEET, ledger_log_headers())
+    sh.add_worksheet(LEDGER_POSTINGS_SHEET, ledger_posting_headers())
+    names = [f"Customer {i}" for i in range(customers)]
+    dates = ["2024-05-01", "2024-05-02"]
+
+    busy = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def attendant(n: int):
+        rnd = random.Random(seed * 1000 + n)
+        backend = SheetsBackend(lambda name, headers: sh.worksheet(name), cas=cas)
+        employee = f"attendant {n}"
+        for _ in range(rounds):
+            ds = rnd.choice(dates)
+            net = {c: round(rnd.uniform(-300, 500), 2) for c in rnd.sample(names, rnd.randint(1, customers))}
+            barrier.wait()
+            try:
+                backend.post_day_ledger(ds, net, lambda c, d, before, after: _log_row(c, d, before, after, employee))
+            except RuntimeError:
+                with lock:
+                    busy.append((ds, net))
+
+    t0 = time.perf_counter()
+    workers = [threading.Thread(target=attendant, args=(n,)) for n in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - t0
+
+    check = SheetsBackend(lambda name, headers: sh.worksheet(name))
+    postings = check.load_postings()
+    keys = [(r["date"], r["Customer"]) for r in postings]
+    first: dict[tuple, float] = {}
+    for r in postings:
+        first.setdefault((r["date"], r["Customer"]), _num(r["Posted"]))   # the row the app reads
+    r = _check(sh, names, [(c, amount) for (_, c), amount in first.items()], busy, cas, elapsed)
+    r["duplicate_postings"] = len(keys) - len(first)
+    r["entries"] = r["log_rows"]   # every log row is one posted change
+    return r
+
+
+def _check(sh: FakeSpreadsheet, names: list[str], posted: list, busy: list, cas: bool, elapsed: float) -> dict:
+    check = SheetsBackend(lambda name, headers: sh.worksheet(name))
+    ledger = check.load_ledger()
+    balances: dict[str, float] = {}
+    for r in ledger:
+        # the app reads a customer's first row; a duplicate's balance is lost to it
+        balances.setdefault(r["Customer"], _num(r["Outstanding"]))
+    expected = {c: 0.0 for c in names}
+    for c, d in posted:
+        expected[c] += d
+    lost = {c: round(expected[c] - balances.get(c, 0.0), 2) for c in names}
+    logs = len(check.load_ledger_logs())
+    return {
+        "cas": cas,
+        "entries": len(posted),
+        "busy": len(busy),
+        "log_rows": logs,
+        "ledger_rows": len(ledger),
+        "duplicate_ledger_rows": len(ledger) - len(balances),
+        "lost": {c: v for c, v in lost.items() if abs(v) > 0.005},
+        "calls": sh.total_calls(),
+        "seconds": round(elapsed, 2),
+    }
+
+
+if __name__ == "__main__":
+    for label, fn in (("mixed", run), ("fresh", run_fresh), ("day", run_day)):
+        for cas in (True, False):
+            r = fn(cas=cas)
+            print(
+                f"{label} cas={'on ' if cas else 'off'} {r['entries']:4} entries ({r['busy']} busy), "
+                f"{r['log_rows']} log rows, {r['ledger_rows']} ledger rows ({r['duplicate_ledger_rows']} duplicate), "
+                f"{r['calls']} calls, {r['seconds']} s | lost: {r['lost'] or 'none'}"
+            )
+            if cas:
+                assert not r["lost"], r["lost"]
+                assert r["log_rows"] == r["entries"], (r["log_rows"], r["entries"])
+                assert not r["duplicate_ledger_rows"], r["duplicate_ledger_rows"]
+                assert not r.get("duplicate_postings"), r["duplicate_postings"]
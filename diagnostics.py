@@ -0,0 +1,103 @@
+"""Startup diagnostics: where the cold-start import time goes.
+
+Runs a fresh interpreter with `-X importtime`, importing what app.py imports at
+start, then the heavy modules it only loads on demand, and parses the report.
+"""
+import json
+import os
+import subprocess
+import sys
+
+# imported by app.py on every cold start
+STARTUP_MODULES = [
+    "pandas", "streamlit",
+    "storage", "sync", "offline", "ledger", "archive", "render_cache", "png_render", "pdf_render",
+    "settings_cache", "month_cache", "sheets_io", "reports", "diagnostics", "profiling",
+]
+# only imported inside the code paths that need them
+LAZY_MODULES = {
+    "reportlab.pdfgen.canvas": "PDF export",
+    "matplotlib.pyplot": "PNG export (png_renderer = matplotlib)",
+    "PIL.ImageDraw": "PNG export",
+    "openpyxl": "Excel export / legacy xlsx import",
+    "gspread": "Google Sheets I/O",
+    "google.oauth2.service_account": "Google Sheets auth",
+}
+
+
+def parse_importtime(stderr: str) -> list[dict]:
+    """`import time: self [us] | cumulative | name` lines -> rows (depth 0 = imported directly)."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        try:
+            self_us, cum_us, name = line[len("import time:"):].split("|", 2)
+            stripped = name.lstrip()
+            rows.append({
+                "module": stripped.strip(),
+                "depth": (len(name) - len(stripped) - 1) // 2,
+                "self_ms": int(self_us) / 1000,
+                "cumulative_ms": int(cum_us) / 1000,
+            })
+        except ValueError:
+            continue
+    return rows
+
+
+_PROBE = """
+import importlib, json, sys, time
+out = []
+for m in json.loads(sys.argv[1]):
+    t0 = time.perf_counter()
+    try:
+        importlib.import_module(m)
+        err = ""
+    except Exception as e:
+        err = f"{type(e).__name__}: {e}"
+    out.append({"module": m, "ms": round((time.perf_counter() - t0) * 1000, 1), "error": err})
+print(json.dumps(out))
+"""
+
+
+def import_profile(timeout: float = 120) -> dict:
+    """Cold import cost of the startup set and, on top of it, each lazy module.
+
+    Each module is timed in import order, so a module's cost excludes whatever an
+    earlier one already loaded (e.g. gspread pulls in most of google.oauth2).
+    """
+    wanted = STARTUP_MODULES + list(LAZY_MODULES)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE, json.dumps(wanted)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, timeout=timeout,
+    )
+    try:
+        timed = json.loads(proc.stdout.strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        raise RuntimeError(proc.stderr[-2000:] or "import probe produced no output")
+
+    breakdown = [
+        {**t, "when": "startup" if t["module"] in STARTUP_MODULES else f"lazy: {LAZY_MODULES[t['module']]}"}
+        for t in timed
+    ]
+    startup_ms = sum(b["ms"] for b in breakdown if b["when"] == "startup")
+    rows = parse_importtime(proc.stderr)
+    return {
+        "breakdown": breakdown,
+        "startup_ms": round(startup_ms, 1),
+        "deferred_ms": round(sum(b["ms"] for b in breakdown) - startup_ms, 1),
+        "slowest": sorted(rows, key=lambda r: -r["self_ms"])[:25],
+    }
+
+
+def loaded_lazy_modules() -> list[str]:
+    """Lazy modules this process has already paid for."""
+    return [m for m in LAZY_MODULES if m in sys.modules]
+
+
+if __name__ == "__main__":
+    prof = import_profile()
+    for b in prof["breakdown"]:
+        print(f"{b['ms']:9.1f} ms  {b['module']:<32} {b['when']} {b['error']}")
+    print(f"startup {prof['startup_ms']} ms, deferred {prof['deferred_ms']} ms")
@@ -0,0 +1,279 @@
+"""In-memory stand-in for a gspread Spreadsheet, for harnesses and benchmarks.
+
+Implements what SheetsBackend uses: worksheet reads/writes by A1 range,
+values_batch_get / values_batch_update, and batchUpdate with updateCells,
+appendCells and findReplace (with its occurrencesChanged reply). Each call holds
+the spreadsheet's lock, so a call is atomic as one API request is, and threads
+can race each other between calls the way separate app processes do.
+
+Every call is counted per method (`calls`) and can be made to wait `latency`
+seconds plus up to `jitter` more first, to stand in for the network round-trip
+(see bench.py).
+"""
+import random
+import re
+import threading
+import time
+from collections import Counter
+
+_A1 = re.compile(r"^([A-Z]*)(\d*)$")
+
+
+def _col(letters: str) -> int:
+    n = 0
+    for ch in letters:
+        n = n * 26 + ord(ch) - 64
+    return n
+
+
+def _split_tab(a1: str) -> tuple[str | None, str]:
+    """"'Ledger'!A2:C2" -> ("Ledger", "A2:C2")."""
+    if "!" not in a1:
+        return None, a1
+    tab, rng = a1.rsplit("!", 1)
+    if tab.startswith("'") and tab.endswith("'"):
+        tab = tab[1:-1].replace("''", "'")
+    return tab, rng
+
+
+def _grid(rng: str) -> tuple[int, int, int, int]:
+    """A1 range -> 0-based (first row, end row, first col, end col); open ends are unbounded."""
+    lo, _, hi = rng.upper().partition(":")
+    hi = hi or lo
+    (c0, r0), (c1, r1) = _A1.match(lo).groups(), _A1.match(hi).groups()
+    return (int(r0) - 1 if r0 else 0, int(r1) if r1 else 10 ** 9,
+            _col(c0) - 1 if c0 else 0, _col(c1) if c1 else 10 ** 9)
+
+
+def _trim(rows: list[list]) -> list[list]:
+    """Drop trailing empty cells and rows, as the Sheets API does."""
+    out = []
+    for row in rows:
+        row = list(row)
+        while row and row[-1] in ("", None):
+            row.pop()
+        out.append(row)
+    while out and not out[-1]:
+        out.pop()
+    return out
+
+
+def _entered(v, input_option: str):
+    """USER_ENTERED parses numbers and drops a leading apostrophe; RAW stores as given."""
+    if input_option != "USER_ENTERED" or not isinstance(v, str):
+        return v
+    if v.startswith("'"):
+        return v[1:]
+    try:
+        return int(v) if re.fullmatch(r"-?\d+", v) else float(v) if re.fullmatch(r"-?\d*\.\d+", v) else v
+    except ValueError:
+        return v
+
+
+def _text(v) -> str:
+    """A stored value as the API shows it (FORMATTED_VALUE)."""
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return "" if v is None else str(v)
+
+
+def _user_value(cell: dict):
+    v = cell.get("userEnteredValue") or {}
+    return next(iter(v.values()), "")
+
+
+class FakeWorksheet:
+    def __init__(self, spreadsheet: "FakeSpreadsheet", sheet_id: int, title: str, headers: list | None = None):
+        self.spreadsheet = spreadsheet
+        self.id = sheet_id
+        self.title = title
+        self.rows: list[list] = [list(headers)] if headers else []
+
+    # -- internals, caller holds the lock --
+    def _read(self, rng: str) -> list[list]:
+        r0, r1, c0, c1 = _grid(rng)
+        return _trim([[_text(v) for v in row[c0:c1]] for row in self.rows[r0:r1]])
+
+    def _write(self, row_no: int, col_no: int, values: list[list]):
+        for i, vals in enumerate(values):
+            while len(self.rows) < row_no + i:
+                self.rows.append([])
+            row = self.rows[row_no + i - 1]
+            row.extend([""] * (col_no - 1 + len(vals) - len(row)))
+            row[col_no - 1:col_no - 1 + len(vals)] = list(vals)
+
+    def _append(self, values: list[list]) -> int:
+        """Append after the last non-empty row; returns the first new row number."""
+        while self.rows and not any(v not in ("", None) for v in self.rows[-1]):
+            self.rows.pop()
+        first = len(self.rows) + 1
+        self.rows.extend(list(v) for v in values)
+        return first
+
+    # -- gspread Worksheet API --
+    def get(self, rng: str = "A1:ZZ", **_):
+        with self.spreadsheet.call("get"):
+            return self._read(rng)
+
+    def batch_get(self, ranges: list[str], **_):
+        with self.spreadsheet.call("batch_get"):
+            return [self._read(r) for r in ranges]
+
+    def col_values(self, col: int, **_):
+        with self.spreadsheet.call("col_values"):
+            out = [_text(r[col - 1]) if len(r) >= col else "" for r in self.rows]
+            while out and out[-1] == "":
+                out.pop()
+            return out
+
+    def row_values(self, row: int, **_):
+        with self.spreadsheet.call("row_values"):
+            return (_trim([[_text(v) for v in self.rows[row - 1]]]) or [[]])[0] if row <= len(self.rows) else []
+
+    def get_all_records(self, **_):
+        with self.spreadsheet.call("get_all_records"):
+            if not self.rows:
+                return []
+            headers = [_text(h) for h in self.rows[0]]
+            return [
+                dict(zip(headers, list(r) + [""] * (len(headers) - len(r))))
+                for r in self.rows[1:] if any(v not in ("", None) for v in r)
+            ]
+
+    def update(self, rng: str, values: list[list], value_input_option: str = "RAW", **_):
+        with self.spreadsheet.call("update"):
+            r0, _, c0, _ = _grid(_split_tab(rng)[1])
+            self._write(r0 + 1, c0 + 1, [[_entered(v, value_input_option) for v in row] for row in values])
+
+    def append_row(self, values: list, value_input_option: str = "RAW", **_):
+        with self.spreadsheet.call("append_row"):
+            first = self._append([[_entered(v, value_input_option) for v in values]])
+            return {"updates": {"updatedRange": f"{self.title}!A{first}"}}
+
+    def append_rows(self, values: list[list], value_input_option: str = "RAW", **_):
+        with self.spreadsheet.call("append_rows"):
+            first = self._append([[_entered(v, value_input_option) for v in row] for row in values])
+            return {"updates": {"updatedRange": f"{self.title}!A{first}"}}
+
+    def clear(self):
+        with self.spreadsheet.call("clear"):
+            self.rows = []
+
+
+class _Call:
+    def __init__(self, spreadsheet: "FakeSpreadsheet", name: str):
+        self.spreadsheet, self.name = spreadsheet, name
+
+    def __enter__(self):
+        self.spreadsheet.before_call(self.name)
+        self.spreadsheet.lock.acquire()
+
+    def __exit__(self, *exc):
+        self.spreadsheet.lock.release()
+        return False
+
+
+class FakeSpreadsheet:
+    """Tabs by title; `add_worksheet` creates one (optionally with its header row)."""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, seed: int | None = None):
+        self.lock = threading.RLock()
+        self._tabs: dict[str, FakeWorksheet] = {}
+        self.latency = latency
+        self.jitter = jitter
+        self.calls: Counter = Counter()   # method -> calls
+        self._stats_lock = threading.Lock()
+        self._rnd = random.Random(seed)
+
+    def before_call(self, name: str):
+        """Runs before every API call, outside the lock: counts it and sleeps the simulated round-trip."""
+        with self._stats_lock:
+            self.calls[name] += 1
+            wait = self.latency + (self._rnd.uniform(0, self.jitter) if self.jitter else 0.0)
+        if wait > 0:
+            time.sleep(wait)
+
+    def total_calls(self) -> int:
+        with self._stats_lock:
+            return sum(self.calls.values())
+
+    def reset_calls(self) -> Counter:
+        """The counts so far; starts counting from zero."""
+        with self._stats_lock:
+            out, self.calls = self.calls, Counter()
+            return out
+
+    def call(self, name: str) -> _Call:
+        return _Call(self, name)
+
+    def add_worksheet(self, title: str, headers: list | None = None, **_) -> FakeWorksheet:
+        with self.lock:
+            ws = self._tabs[title] = FakeWorksheet(self, len(self._tabs) + 1, title, headers)
+            return ws
+
+    def worksheet(self, title: str) -> FakeWorksheet:
+        with self.call("worksheet"):
+            if title not in self._tabs:
+                raise KeyError(f"no worksheet {title!r}")
+            return self._tabs[title]
+
+    def worksheets(self) -> list[FakeWorksheet]:
+        with self.call("worksheets"):
+            return list(self._tabs.values())
+
+    def _by_id(self, sheet_id: int) -> FakeWorksheet:
+        return next(ws for ws in self._tabs.values() if ws.id == sheet_id)
+
+    def values_batch_get(self, ranges: list[str], params: dict | None = None):
+        with self.call("values_batch_get"):
+            out = []
+            for a1 in ranges:
+                tab, rng = _split_tab(a1)
+                values = self._tabs[tab]._read(rng)
+                out.append({"range": a1, "values": values} if values else {"range": a1})
+            return {"valueRanges": out}
+
+    def values_batch_update(self, body: dict):
+        with self.call("values_batch_update"):
+            option = body.get("valueInputOption", "RAW")
+            for d in body.get("data", []):
+                tab, rng = _split_tab(d["range"])
+                r0, _, c0, _ = _grid(rng)
+                self._tabs[tab]._write(r0 + 1, c0 + 1, [[_entered(v, option) for v in row] for row in d["values"]])
+            return {"totalUpdatedRows": sum(len(d["values"]) for d in body.get("data", []))}
+
+    def batch_update(self, body: dict):
+        with self.call("batch_update"):
+            return {"replies": [self._request(req) for req in body.get("requests", [])]}
+
+    def _request(self, req: dict) -> dict:
+        if "updateCells" in req:
+            u = req["updateCells"]
+            ws = self._by_id(u["start"]["sheetId"])
+            ws._write(u["start"]["rowIndex"] + 1, u["start"]["columnIndex"] + 1,
+                      [[_user_value(c) for c in row["values"]] for row in u["rows"]])
+            return {}
+        if "appendCells" in req:
+            a = req["appendCells"]
+            self._by_id(a["sheetId"])._append([[_user_value(c) for c in row["values"]] for row in a["rows"]])
+            return {}
+        if "findReplace" in req:
+            return {"findReplace": self._find_replace(req["findReplace"])}
+        raise NotImplementedError(f"batchUpdate request {next(iter(req))}")
+
+    def _find_replace(self, f: dict) -> dict:
+        if not f.get("find"):
+            raise ValueError("findReplace needs a non-empty 'find'")
+        if not (f.get("matchCase") and f.get("matchEntireCell")) or f.get("searchByRegex"):
+            raise NotImplementedError("only case-sensitive whole-cell findReplace is supported")
+        rng = f["range"]
+        ws = self._by_id(rng["sheetId"])
+        changed = 0
+        for r in range(rng.get("startRowIndex", 0), min(rng.get("endRowIndex", len(ws.rows)), len(ws.rows))):
+            row = ws.rows[r]
+            for c in range(rng.get("startColumnIndex", 0), min(rng.get("endColumnIndex", len(row)), len(row))):
+                if _text(row[c]) == f["find"]:
+                    row[c] = f["replacement"]
+                    changed += 1
+        return {"valuesChanged": changed, "occurrencesChanged": changed, "rowsChanged": min(changed, 1),
+                "sheetsChanged": min(changed, 1), "formulasChanged": 0}
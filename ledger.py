@@ -0,0 +1,262 @@
+"""Event-sourced ledger.
+
+Ledger_Log is the source of truth: a customer's balance is the fold of their
+CREDIT (+) / PAYMENT (-) events. Periodic snapshots (Ledger_Snapshots) store the
+fold up to a log position, so startup reads one snapshot + the tail of the log.
+
+A snapshot also records the latest Entry_Date it contains. Every event in it is
+dated on or before that day, so for any date X >= Max_Entry_Date the snapshot is
+exactly "all events up to its position dated <= X", and "balance as of X" is that
+snapshot + tail events dated <= X.
+
+A snapshot at position 0 holds the opening balances, owed before the first
+logged event (written by `seed()`). They are the base of every fold: snapshots
+taken after it include them, earlier ones are no longer used.
+"""
+import json
+import threading
+from datetime import date, datetime, timedelta
+
+from storage import StorageBackend
+
+
+SNAPSHOT_EVERY = 500   # events between automatic snapshots
+
+
+def _amount(v) -> float:
+    try:
+        return float(str(v).replace(",", "").strip() or 0)
+    except Exception:
+        return 0.0
+
+
+def _entry_date(v) -> str:
+    return str(v or "")[:10]
+
+
+def apply_event(balances: dict, event: dict):
+    customer = str(event.get("Customer", "")).strip()
+    if not customer:
+        return
+    amt = _amount(event.get("Amount"))
+    typ = str(event.get("Type", "")).strip().upper()
+    if typ == "CREDIT":
+        balances[customer] = balances.get(customer, 0.0) + amt
+    elif typ == "PAYMENT":
+        balances[customer] = balances.get(customer, 0.0) - amt
+
+
+def fold(events, balances: dict | None = None, as_of: str | None = None) -> dict:
+    """Fold (seq, event) pairs into balances; `as_of` (ISO date) skips later-dated events."""
+    out = dict(balances or {})
+    for _, ev in events:
+        if as_of is None or _entry_date(ev.get("Entry_Date")) <= as_of:
+            apply_event(out, ev)
+    return out
+
+
+class Snapshot:
+    def __init__(self, seq: int, max_entry_date: str, balances: dict, taken_at: str = ""):
+        self.seq = seq
+        self.max_entry_date = max_entry_date
+        self.balances = balances
+        self.taken_at = taken_at
+
+    @classmethod
+    def from_row(cls, r: dict) -> "Snapshot":
+        return cls(
+            int(_amount(r.get("Log_Seq"))),
+            _entry_date(r.get("Max_Entry_Date")),
+            {k: float(v) for k, v in json.loads(r.get("Balances_JSON") or "{}").items()},
+            str(r.get("Snapshot_Timestamp", "")),
+        )
+
+    def to_row(self) -> list:
+        return [
+            self.taken_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            self.seq,
+            self.max_entry_date,
+            json.dumps({k: round(v, 2) for k, v in self.balances.items()}, ensure_ascii=False),
+        ]
+
+
+class LedgerProjection:
+    """Process-wide view of balances = latest snapshot + tail of Ledger_Log.
+
+    `refresh()` only reads log rows after the last position it has seen.
+    """
+
+    def __init__(self, backend: StorageBackend, snapshot_every: int = SNAPSHOT_EVERY):
+        self.backend = backend
+        self.snapshot_every = snapshot_every
+        self._lock = threading.RLock()
+        self.snapshots: list[Snapshot] = []
+        self.opening: dict = {}   # balances before the first logged event (seeded)
+        self.balances: dict = {}
+        self.seq = 0
+        self.max_entry_date = ""
+        self._loaded = False
+
+    def _load(self):
+        snapshots = [Snapshot.from_row(r) for r in self.backend.load_ledger_snapshots()]
+        seeds = [i for i, s in enumerate(snapshots) if s.seq == 0]
+        if seeds:
+            # snapshots written before the latest seed don't carry its opening balances
+            self.opening = snapshots[seeds[-1]].balances
+            snapshots = snapshots[seeds[-1] + 1:]
+        self.snapshots = sorted(snapshots, key=lambda s: s.seq)
+        base = self.snapshots[-1] if self.snapshots else Snapshot(0, "", self.opening)
+        self.balances = dict(base.balances)
+        self.seq = base.seq
+        self.max_entry_date = base.max_entry_date
+        self._loaded = True
+
+    def refresh(self) -> "LedgerProjection":
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            tail = self.backend.load_ledger_events(self.seq)
+            for seq, ev in tail:
+                apply_event(self.balances, ev)
+                self.seq = max(self.seq, seq)
+                self.max_entry_date = max(self.max_entry_date, _entry_date(ev.get("Entry_Date")))
+            last = self.snapshots[-1].seq if self.snapshots else 0
+            if self.seq - last >= self.snapshot_every:
+                self.snapshot()
+        return self
+
+    def snapshot(self) -> Snapshot:
+        with self._lock:
+            snap = Snapshot(self.seq, self.max_entry_date, dict(self.balances))
+            self.backend.append_ledger_snapshot(snap.to_row())
+            self.snapshots.append(snap)
+            return snap
+
+    def seed(self, balances: dict) -> Snapshot:
+        """Adopt existing balances (e.g. the Ledger tab) as of the current log position.
+
+        Stored as opening balances (`balances` minus what the log adds up to), so
+        balances as of earlier dates keep them too.
+        """
+        with self._lock:
+            self.refresh()
+            logged = {k: v - self.opening.get(k, 0.0) for k, v in self.balances.items()}
+            opening = {k: round(float(balances.get(k, 0.0)) - logged.get(k, 0.0), 2)
+                       for k in dict.fromkeys(list(balances) + list(logged))}
+            seed = Snapshot(0, "", {k: v for k, v in opening.items() if abs(v) >= 0.005})
+            self.backend.append_ledger_snapshot(seed.to_row())
+            self.opening, self.snapshots = seed.balances, []
+            self.balances = {k: float(v) for k, v in balances.items()}
+            return self.snapshot()
+
+    def balance(self, customer: str) -> float:
+        return float(self.balances.get((customer or "").strip(), 0.0))
+
+    def _base(self, x: str) -> Snapshot:
+        """The latest snapshot holding only events dated <= x (else the opening balances)."""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            usable = [s for s in self.snapshots if s.max_entry_date <= x]
+            return usable[-1] if usable else Snapshot(0, "", self.opening)
+
+    def balance_as_of(self, as_of: date) -> dict:
+        """All balances counting only events with Entry_Date <= as_of."""
+        x = as_of.isoformat()
+        base = self._base(x)
+        return fold(self.backend.load_ledger_events(base.seq), base.balances, as_of=x)
+
+    def statements(self, start: date, end: date, customers=None) -> dict[str, "Statement"]:
+        """`build_statements` opening at balance_as_of(start - 1 day), from one read of the log.
+
+        Every event up to the snapshot used is dated before `start`, so the events
+        past it hold all the statement lines as well.
+        """
+        x = (start - timedelta(days=1)).isoformat()
+        base = self._base(x)
+        events = self.backend.load_ledger_events(base.seq)
+        return build_statements(events, start, end, customers, opening=fold(events, base.balances, as_of=x))
+
+
+# =========================
+# STATEMENTS
+# =========================
+class Statement:
+    """One customer's running-balance statement for entry dates start..end (inclusive)."""
+
+    def __init__(self, customer: str, start: str, end: str, opening: float = 0.0):
+        self.customer = customer
+        self.start = start
+        self.end = end
+        self.opening = opening
+        self.lines: list[dict] = []   # in entry-date order, each with the balance after it
+
+    def add(self, event: dict):
+        typ = str(event.get("Type", "")).strip().upper()
+        amt = _amount(event.get("Amount"))
+        balance = self.closing + (amt if typ == "CREDIT" else -amt if typ == "PAYMENT" else 0.0)
+        self.lines.append({
+            "Date": _entry_date(event.get("Entry_Date")),
+            "Type": typ,
+            "Credit": amt if typ == "CREDIT" else 0.0,
+            "Payment": amt if typ == "PAYMENT" else 0.0,
+            "Balance": round(balance, 2),
+            "Employee": str(event.get("Employee", "") or ""),
+            "Notes": str(event.get("Notes", "") or ""),
+        })
+
+    @property
+    def closing(self) -> float:
+        return self.lines[-1]["Balance"] if self.lines else round(self.opening, 2)
+
+    @property
+    def credits(self) -> float:
+        return round(sum((l["Credit"] for l in self.lines), 0.0), 2)
+
+    @property
+    def payments(self) -> float:
+        return round(sum((l["Payment"] for l in self.lines), 0.0), 2)
+
+    def rows(self) -> list[dict]:
+        """Opening line, the transactions, closing line (for CSV / tables)."""
+        blank = {"Credit": "", "Payment": "", "Employee": "", "Notes": ""}
+        return (
+            [{"Customer": self.customer, "Date": self.start, "Type": "OPENING", **blank, "Balance": round(self.opening, 2)}]
+            + [{"Customer": self.customer, **l} for l in self.lines]
+            + [{"Customer": self.customer, "Date": self.end, "Type": "CLOSING", **blank, "Balance": self.closing}]
+        )
+
+
+def build_statements(events, start: date, end: date, customers=None,
+                     opening: dict | None = None) -> dict[str, Statement]:
+    """Statements for every customer (or only `customers`) in one pass over (seq, event) pairs.
+
+    Opening = `opening` (balances as of the day before `start`, see
+    LedgerProjection.statements), else the events dated before `start`.
+    Lines are ordered by Entry_Date, then log order, so back-dated entries land in place.
+    """
+    first, last = start.isoformat(), end.isoformat()
+    wanted = {c.strip() for c in customers} if customers else None
+    before: dict = {}
+    in_range: dict = {}
+
+    for seq, ev in events:
+        customer = str(ev.get("Customer", "")).strip()
+        if not customer or (wanted is not None and customer not in wanted):
+            continue
+        d = _entry_date(ev.get("Entry_Date"))
+        if d < first:
+            apply_event(before, ev)
+        elif d <= last:
+            in_range.setdefault(customer, []).append((d, seq, ev))
+
+    if opening is not None:
+        before = opening
+    out = {}
+    for customer in sorted(wanted if wanted is not None else set(before) | set(in_range)):
+        st = Statement(customer, first, last, before.get(customer, 0.0))
+        for _, _, ev in sorted(in_range.get(customer, []), key=lambda x: (x[0], x[1])):
+            st.add(ev)
+        if wanted is not None or st.lines or abs(st.opening) >= 0.005:
+            out[customer] = st
+    return out
@@ -0,0 +1,94 @@
+"""Bulk ledger transaction import: validate a grid/CSV of transactions, then post them as one batch.
+
+Kept out of app.py (which runs the Streamlit page on import) so it can be
+tested on its own. A batch is all or nothing: any invalid row rejects it.
+"""
+import re
+
+import pandas as pd
+
+
+BULK_COLUMNS = ["Date", "Customer", "Type", "Amount", "Employee", "Notes"]
+
+
+def _amount(v: str) -> float:
+    try:
+        return round(float(v.replace(",", "") or 0), 2)
+    except ValueError:
+        return 0.0
+
+
+def _parse_date(raw: str):
+    if re.match(r"^\d{4}-\d{1,2}-\d{1,2}", raw):   # dayfirst would swap ISO dates too
+        return pd.to_datetime(raw[:10], errors="coerce", format="%Y-%m-%d")
+    return pd.to_datetime(raw, errors="coerce", dayfirst=True)
+
+
+def validate_bulk_transactions(df: pd.DataFrame, known_customers, default_employee: str) -> tuple[list[dict], list[str]]:
+    """Grid/CSV rows -> (transactions, errors). Blank rows are skipped; any error rejects the whole batch."""
+    known = {str(c).strip() for c in known_customers if str(c).strip()}
+    txs, errors = [], []
+    for i, r in enumerate(df.to_dict("records"), start=1):
+        cells = {k: "" if v is None or (isinstance(v, float) and v != v) else str(v).strip()
+                 for k, v in r.items() if k in BULK_COLUMNS}
+        if not any(cells.values()):
+            continue
+
+        problems = []
+        d = _parse_date(cells.get("Date", ""))
+        if pd.isna(d):
+            problems.append("bad date")
+        customer = cells.get("Customer", "")
+        if not customer:
+            problems.append("no customer")
+        elif known and customer not in known:
+            problems.append(f"unknown customer '{customer}'")
+        typ = cells.get("Type", "").upper()
+        typ = "CREDIT" if typ.startswith("CREDIT") else "PAYMENT" if typ.startswith("PAYMENT") else typ
+        if typ not in ("CREDIT", "PAYMENT"):
+            problems.append("type must be CREDIT or PAYMENT")
+        amount = _amount(cells.get("Amount", ""))
+        if not amount > 0:   # also catches "nan"
+            problems.append("amount must be > 0")
+
+        if problems:
+            errors.append(f"Row {i}: " + ", ".join(problems))
+            continue
+        txs.append({
+            "date": d.date(), "customer": customer, "type": typ, "amount": amount,
+            "employee": cells.get("Employee") or default_employee, "notes": cells.get("Notes", ""),
+        })
+    return ([] if errors else txs), errors
+
+
+def delta(tx: dict) -> float:
+    return tx["amount"] if tx["type"] == "CREDIT" else -tx["amount"]
+
+
+def ledger_frame(balances: dict) -> pd.DataFrame:
+    df = pd.DataFrame([{"Customer": c, "Outstanding": v} for c, v in balances.items()],
+                      columns=["Customer", "Outstanding"])
+    return df.sort_values(["Outstanding", "Customer"], ascending=[False, True]).reset_index(drop=True)
+
+
+def fold_batch(balances: dict, txs: list[dict], log_row) -> tuple[list[tuple[float, float]], list[list]]:
+    """Apply `txs` to `balances` in place, in order: ((before, after) per transaction, log rows)."""
+    results, logs = [], []
+    for i, tx in enumerate(txs):
+        before = balances.get(tx["customer"], 0.0)
+        balances[tx["customer"]] = before + delta(tx)
+        results.append((before, balances[tx["customer"]]))
+        logs.append(log_row(i, *results[-1]))
+    return results, logs
+
+
+def post_batch(backend, ledger_df: pd.DataFrame | None, txs: list[dict], log_row) -> tuple[pd.DataFrame, list[tuple[float, float]]]:
+    """Post `txs` with one `post_ledger_entries` call; `ledger_df` (the shown table) is updated to match.
+
+    `log_row(i, before, after)` -> the Ledger_Log row of transaction i.
+    """
+    results = backend.post_ledger_entries([(tx["customer"], delta(tx)) for tx in txs], log_row)
+    base = ledger_df if ledger_df is not None and not ledger_df.empty else pd.DataFrame(columns=["Customer", "Outstanding"])
+    balances = dict(zip(base["Customer"].astype(str).str.strip(), pd.to_numeric(base["Outstanding"], errors="coerce").fillna(0.0)))
+    balances.update({tx["customer"]: after for tx, (_, after) in zip(txs, results)})
+    return ledger_frame(balances), results
@@ -0,0 +1,69 @@
+"""Process-wide cache of Reports month data, shared by every browser session.
+
+Entries are keyed by month ("2024-05"). Saving a day invalidates its month.
+Closed months (before the current one) are pinned: nothing but a save changes
+them, so they stay cached until invalidated. The open month is also re-read
+after `ttl` seconds, to pick up edits made directly in the sheet.
+"""
+import threading
+import time
+from datetime import date
+
+
+class MonthCache:
+    def __init__(self, ttl: float = 300):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: dict[str, tuple[object, float]] = {}   # month -> (value, loaded_at)
+        self._loading: dict[str, threading.Lock] = {}
+        self._generation: dict[str, int] = {}
+        self.hits = 0
+        self.loads = 0
+
+    @staticmethod
+    def pinned(month: str, today: date | None = None) -> bool:
+        return month < (today or date.today()).strftime("%Y-%m")
+
+    def _fresh(self, month: str) -> bool:
+        hit = self._entries.get(month)
+        return hit is not None and (self.pinned(month) or time.monotonic() - hit[1] < self.ttl)
+
+    def get(self, month: str, load):
+        """Cached value for `month`, or `load()` it. Sessions asking for the same month wait for one load."""
+        with self._lock:
+            if self._fresh(month):
+                self.hits += 1
+                return self._entries[month][0]
+            loader = self._loading.setdefault(month, threading.Lock())
+
+        with loader:
+            with self._lock:   # loaded by another session while we waited
+                if self._fresh(month):
+                    self.hits += 1
+                    return self._entries[month][0]
+                generation = self._generation.get(month, 0)
+
+            value = load()
+            with self._lock:
+                self.loads += 1
+                # a save during the load may not be in `value`: don't keep it
+                if self._generation.get(month, 0) == generation:
+                    self._entries[month] = (value, time.monotonic())
+            return value
+
+    def invalidate(self, month: str | None = None):
+        """Drop one month (after a save in it), or everything."""
+        with self._lock:
+            months = set(self._entries) | set(self._loading) if month is None else {month}
+            for m in months:
+                self._entries.pop(m, None)
+                self._generation[m] = self._generation.get(m, 0) + 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "months": len(self._entries),
+                "pinned": sum(1 for m in self._entries if self.pinned(m)),
+                "hits": self.hits,
+                "loads": self.loads,
+            }
@@ -0,0 +1,379 @@
+"""Offline-first mode: a local SQLite mirror of the Sheets data, a write journal
+(the sync outbox) replayed when Google is reachable, and row versions to catch
+conflicting edits.
+
+A row's version is a hash of its normalized cells. `Mirror` keeps, per row, the
+version (and values) last seen on Sheets -- the base every local edit was made
+on. Replaying a journaled write first re-reads the Sheets row: if it moved away
+from the base, someone else changed it while we were offline.
+
+- Summary / Settings: the write is parked as a conflict for the user to resolve.
+- Ledger balances: merged, i.e. our change (local - base) is applied on top of
+  the current Sheets balance, since both sides only ever add log entries. A
+  Ledger row is never parked as a conflict.
+
+`pull()` refreshes the mirror from Sheets the same way (three-way: take the
+Sheets row only if the local row still equals the base; Ledger balances are
+merged as above). It reads only what changed since the last pull.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+
+from storage import (
+    StorageBackend, LEDGER_SHEET, LEDGER_LOG_SHEET, ROLLUP_SHEET, SETTINGS_SHEET, SUMMARY_SHEET,
+    SETTINGS_VERSION_KEY, summary_headers, ledger_log_headers, rollup_headers, items_from_details,
+    month_key, _cell_num,
+)
+from sync import sheets_handlers, _last_per_key
+
+FORCE = "*"   # base of a row whose local version should win over whatever Sheets has
+
+
+def _norm(v):
+    """Cells as Sheets returns them ("1,234.50", "100") and as we write them (1234.5, 100.0) compare equal."""
+    if isinstance(v, bool):
+        return str(v).upper()
+    if isinstance(v, (int, float)):
+        return round(float(v), 6)
+    s = "" if v is None else str(v).strip()
+    try:
+        return round(float(s.replace(",", "")), 6) if s else ""
+    except ValueError:
+        return s
+
+
+def same_cell(a, b) -> bool:
+    return _norm(a) == _norm(b)
+
+
+def row_version(values) -> str | None:
+    """Version of one row (None = no row); trailing blanks don't count."""
+    if values is None:
+        return None
+    cells = [_norm(v) for v in values]
+    while cells and cells[-1] == "":
+        cells.pop()
+    return hashlib.sha1(json.dumps(cells, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+
+def _summary_values(row: dict | None) -> list | None:
+    return [row.get(h, "") for h in summary_headers()] if row else None
+
+
+def _settings_payload(rows: list[dict]) -> list[list]:
+    return [[r.get("Key", ""), r.get("Value", "")] for r in rows if r.get("Key")]
+
+
+def _settings_row(version: str | None) -> list | None:
+    # Settings are versioned as a whole by their `_version` cell
+    return [version] if version else None
+
+
+def _payload_version(payload: list[list]) -> str | None:
+    return next((str(v) for k, v in payload if k == SETTINGS_VERSION_KEY), None)
+
+
+class Mirror:
+    """Row versions last seen on Sheets, plus the conflicts found while syncing (own SQLite file)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS row_versions ("
+                " tab TEXT NOT NULL, key TEXT NOT NULL, version TEXT, base TEXT,"
+                " PRIMARY KEY (tab, key))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS conflicts ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " tab TEXT NOT NULL, key TEXT NOT NULL,"
+                " local TEXT, remote TEXT, detected REAL NOT NULL,"
+                " status TEXT NOT NULL DEFAULT 'open')"   # open | merged | mine | theirs
+            )
+
+    def base(self, tab: str, key: str) -> tuple[str | None, object]:
+        """(version, values) last seen on Sheets; (None, None) if never synced."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT version, base FROM row_versions WHERE tab = ? AND key = ?", (tab, key)
+            ).fetchone()
+        return (row[0], json.loads(row[1]) if row[1] else None) if row else (None, None)
+
+    def set_base(self, tab: str, key: str, values, version: str | None = None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO row_versions (tab, key, version, base) VALUES (?, ?, ?, ?)",
+                (tab, key, version or row_version(values), json.dumps(values, ensure_ascii=False, default=str)),
+            )
+
+    def matches(self, tab: str, key: str, remote_version: str | None) -> bool:
+        """Sheets still has the row our local edit was based on."""
+        version, _ = self.base(tab, key)
+        return version in (FORCE, remote_version)
+
+    def add_conflict(self, tab: str, key: str, local, remote, status: str = "open"):
+        with self._lock, self._conn:
+            if status == "open":   # one open conflict per row: the newest local/remote pair
+                self._conn.execute("DELETE FROM conflicts WHERE tab = ? AND key = ? AND status = 'open'", (tab, key))
+            self._conn.execute(
+                "INSERT INTO conflicts (tab, key, local, remote, detected, status) VALUES (?, ?, ?, ?, ?, ?)",
+                (tab, key, json.dumps(local, ensure_ascii=False, default=str),
+                 json.dumps(remote, ensure_ascii=False, default=str), time.time(), status),
+            )
+
+    def conflicts(self, status: str = "open") -> list[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, tab, key, local, remote, detected FROM conflicts WHERE status = ? ORDER BY id", (status,)
+            ).fetchall()
+        return [
+            {"id": i, "tab": t, "key": k, "local": json.loads(l), "remote": json.loads(r), "detected": d}
+            for i, t, k, l, r, d in rows
+        ]
+
+    def has_conflict(self, tab: str, key: str) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM conflicts WHERE tab = ? AND key = ? AND status = 'open'", (tab, key)
+            ).fetchone() is not None
+
+    def close_conflict(self, conflict_id: int, status: str):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE conflicts SET status = ? WHERE id = ?", (status, conflict_id))
+
+    def counts(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM conflicts GROUP BY status").fetchall()
+        out = {"open": 0, "merged": 0}
+        out.update(dict(rows))
+        return out
+
+
+# =========================
+# REPLAY (journal -> Sheets)
+# =========================
+def versioned_handlers(target: StorageBackend, local: StorageBackend, mirror: Mirror) -> dict:
+    """`sheets_handlers` with a row-version check before every Summary / Ledger / Settings write."""
+    handlers = sheets_handlers(target)
+
+    def summary(payloads):
+        for values in _last_per_key(payloads, key=lambda v: v[0]):
+            ds = str(values[0])
+            remote, _ = target.fetch_summary(ds)
+            remote_values = _summary_values(remote)
+            remote_version = row_version(remote_values)
+            if remote_version != row_version(values):
+                if not mirror.matches(SUMMARY_SHEET, ds, remote_version):
+                    mirror.add_conflict(SUMMARY_SHEET, ds, values, remote_values)
+                    continue
+                target.upsert_summary(values)
+            mirror.set_base(SUMMARY_SHEET, ds, values)
+
+    def merged_balance(customer: str, outstanding: float, remote: float) -> float:
+        version, base = mirror.base(LEDGER_SHEET, customer)
+        base_balance = _cell_num(base[1]) if base else 0.0   # never synced: the customer is new to us
+        if version == FORCE or round(remote - base_balance, 2) == 0:
+            return outstanding
+        merged = round(remote + outstanding - base_balance, 2)
+        mirror.add_conflict(LEDGER_SHEET, customer, [customer, outstanding], [customer, remote], status="merged")
+        local.set_ledger_balance(customer, merged)
+        return merged
+
+    def ledger_balance(payloads):
+        for customer, _ in _last_per_key(payloads, key=lambda p: p[0]):
+            # the local balance now, not the journaled one: a pull may have merged Sheets' changes into it
+            outstanding = merged_balance(customer, local.get_ledger_balance(customer), target.get_ledger_balance(customer))
+            target.set_ledger_balance(customer, outstanding)
+            mirror.set_base(LEDGER_SHEET, customer, [customer, outstanding])
+
+    def ledger(payloads):
+        remote = {str(r.get("Customer", "")).strip(): _cell_num(r.get("Outstanding")) for r in target.load_ledger()}
+        rows = [[c, merged_balance(c, _cell_num(v), remote[c]) if c in remote else v] for c, v in payloads[-1]]
+        target.save_ledger(rows)
+        for c, v in rows:
+            mirror.set_base(LEDGER_SHEET, c, [c, v])
+
+    def settings(payloads):
+        payload = payloads[-1]
+        remote_version = row_version(_settings_row(target.read_settings_version()))
+        if not mirror.matches(SETTINGS_SHEET, SETTINGS_VERSION_KEY, remote_version):
+            mirror.add_conflict(SETTINGS_SHEET, SETTINGS_VERSION_KEY, payload, _settings_payload(target.read_settings()))
+            return
+        target.write_settings(payload)
+        mirror.set_base(SETTINGS_SHEET, SETTINGS_VERSION_KEY, _settings_row(_payload_version(payload)))
+
+    handlers.update({
+        "upsert_summary": summary,
+        "set_ledger_balance": ledger_balance,
+        "save_ledger": ledger,
+        "write_settings": settings,
+    })
+    return handlers
+
+
+# =========================
+# PULL (Sheets -> mirror)
+# =========================
+def _take(mirror: Mirror, tab: str, key: str, local_values, remote_values) -> bool:
+    """Three-way check of one row: True if the local mirror should take the Sheets row."""
+    remote_version = row_version(remote_values)
+    base_version, _ = mirror.base(tab, key)
+    if remote_version == base_version or mirror.has_conflict(tab, key):
+        return False
+    local_version = row_version(local_values)
+    if local_version == remote_version:
+        mirror.set_base(tab, key, remote_values)
+        return False
+    if local_version is None or local_version == base_version:
+        return True
+    mirror.add_conflict(tab, key, local_values, remote_values)
+    return False
+
+
+def _merge_ledger(mirror: Mirror, local: StorageBackend, customer: str, local_balance, remote_balance: float) -> bool:
+    """Three-way merge of one Ledger balance into the local mirror; True if the local balance changed.
+
+    Never a conflict: when both sides changed since the last sync, the local
+    balance becomes Sheets' plus our change (local - base), as the replay does.
+    """
+    values = [customer, remote_balance]
+    base_version, base = mirror.base(LEDGER_SHEET, customer)
+    if base_version in (FORCE, row_version(values)):
+        return False
+    if local_balance is None or round(local_balance - remote_balance, 2) == 0 \
+            or row_version([customer, local_balance]) == base_version:
+        merged = remote_balance
+    else:
+        base_balance = _cell_num(base[1]) if base else 0.0   # never synced: the customer is new to us
+        merged = round(remote_balance + local_balance - base_balance, 2)
+        mirror.add_conflict(LEDGER_SHEET, customer, [customer, local_balance], values, status="merged")
+    mirror.set_base(LEDGER_SHEET, customer, values)
+    if local_balance is not None and round(merged - local_balance, 2) == 0:
+        return False
+    local.set_ledger_balance(customer, merged)
+    return True
+
+
+def _rollup_values(row: dict) -> list:
+    return [row.get(h, "") for h in rollup_headers()]
+
+
+def pull(remote: StorageBackend, local: StorageBackend, mirror: Mirror, full: bool = False) -> dict:
+    """Bring Summary, Ledger, Ledger_Log and Settings from Sheets into the local mirror. Returns row counts taken.
+
+    Incremental: Summary is re-read only for this month, the last one and months
+    whose Monthly_Rollup row changed since the last pull, Ledger balances only for
+    customers with new Ledger_Log rows. `full` re-reads both whole, for edits made
+    on Sheets by hand (which leave the rollup and the log alone).
+    """
+    taken = {"summary": 0, "ledger": 0, "ledger_log": 0, "settings": 0}
+
+    rollups = remote.load_rollups("0000-00", "9999-99")
+    if full or not rollups:   # no rollup yet: nothing to tell changed months by
+        months = [(None, date.min, date.max)]
+    else:
+        # this month and the last are always re-read: an edit that leaves the sums alone
+        # (a name, a note) doesn't show in the rollup
+        this_month = date.today().replace(day=1)
+        always = {month_key(this_month), month_key(this_month - timedelta(days=1))}
+        months = []
+        for r in rollups:
+            month = str(r.get("month", ""))
+            if len(month) == 7 and (month in always
+                                    or mirror.base(ROLLUP_SHEET, month)[0] != row_version(_rollup_values(r))):
+                start = date.fromisoformat(f"{month}-01")
+                months.append((r, start, (start.replace(day=28) + timedelta(days=4)).replace(day=1)))
+    for rollup, start, end in months:
+        local_summary = {str(r.get("date", "")): _summary_values(r) for r in local.fetch_summary_range(start, end)}
+        for r in remote.fetch_summary_range(start, end):
+            ds, values = str(r.get("date", "")), _summary_values(r)
+            if _take(mirror, SUMMARY_SHEET, ds, local_summary.get(ds), values):
+                local.upsert_summary(values)
+                local.replace_day_items(ds, items_from_details(r.get("details_json")))
+                mirror.set_base(SUMMARY_SHEET, ds, values)
+                taken["summary"] += 1
+        if rollup is not None:
+            mirror.set_base(ROLLUP_SHEET, month_key(start), _rollup_values(rollup))
+    if months and months[0][0] is None:
+        for r in rollups:
+            mirror.set_base(ROLLUP_SHEET, str(r.get("month", "")), _rollup_values(r))
+
+    # the log is append-only: read past the last row pulled. Rows that are ours (pushed by
+    # the journal) were still local when the previous pull started (pulls only run with
+    # nothing left to push; the one before that covers a row queued just as it began),
+    # so only local rows added since are compared.
+    _, seen = mirror.base(LEDGER_LOG_SHEET, "_seq")
+    _, marks = mirror.base(LEDGER_LOG_SHEET, "_local_seq")   # local log seq at the start of the last two pulls
+    since, last_start = (marks or [0, 0])
+    recent = local.load_ledger_events(int(since))
+    events = remote.load_ledger_events(int(seen or 0))
+    customers = set()
+    if events:
+        headers = ledger_log_headers()
+        key = lambda r: tuple(_norm(r.get(h, "")) for h in headers)
+        mine = {key(r) for _, r in recent}
+        new = [[r.get(h, "") for h in headers] for _, r in events if key(r) not in mine]
+        local.append_ledger_logs(new)
+        mirror.set_base(LEDGER_LOG_SHEET, "_seq", events[-1][0], str(events[-1][0]))
+        taken["ledger_log"] = len(new)
+        customers = {str(r.get("Customer", "")).strip() for _, r in events} - {""}
+    start = recent[-1][0] if recent else int(since)
+    mirror.set_base(LEDGER_LOG_SHEET, "_local_seq", [int(last_start), start], f"{last_start},{start}")
+
+    if full:
+        remote_ledger = {str(r.get("Customer", "")).strip(): _cell_num(r.get("Outstanding")) for r in remote.load_ledger()}
+        remote_ledger.pop("", None)
+    else:
+        remote_ledger = remote.get_ledger_balances(sorted(customers)) if customers else {}
+    if remote_ledger:
+        local_ledger = {str(r.get("Customer", "")).strip(): _cell_num(r.get("Outstanding")) for r in local.load_ledger()}
+        for customer, balance in remote_ledger.items():
+            if _merge_ledger(mirror, local, customer, local_ledger.get(customer), balance):
+                taken["ledger"] += 1
+
+    remote_row = _settings_row(remote.read_settings_version())
+    if _take(mirror, SETTINGS_SHEET, SETTINGS_VERSION_KEY, _settings_row(local.read_settings_version()), remote_row):
+        payload = _settings_payload(remote.read_settings())
+        local.write_settings(payload)
+        mirror.set_base(SETTINGS_SHEET, SETTINGS_VERSION_KEY, _settings_row(_payload_version(payload)))
+        taken["settings"] = 1
+    return taken
+
+
+# =========================
+# CONFLICT RESOLUTION
+# =========================
+def resolve(conflict: dict, keep: str, backend, mirror: Mirror):
+    """keep = "mine": push the local row over Sheets on the next sync; "theirs": take the Sheets row locally.
+
+    `backend` is the WriteBehindBackend whose journal replays to Sheets.
+    """
+    tab, key, local, remote = conflict["tab"], conflict["key"], conflict["local"], conflict["remote"]
+    if keep == "mine":
+        mirror.set_base(tab, key, None, FORCE)
+        if tab == SUMMARY_SHEET:
+            backend.upsert_summary(local)
+        elif tab == SETTINGS_SHEET:
+            backend.write_settings(local)
+        elif tab == LEDGER_SHEET:
+            backend.set_ledger_balance(key, _cell_num(local[1]))
+    elif remote is not None:
+        if tab == SUMMARY_SHEET:
+            backend.local.upsert_summary(remote)
+            backend.local.replace_day_items(key, items_from_details(dict(zip(summary_headers(), remote)).get("details_json")))
+            mirror.set_base(tab, key, remote)
+        elif tab == SETTINGS_SHEET:
+            backend.local.write_settings(remote)
+            mirror.set_base(tab, key, _settings_row(_payload_version(remote)))
+        elif tab == LEDGER_SHEET:
+            backend.local.set_ledger_balance(key, _cell_num(remote[1]))
+            mirror.set_base(tab, key, remote)
+    mirror.close_conflict(conflict["id"], keep)
@@ -0,0 +1,189 @@
+"""PDF statements: the daily sales statement and customer running-balance statements.
+
+Both draw on an A4 `Page` (a reportlab canvas with the app's colours and its
+text / right-aligned text / divider helpers), so they look alike. reportlab is
+imported only when a PDF is drawn.
+"""
+from io import BytesIO
+
+MM = 72 / 25.4                      # reportlab.lib.units.mm
+W, H = 210 * MM, 297 * MM           # reportlab.lib.pagesizes.A4
+
+PRIMARY = "#111111"
+GRAY = "#555555"
+LINE = "#DDDDDD"
+RED = "#C62828"
+GREEN = "#2E7D32"
+
+
+class Page:
+    """An A4 reportlab canvas writing into memory; `bytes()` finishes the document."""
+
+    def __init__(self):
+        from reportlab.pdfgen import canvas
+
+        self.buf = BytesIO()
+        self.c = canvas.Canvas(self.buf, pagesize=(W, H))
+
+    def text(self, x, y, s, size=11, bold=False, color=PRIMARY):
+        self.c.setFillColor(color)
+        self.c.setFont("Helvetica-Bold" if bold else "Helvetica", size)
+        self.c.drawString(x, y, s)
+
+    def rtext(self, x, y, s, size=11, bold=False, color=PRIMARY):
+        self.c.setFillColor(color)
+        self.c.setFont("Helvetica-Bold" if bold else "Helvetica", size)
+        self.c.drawRightString(x, y, s)
+
+    def hline(self, y):
+        self.c.setStrokeColor(LINE)
+        self.c.setLineWidth(1)
+        self.c.line(15 * MM, y, W - 15 * MM, y)
+
+    def show_page(self):
+        self.c.showPage()
+
+    def bytes(self) -> bytes:
+        self.c.save()
+        return self.buf.getvalue()
+
+
+def daily_statement(report: dict) -> bytes:
+    p = Page()
+    text, rtext, hline = p.text, p.rtext, p.hline
+
+    def row_line(label, value, big=False, color=PRIMARY):
+        nonlocal y
+        size = 14 if big else 12
+        text(20 * MM, y, label, size=size)
+        rtext(W - 20 * MM, y, value, size=size, bold=big, color=color)
+        y -= 7 * MM
+
+    y = H - 20 * MM
+    text(15 * MM, y, "HP PETROL BUNK", size=18, bold=True)
+    y -= 8 * MM
+    text(15 * MM, y, "Daily Sales Statement", size=14, bold=True, color=GRAY)
+
+    y -= 10 * MM
+    hline(y)
+    y -= 10 * MM
+
+    text(15 * MM, y, "Date:", bold=True)
+    text(35 * MM, y, report["date"])
+    rtext(W - 15 * MM, y, f"Employee: {report.get('employee_name','')}", bold=True)
+
+    y -= 8 * MM
+    hline(y)
+    y -= 10 * MM
+
+    text(15 * MM, y, "FUEL SALES", size=13, bold=True)
+    y -= 8 * MM
+    row_line("Petrol Liters Sold", f"{report['petrol_liters_sold']:.3f} L")
+    row_line("Petrol Amount", f"₹ {report['petrol_amount']:.2f}")
+    row_line("Diesel Liters Sold", f"{report['diesel_liters_sold']:.3f} L")
+    row_line("Diesel Amount", f"₹ {report['diesel_amount']:.2f}")
+
+    y -= 6 * MM
+    hline(y)
+    y -= 8 * MM
+
+    text(15 * MM, y, "OTHER SALES", size=13, bold=True)
+    y -= 8 * MM
+    row_line("2T Oil Packets", f"{int(report.get('oil_packets', 0))}")
+    row_line("2T Oil Price", f"₹ {report.get('oil_price', 0.0):.2f}")
+    row_line("2T Oil Amount", f"₹ {report['oil_amount']:.2f}")
+
+    y -= 6 * MM
+    hline(y)
+    y -= 8 * MM
+
+    text(15 * MM, y, "CASH FLOW", size=13, bold=True)
+    y -= 8 * MM
+    row_line("Total Sales", f"₹ {report['total_sales']:.2f}", big=True)
+
+    row_line("QR / UPI", f"- ₹ {report['qr_amount']:.2f}", color=RED)
+    row_line("Advance Paid", f"- ₹ {report['advance_paid']:.2f}", color=RED)
+    row_line("Owner PhonePay", f"- ₹ {report.get('owner_phonepay_amount', 0.0):.2f}", color=RED)
+    row_line("Expenses", f"- ₹ {report['other_expenses_total']:.2f}", color=RED)
+    row_line("Credit Given", f"- ₹ {report['customer_credit_total']:.2f}", color=RED)
+
+    row_line("Collections", f"+ ₹ {report['debt_collections_total']:.2f}", color=GREEN)
+    row_line("Yesterday Balance", f"+ ₹ {report.get('yesterday_balance_amount', 0.0):.2f}", color=GREEN)
+
+    y -= 4 * MM
+    hline(y)
+    y -= 10 * MM
+
+    text(15 * MM, y, "CASH TO DEPOSIT", size=16, bold=True, color=GREEN)
+    rtext(W - 15 * MM, y, f"₹ {report['cash_to_deposit']:.2f}", size=20, bold=True, color=GREEN)
+
+    p.show_page()
+    return p.bytes()
+
+
+def customer_statements(statements: list) -> bytes:
+    """ledger.Statement objects, one or more pages per customer, in one PDF."""
+    p = Page()
+    text, rtext, hline = p.text, p.rtext, p.hline
+
+    def balance_color(v):
+        return RED if v > 0 else GREEN if v < 0 else PRIMARY
+
+    # columns: Date | Type | Credit | Payment | Balance | Notes
+    X_DATE, X_TYPE, X_CREDIT, X_PAYMENT, X_BAL, X_NOTES = 15 * MM, 42 * MM, 95 * MM, 125 * MM, 158 * MM, 162 * MM
+
+    def header(st_, cont=False):
+        y = H - 20 * MM
+        text(15 * MM, y, "HP PETROL BUNK", size=18, bold=True)
+        y -= 8 * MM
+        text(15 * MM, y, "Customer Statement" + (" (contd.)" if cont else ""), size=14, bold=True, color=GRAY)
+        y -= 10 * MM
+        hline(y)
+        y -= 8 * MM
+        text(15 * MM, y, "Customer:", bold=True)
+        text(38 * MM, y, st_.customer)
+        rtext(W - 15 * MM, y, f"Period: {st_.start} to {st_.end}", bold=True)
+        y -= 6 * MM
+        hline(y)
+        y -= 7 * MM
+        for x, label, right in ((X_DATE, "Date", False), (X_TYPE, "Type", False), (X_CREDIT, "Credit", True),
+                                (X_PAYMENT, "Payment", True), (X_BAL, "Balance", True), (X_NOTES, "Notes", False)):
+            (rtext if right else text)(x, y, label, size=10, bold=True, color=GRAY)
+        y -= 3 * MM
+        hline(y)
+        return y - 6 * MM
+
+    for st_ in statements:
+        y = header(st_)
+        text(X_DATE, y, st_.start, size=10)
+        text(X_TYPE, y, "Opening balance", size=10, bold=True)
+        rtext(X_BAL, y, f"{st_.opening:.2f}", size=10, bold=True, color=balance_color(st_.opening))
+        y -= 6 * MM
+
+        for line in st_.lines:
+            if y < 30 * MM:
+                p.show_page()
+                y = header(st_, cont=True)
+            text(X_DATE, y, line["Date"], size=10)
+            text(X_TYPE, y, line["Type"], size=10)
+            if line["Credit"]:
+                rtext(X_CREDIT, y, f"{line['Credit']:.2f}", size=10, color=RED)
+            if line["Payment"]:
+                rtext(X_PAYMENT, y, f"{line['Payment']:.2f}", size=10, color=GREEN)
+            rtext(X_BAL, y, f"{line['Balance']:.2f}", size=10)
+            text(X_NOTES, y, line["Notes"][:22], size=8, color=GRAY)
+            y -= 6 * MM
+
+        y -= 2 * MM
+        hline(y)
+        y -= 7 * MM
+        text(X_TYPE, y, "Totals", size=10, bold=True)
+        rtext(X_CREDIT, y, f"{st_.credits:.2f}", size=10, bold=True, color=RED)
+        rtext(X_PAYMENT, y, f"{st_.payments:.2f}", size=10, bold=True, color=GREEN)
+        y -= 10 * MM
+        label = "CLOSING OUTSTANDING" if st_.closing >= 0 else "CLOSING ADVANCE"
+        text(15 * MM, y, label, size=14, bold=True, color=balance_color(st_.closing))
+        rtext(W - 15 * MM, y, f"₹ {abs(st_.closing):.2f}", size=16, bold=True, color=balance_color(st_.closing))
+        p.show_page()
+
+    return p.bytes()
@@ -0,0 +1,191 @@
+"""Per-rerun timing spans: Sheets API calls, PDF/PNG renders, archive writes.
+
+app.py starts a `Rerun` at the top of every script run (`begin`) and keeps the
+last N of each session. Whatever is timed with `span(kind, op)` (or a `timed`
+function) while that run is current is recorded in it, with its duration and
+approximate payload bytes. Background threads have no current run and aren't
+recorded. With profiling off `begin` is never called, and a span costs one
+contextvar lookup.
+"""
+import contextvars
+import functools
+import itertools
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+_current = contextvars.ContextVar("profile_rerun", default=None)
+_ids = itertools.count(1)
+
+
+class Span:
+    __slots__ = ("kind", "op", "action", "offset_ms", "ms", "bytes", "error")
+
+    def __init__(self, kind: str, op: str, action: str | None = None, offset_ms: float = 0.0):
+        self.kind = kind
+        self.op = op
+        self.action = action
+        self.offset_ms = offset_ms   # since the rerun started
+        self.ms = 0.0
+        self.bytes = 0
+        self.error = ""
+
+    def as_dict(self) -> dict:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+
+# handed out while nothing is being recorded; whatever is set on it is ignored
+_IDLE = Span("", "")
+
+
+class Rerun:
+    """The spans of one script run."""
+
+    def __init__(self):
+        self.id = next(_ids)
+        self.started = time.time()
+        self._t0 = time.perf_counter()
+        self.wall_ms: float | None = None
+        self.complete = False   # False: ended by st.rerun()/st.stop(), wall_ms is up to its last span
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+
+    def now_ms(self) -> float:
+        return (time.perf_counter() - self._t0) * 1000
+
+    def add(self, s: Span):
+        with self._lock:
+            self.spans.append(s)
+
+    def finish(self, complete: bool = True):
+        if self.wall_ms is not None:
+            return
+        with self._lock:
+            last = max((s.offset_ms + s.ms for s in self.spans), default=0.0)
+        self.wall_ms = round(self.now_ms() if complete else last, 1)
+        self.complete = complete
+
+    def summary(self) -> dict:
+        with self._lock:
+            spans = list(self.spans)
+        sheets = [s for s in spans if s.kind == "sheets"]
+        return {
+            "rerun": self.id,
+            "started": time.strftime("%H:%M:%S", time.localtime(self.started)),
+            "wall ms": self.wall_ms if self.complete else f"≥ {self.wall_ms}",
+            "sheets calls": len(sheets),
+            "sheets ms": round(sum(s.ms for s in sheets), 1),
+            "bytes": sum(s.bytes for s in spans),
+            "other ms": round(sum(s.ms for s in spans if s.kind != "sheets"), 1),
+            "errors": sum(1 for s in spans if s.error),
+        }
+
+
+def begin(history) -> Rerun:
+    """Start recording this script run into `history` (a deque(maxlen=N) kept per session)."""
+    if history and history[-1].wall_ms is None:
+        history[-1].finish(complete=False)
+    run = Rerun()
+    history.append(run)
+    _current.set(run)
+    return run
+
+
+def end():
+    """The script reached its last line."""
+    run = _current.get()
+    if run is not None:
+        run.finish()
+        _current.set(None)
+
+
+def recording() -> bool:
+    return _current.get() is not None
+
+
+@contextmanager
+def span(kind: str, op: str, action: str | None = None):
+    """Time the block into the current rerun; set `.bytes` on the yielded span if known."""
+    run = _current.get()
+    if run is None:
+        yield _IDLE
+        return
+    s = Span(kind, op, action, run.now_ms())
+    t0 = time.perf_counter()
+    try:
+        yield s
+    except BaseException as e:
+        s.error = type(e).__name__
+        raise
+    finally:
+        s.ms = round((time.perf_counter() - t0) * 1000, 2)
+        s.offset_ms = round(s.offset_ms, 2)
+        run.add(s)
+
+
+def timed(kind: str, op: str | None = None, size=len):
+    """Decorator: `span(kind, op or the function name)`; bytes = size(result) (None: don't measure)."""
+    def wrap(fn):
+        name = op or fn.__name__
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with span(kind, name) as s:
+                result = fn(*args, **kwargs)
+                if size is not None and s is not _IDLE:
+                    try:
+                        s.bytes = size(result)
+                    except TypeError:
+                        pass
+                return result
+        return inner
+    return wrap
+
+
+def payload_bytes(*objs) -> int:
+    """Rough wire size of request/response payloads (their JSON encoding)."""
+    total = 0
+    for o in objs:
+        if o is None or o == () or o == {}:
+            continue
+        try:
+            total += len(json.dumps(o, default=str, ensure_ascii=False).encode("utf-8"))
+        except (TypeError, ValueError):
+            total += len(str(o))
+    return total
+
+
+def op_table(runs) -> list[dict]:
+    """Spans of `runs` grouped by operation: count, bytes and latency."""
+    groups: dict[tuple, list[Span]] = {}
+    for run in runs:
+        with run._lock:
+            for s in run.spans:
+                groups.setdefault((s.kind, s.op), []).append(s)
+    out = []
+    for (kind, op), spans in groups.items():
+        ms = sorted(s.ms for s in spans)
+        out.append({
+            "kind": kind,
+            "operation": op,
+            "count": len(spans),
+            "bytes": sum(s.bytes for s in spans),
+            "total ms": round(sum(ms), 1),
+            "mean ms": round(sum(ms) / len(ms), 1),
+            "p95 ms": ms[min(len(ms) - 1, int(len(ms) * 0.95))],
+            "max ms": ms[-1],
+            "errors": sum(1 for s in spans if s.error),
+        })
+    return sorted(out, key=lambda r: -r["total ms"])
+
+
+def to_jsonl(runs) -> str:
+    """One JSON line per span (with its rerun's id, start time and wall time), for offline analysis."""
+    lines = []
+    for run in runs:
+        with run._lock:
+            spans = list(run.spans)
+        head = {"rerun": run.id, "rerun_started": run.started, "rerun_wall_ms": run.wall_ms, "rerun_complete": run.complete}
+        lines += [json.dumps({**head, **s.as_dict()}, ensure_ascii=False) for s in spans]
+    return "\n".join(lines) + ("\n" if lines else "")
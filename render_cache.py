@@ -0,0 +1,80 @@
+"""Cache for rendered statements (PNG/PDF), keyed by a stable hash of the report.
+
+A bounded in-memory LRU sits in front of a bounded on-disk cache, so a report
+that was already rendered (in this process or before a restart) is served
+without touching matplotlib/reportlab again.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+def report_key(report: dict) -> str:
+    blob = json.dumps(report, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:32]
+
+
+class RenderCache:
+    def __init__(self, max_items: int = 64, disk_dir: str | None = None, max_disk_files: int = 256):
+        self.max_items = max_items
+        self.disk_dir = disk_dir
+        self.max_disk_files = max_disk_files
+        self._mem: OrderedDict[str, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_path(self, key: str) -> str | None:
+        return os.path.join(self.disk_dir, key) if self.disk_dir else None
+
+    def _remember(self, key: str, data: bytes):
+        with self._lock:
+            self._mem[key] = data
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.max_items:
+                self._mem.popitem(last=False)
+
+    def _prune_disk(self):
+        files = [os.path.join(self.disk_dir, f) for f in os.listdir(self.disk_dir)]
+        if len(files) <= self.max_disk_files:
+            return
+        files.sort(key=lambda p: os.path.getmtime(p))
+        for p in files[: len(files) - self.max_disk_files]:
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+
+    def get_or_render(self, kind: str, report: dict, render) -> bytes:
+        key = f"{kind}_{report_key(report)}"
+
+        with self._lock:
+            data = self._mem.get(key)
+            if data is not None:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return data
+
+        path = self._disk_path(key)
+        if path and os.path.exists(path):
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+            self.hits += 1
+            self._remember(key, data)
+            return data
+
+        self.misses += 1
+        data = render(report)
+        self._remember(key, data)
+        if path:
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+            self._prune_disk()
+        return data
@@ -0,0 +1,52 @@
+"""Process-wide Settings cache shared by every browser session.
+
+Within `ttl` seconds the cached value is served as is. After that one cheap
+version read (the `_version` cell) decides whether the full Settings tab has to
+be read again, so N sessions opening at shift change cost one Settings read.
+"""
+import threading
+import time
+
+
+class SettingsCache:
+    def __init__(self, load, read_version, ttl: float = 300):
+        """`load()` -> (settings, version); `read_version()` -> version or None."""
+        self._load = load
+        self._read_version = read_version
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._value: dict | None = None
+        self._version: str | None = None
+        self._checked_at = 0.0
+        self.loads = 0
+        self.version_checks = 0
+
+    def get(self) -> dict:
+        with self._lock:   # one loader at a time; the others wait and reuse its result
+            now = time.monotonic()
+            if self._value is not None and now - self._checked_at < self.ttl:
+                return self._value
+            if self._value is not None and self._version is not None:
+                self.version_checks += 1
+                if self._read_version() == self._version:
+                    self._checked_at = now
+                    return self._value
+            self._value, self._version = self._load()
+            self.loads += 1
+            self._checked_at = time.monotonic()
+            return self._value
+
+    def put(self, settings: dict, version: str | None):
+        """After this process wrote the settings: serve them without a re-read."""
+        with self._lock:
+            self._value, self._version = settings, version
+            self._checked_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self._value, self._version = None, None
+            self._checked_at = 0.0
+
+    @property
+    def version(self) -> str | None:
+        return self._version
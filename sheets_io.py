@@ -0,0 +1,424 @@
+"""Sheets transport helpers: per-action call counters, one-call batch writes and
+cached worksheet handles.
+
+`Counted` wraps a gspread Spreadsheet (and every Worksheet it hands out) and
+records each API call against the current user action (`action("ledger_tx")`),
+and as a timing span of the current rerun (see profiling.py).
+`RateLimiter` keeps those calls inside the Sheets per-minute read/write quotas
+(token buckets shared by every session), lets saves go ahead of report
+refreshes, and backs off and retries when Google answers 429 anyway.
+`BatchWrite` collects row updates, appends and single-cell compare-and-swaps
+(findReplace) for any number of tabs and sends them as a single
+spreadsheets.batchUpdate. `WorksheetCache` opens each tab and
+verifies its header row once per process and schema version.
+"""
+import contextvars
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from profiling import payload_bytes, recording, span
+
+
+# methods that are one HTTP round-trip each
+API_METHODS = {
+    "worksheet", "worksheets", "fetch_sheet_metadata",
+    "values_get", "values_batch_get", "values_update", "values_batch_update", "values_append", "batch_update",
+    "get", "batch_get", "acell", "cell", "col_values", "row_values", "get_all_values", "get_all_records",
+    "update", "batch_clear", "clear", "append_row", "append_rows", "delete_rows", "insert_row",
+}
+
+# API_METHODS that change the sheet (counted against the write quota)
+WRITE_METHODS = {
+    "values_update", "values_batch_update", "values_append", "batch_update",
+    "update", "batch_clear", "clear", "append_row", "append_rows", "delete_rows", "insert_row",
+}
+
+_action = contextvars.ContextVar("sheets_action", default=None)
+
+
+class CallStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.totals: dict[str, dict[str, int]] = {}   # action -> method -> calls
+        self.runs: dict[str, int] = {}
+        self.last: dict[str, dict[str, int]] = {}     # calls made by the latest run of each action
+
+    def record(self, method: str):
+        name, current = _action.get() or (current_action(), None)
+        with self._lock:
+            by_method = self.totals.setdefault(name, {})
+            by_method[method] = by_method.get(method, 0) + 1
+            if current is not None:
+                current[method] = current.get(method, 0) + 1
+
+    @contextmanager
+    def action(self, name: str):
+        """Attribute the Sheets calls made inside the block to `name` (nested blocks keep the outer name)."""
+        if _action.get() is not None:
+            yield
+            return
+        current: dict[str, int] = {}
+        token = _action.set((name, current))
+        try:
+            yield
+        finally:
+            _action.reset(token)
+            with self._lock:
+                self.runs[name] = self.runs.get(name, 0) + 1
+                self.last[name] = current
+
+    def table(self) -> list[dict]:
+        with self._lock:
+            out = []
+            for name, by_method in sorted(self.totals.items()):
+                calls = sum(by_method.values())
+                runs = self.runs.get(name, 0)
+                last = self.last.get(name, {})
+                out.append({
+                    "action": name,
+                    "runs": runs,
+                    "calls": calls,
+                    "calls/run": round(calls / runs, 1) if runs else None,
+                    "last run": sum(last.values()) if runs else None,
+                    "by method": ", ".join(f"{m} {n}" for m, n in sorted(by_method.items(), key=lambda kv: -kv[1])),
+                })
+            return out
+
+    def reset(self):
+        with self._lock:
+            self.totals, self.runs, self.last = {}, {}, {}
+
+
+STATS = CallStats()
+action = STATS.action
+
+
+def current_action() -> str:
+    """Name of the action the calls made now are attributed to."""
+    act = _action.get()
+    if act is not None:
+        return act[0]
+    return "other" if threading.current_thread() is threading.main_thread() else "background"
+
+
+# request priorities: a lower number is served first and may use more of the quota
+HIGH, NORMAL, LOW = 0, 1, 2
+PRIORITY_NAMES = {HIGH: "high", NORMAL: "normal", LOW: "low"}
+# anything that writes what an attendant just entered
+HIGH_PRIORITY_ACTIONS = {
+    "daily_save", "ledger_tx", "ledger_bulk", "ledger_autopost", "save_settings", "save_ledger", "compact_ledger",
+}
+# re-reads that can wait: reports, log pages, ledger reloads, the background sync/pull worker
+LOW_PRIORITY_ACTIONS = {
+    "month_report", "month_items", "range_report", "load_ledger", "load_ledger_logs", "customer_log",
+    "statements", "background",
+}
+
+
+def action_priority(name: str) -> int:
+    if name in HIGH_PRIORITY_ACTIONS:
+        return HIGH
+    return LOW if name in LOW_PRIORITY_ACTIONS else NORMAL
+
+
+def _status(e: Exception) -> int | None:
+    """HTTP status of a gspread APIError (or anything carrying a requests response)."""
+    code = getattr(getattr(e, "response", None), "status_code", None) or getattr(e, "code", None)
+    return code if isinstance(code, int) else None
+
+
+def _retry_after(e: Exception) -> float | None:
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+class _Bucket:
+    """Token bucket for one quota: `per_minute` calls, refilled continuously, bursts up to half of it."""
+
+    def __init__(self, per_minute: float, now: float):
+        self.per_minute = per_minute
+        self.capacity = max(1.0, per_minute / 2)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.stamp = now
+        self.recent: deque[float] = deque()   # monotonic times of the calls let through in the last minute
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        while self.recent and now - self.recent[0] > 60:
+            self.recent.popleft()
+
+
+class RateLimiter:
+    """Client-side Sheets quota shared by all sessions of the process.
+
+    Each call takes a token from the read or the write bucket first. Lower
+    priorities keep out of a reserve (`LOW` leaves 30% of the burst, `NORMAL`
+    10%) and wait while a higher priority is waiting, so a save isn't queued
+    behind a burst of report refreshes. A 429 empties the bucket (everyone slows
+    down) and the call is retried after an exponential, jittered backoff, or
+    the server's Retry-After. `clock` and `sleep` default to the `time` module's.
+    """
+
+    RESERVE = {HIGH: 0.0, NORMAL: 0.1, LOW: 0.3}
+
+    def __init__(self, reads_per_minute: float = 60, writes_per_minute: float = 60,
+                 max_retries: int = 5, max_backoff: float = 32.0, clock=time.monotonic, sleep=time.sleep):
+        self._clock = clock
+        self._sleep = sleep
+        self._cond = threading.Condition()
+        now = clock()
+        self._buckets = {"read": _Bucket(reads_per_minute, now), "write": _Bucket(writes_per_minute, now)}
+        self._waiting = {HIGH: 0, NORMAL: 0, LOW: 0}
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+        self.stats = {k: {"calls": 0, "throttled": 0, "wait_s": 0.0, "rejected": 0, "retries": 0, "last_429": None}
+                      for k in self._buckets}
+
+    def acquire(self, kind: str, priority: int = NORMAL) -> float:
+        """Block until a `kind` ("read"/"write") call may go out. Returns the seconds waited."""
+        bucket = self._buckets[kind]
+        floor = min(bucket.capacity * self.RESERVE[priority], bucket.capacity - 1)
+        t0 = self._clock()
+        with self._cond:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    now = self._clock()
+                    bucket.refill(now)
+                    ahead = any(self._waiting[p] for p in self._waiting if p < priority)
+                    if not ahead and bucket.tokens - 1 >= floor:
+                        bucket.tokens -= 1
+                        bucket.recent.append(now)
+                        break
+                    short = max(floor + 1 - bucket.tokens, 0.0)
+                    self._cond.wait(timeout=max(short / bucket.rate, 0.05) if not ahead else 0.25)
+            finally:
+                self._waiting[priority] -= 1
+                self._cond.notify_all()
+            waited = self._clock() - t0
+            st = self.stats[kind]
+            st["calls"] += 1
+            if waited > 0.001:
+                st["throttled"] += 1
+                st["wait_s"] += waited
+        return waited
+
+    def _rejected(self, kind: str):
+        with self._cond:
+            self._buckets[kind].tokens = 0.0
+            self._buckets[kind].stamp = self._clock()
+            self.stats[kind]["rejected"] += 1
+            self.stats[kind]["last_429"] = time.time()
+
+    def call(self, method: str, fn, *args, **kwargs):
+        """`fn(*args, **kwargs)` within the quota; retried on 429 (nothing was done, so it's safe)."""
+        kind = "write" if method in WRITE_METHODS else "read"
+        priority = action_priority(current_action())
+        for attempt in range(self.max_retries + 1):
+            self.acquire(kind, priority)
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if _status(e) != 429 or attempt == self.max_retries:
+                    raise
+                self._rejected(kind)
+                with self._cond:
+                    self.stats[kind]["retries"] += 1
+                delay = _retry_after(e) or random.uniform(0, min(self.max_backoff, 2 ** attempt))
+                self._sleep(delay)
+
+    def headroom(self) -> list[dict]:
+        """Per quota: calls in the last minute against the limit, tokens available now, throttling so far."""
+        with self._cond:
+            now = self._clock()
+            out = []
+            for kind, b in self._buckets.items():
+                b.refill(now)
+                st = self.stats[kind]
+                used = len(b.recent)
+                out.append({
+                    "quota": kind,
+                    "per minute": int(b.per_minute),
+                    "used last 60 s": used,
+                    "headroom %": round(max(0.0, 1 - used / b.per_minute) * 100) if b.per_minute else 0,
+                    "burst available": round(b.tokens, 1),
+                    "calls": st["calls"],
+                    "throttled": st["throttled"],
+                    "waited s": round(st["wait_s"], 1),
+                    "429s": st["rejected"],
+                    "retries": st["retries"],
+                    "last 429": time.strftime("%H:%M:%S", time.localtime(st["last_429"])) if st["last_429"] else "",
+                })
+            return out
+
+    def waiting(self) -> dict:
+        """Calls blocked on the quota right now, by priority name."""
+        with self._cond:
+            return {PRIORITY_NAMES[p]: n for p, n in self._waiting.items()}
+
+
+class Counted:
+    """Transparent proxy that counts API calls; Worksheets/Spreadsheets it returns are wrapped too.
+
+    With a `limiter`, every call also goes through `RateLimiter.call`.
+    """
+
+    def __init__(self, target, stats: CallStats = STATS, limiter: RateLimiter | None = None):
+        self._target = target
+        self._stats = stats
+        self._limiter = limiter
+
+    def _wrap(self, target):
+        return Counted(target, self._stats, self._limiter)
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name == "spreadsheet":
+            return self._wrap(attr)
+        if name not in API_METHODS or not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            self._stats.record(name)
+            act = _action.get()
+            with span("sheets", name, act[0] if act else None) as s:
+                if self._limiter is not None:
+                    result = self._limiter.call(name, attr, *args, **kwargs)
+                else:
+                    result = attr(*args, **kwargs)
+                if recording():
+                    s.bytes = payload_bytes(args, kwargs, result)
+            if name == "worksheet":
+                return self._wrap(result)
+            if name == "worksheets":
+                return [self._wrap(ws) for ws in result]
+            return result
+
+        return call
+
+    def __repr__(self):
+        return f"Counted({self._target!r})"
+
+
+def _cell(v) -> dict:
+    if isinstance(v, bool):
+        return {"userEnteredValue": {"boolValue": v}}
+    if isinstance(v, (int, float)):
+        return {"userEnteredValue": {"numberValue": v}}
+    return {"userEnteredValue": {"stringValue": "" if v is None else str(v)}}
+
+
+def _row(values: list) -> dict:
+    return {"values": [_cell(v) for v in values]}
+
+
+class BatchWrite:
+    """Row updates/appends for several tabs of one spreadsheet, sent as one batchUpdate.
+
+    Values are written typed (numbers as numbers, everything else as text) rather
+    than parsed like USER_ENTERED input, so e.g. ISO dates stay plain strings.
+    """
+
+    def __init__(self):
+        self.requests: list[dict] = []
+        self._spreadsheet = None
+
+    def _track(self, ws):
+        if self._spreadsheet is None:
+            self._spreadsheet = ws.spreadsheet
+
+    def update_row(self, ws, row_no: int, values: list, first_col: int = 1):
+        self._track(ws)
+        self.requests.append({"updateCells": {
+            "start": {"sheetId": ws.id, "rowIndex": row_no - 1, "columnIndex": first_col - 1},
+            "rows": [_row(values)],
+            "fields": "userEnteredValue",
+        }})
+
+    def append_rows(self, ws, rows: list[list]):
+        if not rows:
+            return
+        self._track(ws)
+        self.requests.append({"appendCells": {
+            "sheetId": ws.id,
+            "rows": [_row(r) for r in rows],
+            "fields": "userEnteredValue",
+        }})
+
+    def swap_cell(self, ws, row_no: int, col: int, expected: str, new: str):
+        """Replace the cell's text with `new` only if it is exactly `expected` (see `swapped`)."""
+        self._track(ws)
+        self.requests.append({"findReplace": {
+            "find": expected,
+            "replacement": new,
+            "matchCase": True,
+            "matchEntireCell": True,
+            "range": {"sheetId": ws.id, "startRowIndex": row_no - 1, "endRowIndex": row_no,
+                      "startColumnIndex": col - 1, "endColumnIndex": col},
+        }})
+
+    def commit(self) -> list[dict]:
+        """Send the requests; returns the batchUpdate replies, one per request."""
+        replies = []
+        if self.requests:
+            resp = self._spreadsheet.batch_update({"requests": self.requests})
+            replies = (resp or {}).get("replies") or []
+        self.requests = []
+        return replies
+
+
+def swapped(replies: list[dict]) -> list[bool]:
+    """Which `swap_cell`s of a commit took effect, in order."""
+    return [bool((r.get("findReplace") or {}).get("occurrencesChanged")) for r in replies if "findReplace" in r]
+
+
+class WorksheetCache:
+    """Worksheet handles whose row 1 has been verified, shared by the whole process.
+
+    The first access to a tab opens it and checks its headers; later accesses make
+    no API calls. An entry is re-verified when the schema version or the expected
+    headers change, or after `forget()` (called when a Sheets call fails, since a
+    renamed tab or edited header row shows up as an API error).
+    """
+
+    def __init__(self, schema_version):
+        self.schema_version = schema_version
+        self._lock = threading.Lock()
+        self._tabs: dict[str, tuple[str, object]] = {}
+        self.verifications = 0
+
+    def _stamp(self, headers: list[str]) -> str:
+        digest = hashlib.sha1(json.dumps(headers).encode("utf-8")).hexdigest()[:12]
+        return f"{self.schema_version}:{digest}"
+
+    def get(self, name: str, headers: list[str], open_tab, verify):
+        """`open_tab(name)` -> worksheet; `verify(ws, headers)` checks/fixes row 1."""
+        stamp = self._stamp(headers)
+        with self._lock:
+            hit = self._tabs.get(name)
+        if hit and hit[0] == stamp:
+            return hit[1]
+
+        ws = open_tab(name)
+        verify(ws, headers)
+        with self._lock:
+            self._tabs[name] = (stamp, ws)
+            self.verifications += 1
+        return ws
+
+    def forget(self, name: str | None = None):
+        with self._lock:
+            if name is None:
+                self._tabs.clear()
+            else:
+                self._tabs.pop(name, None)
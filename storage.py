@@ -0,0 +1,1678 @@
+"""Storage backends for the HP bunk app.
+
+Every data path in app.py goes through a backend with the same small interface,
+so the app can run directly against Google Sheets or against a local, indexed
+SQLite file (and treat Sheets as an optional sync target).
+"""
+import functools
+import hashlib
+import json
+import os
+import random
+import re
+import secrets
+import sqlite3
+import threading
+import time
+from contextlib import nullcontext
+from datetime import date
+
+from sheets_io import BatchWrite, swapped
+
+
+# bump when any tab's header layout changes, so cached header checks are redone
+SCHEMA_VERSION = 5
+
+SUMMARY_SHEET = "Summary"
+SETTINGS_SHEET = "Settings"
+LEDGER_SHEET = "Ledger"
+LEDGER_LOG_SHEET = "Ledger_Log"
+LEDGER_SNAPSHOT_SHEET = "Ledger_Snapshots"
+ROLLUP_SHEET = "Monthly_Rollup"
+LEDGER_POSTINGS_SHEET = "Ledger_Postings"
+
+# line items of a day, one row each (replaces parsing Summary.details_json)
+ITEM_KINDS = {
+    # kind: (tab, name column, details_json key)
+    "credit": ("Credit_Items", "Customer", "customer_credit_rows"),
+    "collection": ("Collection_Items", "Customer", "debt_collection_rows"),
+    "expense": ("Expense_Items", "Expense", "other_expense_rows"),
+}
+
+# Summary columns summed per calendar month into Monthly_Rollup
+ROLLUP_FIELDS = [
+    "petrol_liters_sold", "petrol_amount", "diesel_liters_sold", "diesel_amount",
+    "oil_packets", "oil_amount",
+    "qr_amount", "advance_paid", "owner_phonepay_amount", "yesterday_balance_amount",
+    "customer_credit_total", "debt_collections_total", "other_expenses_total",
+    "total_sales", "cash_to_deposit",
+]
+
+# first Settings row (A2:B2): hash of the other rows, so readers can check for changes cheaply
+SETTINGS_VERSION_KEY = "_version"
+
+
+# =========================
+# SCHEMA
+# =========================
+def summary_headers():
+    return [
+        "date",
+        "employee_name",
+        "notes",
+        "p_open", "p_close", "p_test", "p_rate",
+        "d_open", "d_close", "d_test", "d_rate",
+        "petrol_liters_sold", "petrol_amount",
+        "diesel_liters_sold", "diesel_amount",
+        "oil_packets", "oil_price", "oil_amount",
+        "qr_amount", "advance_paid", "owner_phonepay_amount", "yesterday_balance_amount",
+        "customer_credit_total", "debt_collections_total", "other_expenses_total",
+        "total_sales", "cash_to_deposit",
+        "details_json",
+    ]
+
+
+def settings_headers():
+    return ["Key", "Value"]
+
+
+def ledger_headers():
+    # Rev: "<n>" = the row's write count, "<n>~<unix time>~<token>" while a writer has claimed it
+    return ["Customer", "Outstanding", "Rev"]
+
+
+def ledger_log_headers():
+    return [
+        "Log_Timestamp",
+        "Entry_Date",
+        "Type",            # CREDIT or PAYMENT
+        "Customer",
+        "Amount",
+        "Balance_Before",
+        "Balance_After",
+        "Employee",
+        "Notes",
+    ]
+
+
+def ledger_snapshot_headers():
+    return ["Snapshot_Timestamp", "Log_Seq", "Max_Entry_Date", "Balances_JSON"]
+
+
+def item_headers(kind: str):
+    # Item_Key = "<date>#<line>", so the tab can use the same row index as Summary/Ledger
+    return ["Item_Key", "date", ITEM_KINDS[kind][1], "Amount"]
+
+
+def item_key(ds: str, line: int) -> str:
+    return f"{ds}#{line}"
+
+
+def ledger_posting_headers():
+    # one row per (day, customer): the net the Daily Entry of that day has posted to the ledger;
+    # Rev as on the Ledger tab
+    return ["Posting_Key", "date", "Customer", "Posted", "Rev"]
+
+
+def rollup_headers():
+    return ["month", "days", *ROLLUP_FIELDS]
+
+
+def month_key(ds) -> str:
+    """'2024-05-17' -> '2024-05'."""
+    return str(ds)[:7]
+
+
+def col_letter(num: int) -> str:
+    s = ""
+    while num:
+        num, r = divmod(num - 1, 26)
+        s = chr(65 + r) + s
+    return s
+
+
+def pad_row(headers: list[str], values: list) -> dict:
+    if len(values) < len(headers):
+        values = list(values) + [""] * (len(headers) - len(values))
+    return dict(zip(headers, values))
+
+
+def _num(v) -> float:
+    try:
+        return float(v) if v not in (None, "") else 0.0
+    except Exception:
+        return 0.0
+
+
+def _cell_num(v) -> float:
+    """Like _num, but also reads formatted Sheets numbers ("1,234.50")."""
+    return _num(v.replace(",", "") if isinstance(v, str) else v)
+
+
+def rollup_add(current: dict | None, month: str, old: dict | None, new: dict | None) -> list:
+    """The month's rollup row after one day changed from `old` to `new` (None = no row)."""
+    cur, old, new = current or {}, old or {}, new or {}
+    days = int(_cell_num(cur.get("days"))) + (1 if new else 0) - (1 if old else 0)
+    return [month, days] + [
+        round(_cell_num(cur.get(f)) + _cell_num(new.get(f)) - _cell_num(old.get(f)), 2) for f in ROLLUP_FIELDS
+    ]
+
+
+def rollup_rows(summary_rows) -> list[list]:
+    """Summary rows -> one rollup row per month, in month order."""
+    months: dict[str, list] = {}
+    for r in summary_rows:
+        month = month_key(r.get("date", ""))
+        if len(month) == 7:
+            prev = months.get(month)
+            months[month] = rollup_add(dict(zip(rollup_headers(), prev)) if prev else None, month, None, r)
+    return [months[m] for m in sorted(months)]
+
+
+def _fold_entries(entries: list[tuple[str, float]], balances: dict, log_row) -> tuple[list, list]:
+    """Apply (customer, delta) entries to `balances` in place -> ((before, after) per entry, log rows)."""
+    results, logs = [], []
+    for i, (customer, delta) in enumerate(entries):
+        before = balances[customer]
+        after = before + delta
+        balances[customer] = after
+        results.append((before, after))
+        logs.append(log_row(i, before, after))
+    return results, logs
+
+
+def posting_entries(posted: dict, net: dict) -> list[tuple[str, float]]:
+    """(customer, delta) that take a day's postings from `posted` to `net` (both customer -> amount)."""
+    out = []
+    for customer in dict.fromkeys(list(net) + list(posted)):
+        delta = round(_num(net.get(customer)) - _num(posted.get(customer)), 2)
+        if delta:
+            out.append((customer, delta))
+    return out
+
+
+# a claim older than this is from a writer that died between claim and commit
+LEDGER_CLAIM_TTL = 30
+LEDGER_CAS_ATTEMPTS = 8
+
+
+def _rev(cell) -> tuple[int, float]:
+    """Ledger Rev cell -> (revision, claimed at; 0 if unclaimed)."""
+    n, _, rest = str(cell or "").partition("~")
+    try:
+        rev = int(float(n or 0))
+    except ValueError:
+        rev = 0
+    try:
+        return rev, float(rest.partition("~")[0]) if rest else 0.0
+    except ValueError:
+        return rev, 0.0
+
+
+def _backoff(attempt: int):
+    """Exponential backoff with full jitter, so retrying writers don't collide again in step."""
+    time.sleep(random.uniform(0, min(2.0, 0.05 * 2 ** attempt)))
+
+
+def _in_range(ds, start: date, end: date) -> bool:
+    """start inclusive, end exclusive; bad dates are skipped."""
+    try:
+        d = date.fromisoformat(str(ds)[:10])
+    except Exception:
+        return False
+    return start <= d < end
+
+
+def _a1_tab(title: str) -> str:
+    return "'" + title.replace("'", "''") + "'"
+
+
+def _value_ranges(resp: dict) -> list[list]:
+    """values_batch_get response -> each range's values, in request order."""
+    return [vr.get("values", []) for vr in (resp or {}).get("valueRanges", [])]
+
+
+def _first_cell(values: list) -> str:
+    return str(values[0][0]) if values and values[0] else ""
+
+
+def _keyed_items(rows: list[list]) -> list[list]:
+    """[[date, name, amount], ...] -> item rows with per-day line numbers."""
+    lines: dict[str, int] = {}
+    out = []
+    for ds, name, amount in rows:
+        ds = str(ds)[:10]
+        lines[ds] = lines.get(ds, 0) + 1
+        out.append([item_key(ds, lines[ds]), ds, name, amount])
+    return out
+
+
+def _row_from_range(a1: str) -> int | None:
+    """'Summary!A12:AB12' -> 12 (first row of an A1 range)."""
+    m = re.search(r"![A-Z]+(\d+)", a1 or "") or re.match(r"[A-Z]+(\d+)", a1 or "")
+    return int(m.group(1)) if m else None
+
+
+class RowIndex:
+    """Persistent column-A key -> sheet row map (date for Summary, customer for Ledger).
+
+    `last_row` is the revision stamp: the last data row we know about. Each access
+    probes the cell just below it (someone appended/inserted) and the key cell of the
+    row it is about to use (someone deleted/sorted); either mismatch invalidates the
+    index and column A is re-read once.
+    """
+
+    def __init__(self, path: str | None = None):
+        self.path = path
+        self._lock = threading.RLock()
+        self.rows: dict[str, int] = {}
+        self.last_row = 1
+        self.valid = False
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.rows = {str(k): int(v) for k, v in data.get("rows", {}).items()}
+            self.last_row = int(data.get("last_row", 1))
+            self.valid = True
+        except Exception:
+            self.invalidate()
+
+    def _save(self):
+        if not self.path:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"last_row": self.last_row, "rows": self.rows}, f)
+        os.replace(tmp, self.path)
+
+    def invalidate(self):
+        with self._lock:
+            self.rows, self.last_row, self.valid = {}, 1, False
+
+    def rebuild(self, colA: list):
+        """colA as returned by ws.col_values(1), header included."""
+        with self._lock:
+            self.rows = {}
+            for i, ds in enumerate(colA[1:], start=2):
+                if ds:
+                    self.rows.setdefault(str(ds), i)
+            self.last_row = max(len(colA), 1)
+            self.valid = True
+            self._save()
+
+    def add(self, ds: str, row_no: int):
+        with self._lock:
+            self.rows[ds] = row_no
+            self.last_row = max(self.last_row, row_no)
+            self._save()
+
+    def drop(self, key: str):
+        with self._lock:
+            if self.rows.pop(key, None) is not None:
+                self._save()
+
+    def with_prefix(self, prefix: str) -> list[tuple[str, int]]:
+        """(key, row) pairs whose key starts with `prefix`, in sheet order."""
+        with self._lock:
+            return sorted(((k, r) for k, r in self.rows.items() if k.startswith(prefix)), key=lambda kr: kr[1])
+
+    def tail_cell(self) -> str:
+        return f"A{self.last_row + 1}"
+
+    def rows_in_range(self, start: date, end: date) -> list[int]:
+        with self._lock:
+            return sorted(r for ds, r in self.rows.items() if _in_range(ds, start, end))
+
+
+class LogIndex:
+    """Ledger_Log customer -> sheet rows, and the last row seen.
+
+    The log is append-only, so catching up means reading columns A and D below
+    `last_row`. `last_stamp` (the Log_Timestamp in `last_row`) detects rows
+    deleted or re-sorted by hand; then both columns are read again from the top.
+    """
+
+    def __init__(self, path: str | None = None):
+        self.path = path
+        self._lock = threading.RLock()
+        self.rows: dict[str, list[int]] = {}
+        self.last_row = 1
+        self.last_stamp = ""
+        self.valid = False
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.rows = {str(k): [int(r) for r in v] for k, v in data.get("rows", {}).items()}
+            self.last_row = int(data.get("last_row", 1))
+            self.last_stamp = str(data.get("last_stamp", ""))
+            self.valid = True
+        except Exception:
+            self.invalidate()
+
+    def _save(self):
+        if not self.path:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"last_row": self.last_row, "last_stamp": self.last_stamp, "rows": self.rows}, f)
+        os.replace(tmp, self.path)
+
+    def invalidate(self):
+        with self._lock:
+            self.rows, self.last_row, self.last_stamp, self.valid = {}, 1, "", False
+
+    def extend(self, first_row: int, stamps: list[str], customers: list[str]):
+        """Rows first_row.. with their column A / column D values."""
+        if not stamps:
+            return
+        with self._lock:
+            for i, stamp in enumerate(stamps):
+                customer = str(customers[i]).strip() if i < len(customers) else ""
+                if customer:
+                    self.rows.setdefault(customer, []).append(first_row + i)
+            self.last_row = first_row + len(stamps) - 1
+            self.last_stamp = str(stamps[-1])
+            self._save()
+
+    def rebuild(self, stamps: list[str], customers: list[str]):
+        """Columns A and D from row 1 (header included)."""
+        with self._lock:
+            self.rows, self.last_row, self.last_stamp = {}, 1, str(stamps[0]) if stamps else ""
+            self.valid = True
+            self.extend(2, stamps[1:], customers[1:])
+            self._save()
+
+
+def _column(values: list) -> list[str]:
+    """A one-column range read -> its cells ("" for empty rows)."""
+    return [str(r[0]) if r else "" for r in values]
+
+
+def _runs(rows: list[int]) -> list[tuple[int, int]]:
+    """Sorted row numbers -> (first, last) of each consecutive run."""
+    out = []
+    for r in rows:
+        if out and r == out[-1][1] + 1:
+            out[-1] = (out[-1][0], r)
+        else:
+            out.append((r, r))
+    return out
+
+
+# =========================
+# INTERFACE
+# =========================
+class StorageBackend:
+    """What app.py needs from a store. Rows are plain lists ordered by the *_headers() functions."""
+
+    name = "base"
+
+    # settings
+    def read_settings(self) -> list[dict]:
+        raise NotImplementedError
+
+    def write_settings(self, payload: list[list]):
+        raise NotImplementedError
+
+    def read_settings_version(self) -> str | None:
+        """The `_version` row's value (None if the store predates it). Should be cheaper than read_settings."""
+        for r in self.read_settings():
+            if r.get("Key") == SETTINGS_VERSION_KEY:
+                return str(r.get("Value") or "") or None
+        return None
+
+    # summary
+    def fetch_summary(self, ds: str):
+        """Returns (row_dict, row_ref) or (None, None)."""
+        raise NotImplementedError
+
+    def upsert_summary(self, values: list) -> str:
+        """Returns "updated" or "appended"."""
+        raise NotImplementedError
+
+    def fetch_summary_range(self, start: date, end: date) -> list[dict]:
+        raise NotImplementedError
+
+    # monthly rollup, kept current by upsert_summary
+    def load_rollups(self, start_month: str, end_month: str) -> list[dict]:
+        """Rollup rows with start_month <= month <= end_month ("YYYY-MM"), in month order."""
+        raise NotImplementedError
+
+    def write_rollups(self, rows: list[list]):
+        """Replace the whole rollup table (rows ordered by rollup_headers())."""
+        raise NotImplementedError
+
+    # line items (Credit_Items / Collection_Items / Expense_Items)
+    def replace_day_items(self, ds: str, items: dict):
+        """Replace one day's items. `items`: kind -> [[name, amount], ...]; a missing kind means none."""
+        raise NotImplementedError
+
+    def load_items(self, kind: str, start: date, end: date) -> list[dict]:
+        """Rows {date, Customer|Expense, Amount} with start <= date < end."""
+        raise NotImplementedError
+
+    def bulk_load_items(self, items: dict):
+        """Rewrite the item tables. `items`: kind -> [[date, name, amount], ...]."""
+        raise NotImplementedError
+
+    def items_empty(self) -> bool:
+        raise NotImplementedError
+
+    # ledger
+    def load_ledger(self) -> list[dict]:
+        raise NotImplementedError
+
+    def get_ledger_balance(self, customer: str) -> float:
+        raise NotImplementedError
+
+    def get_ledger_balances(self, customers: list[str]) -> dict:
+        """customer -> balance for each of `customers` (customers without a row are left out)."""
+        rows = {r.get("Customer"): r.get("Outstanding") for r in self.load_ledger()}
+        return {c: _cell_num(rows[c]) for c in customers if c in rows}
+
+    def set_ledger_balance(self, customer: str, outstanding: float):
+        """Incremental write of one customer's balance (update the row or append it)."""
+        raise NotImplementedError
+
+    def post_ledger_entry(self, customer: str, delta: float, log_row) -> tuple[float, float]:
+        """Add `delta` to a customer's balance and append its Ledger_Log row. Returns (before, after).
+
+        `log_row(before, after)` builds the Ledger_Log row.
+        """
+        before = self.get_ledger_balance(customer)
+        after = before + delta
+        self.set_ledger_balance(customer, after)
+        self.append_ledger_log(log_row(before, after))
+        return before, after
+
+    def post_ledger_entries(self, entries: list[tuple[str, float]], log_row) -> list[tuple[float, float]]:
+        """`post_ledger_entry` for many (customer, delta) in order: each balance written once, logs appended together.
+
+        `log_row(i, before, after)` builds the Ledger_Log row of entries[i]. Returns (before, after) per entry.
+        """
+        balances = {}
+        for customer, _ in entries:
+            if customer not in balances:
+                balances[customer] = self.get_ledger_balance(customer)
+        results, logs = _fold_entries(entries, balances, log_row)
+        for customer, outstanding in balances.items():
+            self.set_ledger_balance(customer, outstanding)
+        self.append_ledger_logs(logs)
+        return results
+
+    def save_ledger(self, rows: list[list]):
+        """Full rewrite of the ledger (compaction)."""
+        raise NotImplementedError
+
+    # Daily Entry -> ledger postings (Ledger_Postings)
+    def day_postings(self, ds: str) -> dict:
+        """customer -> net amount the Daily Entry of `ds` has posted so far."""
+        raise NotImplementedError
+
+    def replace_day_postings(self, ds: str, net: dict):
+        """Record `net` (customer -> amount) as what day `ds` has posted; customers not in it are dropped."""
+        raise NotImplementedError
+
+    def load_postings(self) -> list[dict]:
+        """Every posting row {date, Customer, Posted}."""
+        raise NotImplementedError
+
+    def post_day_ledger(self, ds: str, net: dict, log_row) -> list[tuple[str, float, float, float]]:
+        """Bring day `ds`'s ledger postings to `net`, posting only the difference from last time.
+
+        `log_row(customer, delta, before, after)` builds each Ledger_Log row.
+        Returns (customer, delta, before, after) per posted change; [] if nothing changed.
+        """
+        entries = posting_entries(self.day_postings(ds), net)
+        if not entries:
+            return []
+        results = self.post_ledger_entries(entries, lambda i, before, after: log_row(*entries[i], before, after))
+        self.replace_day_postings(ds, net)
+        return [(c, d, before, after) for (c, d), (before, after) in zip(entries, results)]
+
+    def append_ledger_log(self, row: list):
+        raise NotImplementedError
+
+    def append_ledger_logs(self, rows: list[list]):
+        for row in rows:
+            self.append_ledger_log(row)
+
+    def load_ledger_logs(self) -> list[dict]:
+        raise NotImplementedError
+
+    def ledger_log_page(self, offset: int = 0, limit: int = 500) -> tuple[list[dict], int]:
+        """(rows newest first, skipping the `offset` newest; total rows in the log)."""
+        raise NotImplementedError
+
+    def ledger_log_for_customer(self, customer: str, limit: int | None = None) -> list[dict]:
+        """The customer's log rows, newest first (at most `limit`)."""
+        raise NotImplementedError
+
+    def load_ledger_events(self, after_seq: int = 0) -> list[tuple[int, dict]]:
+        """Ledger_Log rows after position `after_seq`, as (seq, row_dict) in log order."""
+        raise NotImplementedError
+
+    def load_ledger_snapshots(self) -> list[dict]:
+        raise NotImplementedError
+
+    def append_ledger_snapshot(self, row: list):
+        raise NotImplementedError
+
+    def transaction(self):
+        """Context manager grouping writes into one local transaction (a no-op unless the store has one)."""
+        return nullcontext()
+
+
+# =========================
+# GOOGLE SHEETS
+# =========================
+def _forget_ws_on_error(fn):
+    """A failed Sheets call may mean a tab was renamed or its headers edited: re-verify next time."""
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return fn(self, *args, **kwargs)
+        except Exception:
+            if self._forget_ws:
+                self._forget_ws()
+            raise
+    return wrapper
+
+
+class SheetsBackend(StorageBackend):
+    """Google Sheets as the primary store (the original behaviour).
+
+    `open_ws(name, headers)` must return a gspread Worksheet with verified headers;
+    app.py passes its safe_worksheet so auth/missing-tab errors stay in the UI layer.
+    `forget_ws()` is called when a Sheets call fails, to drop cached handles/header checks.
+    With `cas`, ledger writes claim their rows first (see `_commit_ledger`), so two
+    attendants posting at once can't overwrite each other's balance.
+    """
+
+    name = "sheets"
+
+    def __init__(self, open_ws, index_dir: str | None = None, forget_ws=None, cas: bool = True):
+        self._open_ws = open_ws
+        self._forget_ws = forget_ws
+        self.cas = cas
+        if index_dir:
+            os.makedirs(index_dir, exist_ok=True)
+        path = (lambda f: os.path.join(index_dir, f)) if index_dir else (lambda f: None)
+        self.summary_index = RowIndex(path("summary_rows.json"))
+        self.ledger_index = RowIndex(path("ledger_rows.json"))
+        self.item_index = {kind: RowIndex(path(f"{kind}_items_rows.json")) for kind in ITEM_KINDS}
+        self.rollup_index = RowIndex(path("rollup_rows.json"))
+        self.log_index = LogIndex(path("ledger_log_rows.json"))
+        self.posting_index = RowIndex(path("ledger_posting_rows.json"))
+
+    @staticmethod
+    def _ready(ws, idx: RowIndex) -> RowIndex:
+        if not idx.valid:
+            idx.rebuild(ws.col_values(1))
+        return idx
+
+    @_forget_ws_on_error
+    def read_settings(self) -> list[dict]:
+        ws = self._open_ws(SETTINGS_SHEET, settings_headers())
+        return ws.get_all_records()
+
+    @_forget_ws_on_error
+    def read_settings_version(self) -> str | None:
+        ws = self._open_ws(SETTINGS_SHEET, settings_headers())
+        row = (ws.get("A2:B2") or [[]])[0]
+        if len(row) >= 2 and row[0] == SETTINGS_VERSION_KEY:
+            return str(row[1]) or None
+        return None
+
+    @_forget_ws_on_error
+    def write_settings(self, payload: list[list]):
+        ws = self._open_ws(SETTINGS_SHEET, settings_headers())
+        ws.clear()
+        ws.update("A1", [settings_headers()])
+        ws.update("A2", payload)
+
+    def _probe(self, ws, idx: RowIndex, ranges: list[str]):
+        """One batch_get of `ranges` + the tail cell. Returns the values, or None if the tail moved."""
+        got = ws.batch_get(ranges + [idx.tail_cell()])
+        if got[-1] and got[-1][0] and str(got[-1][0][0]).strip():
+            idx.invalidate()
+            return None
+        return got[:-1]
+
+    def _locate(self, ws, idx: RowIndex, key: str, last_col: str = "A"):
+        """Verified (row_no, row values A..last_col) for `key`; row_no is None if absent."""
+        return self._locate_many([(ws, idx, key, last_col)])[0]
+
+    def _locate_keys(self, ws, idx: RowIndex, keys: list[str], last_col: str = "A") -> dict:
+        """`_locate` for many keys of one tab: {key: (row_no, values)}."""
+        return dict(zip(keys, self._locate_many([(ws, idx, k, last_col) for k in keys])))
+
+    def _locate_many(self, checks: list[tuple]) -> list[tuple]:
+        """`_locate` for several (ws, idx, key, last_col) at once, tabs of one spreadsheet.
+
+        One values_batch_get of every known row plus each index's tail cell; column A
+        is only re-read when an index is stale.
+        """
+        if not checks:
+            return []
+        for _ in range(2):
+            ranges, rows, tails = [], [], {}
+            for ws, idx, key, last_col in checks:
+                row_no = self._ready(ws, idx).rows.get(key)
+                rows.append(row_no)
+                if row_no:
+                    ranges.append(f"{_a1_tab(ws.title)}!A{row_no}:{last_col}{row_no}")
+                tails.setdefault(id(idx), (ws, idx))
+            ranges += [f"{_a1_tab(ws.title)}!{idx.tail_cell()}" for ws, idx in tails.values()]
+            got = _value_ranges(checks[0][0].spreadsheet.values_batch_get(ranges))
+            tail_values = iter(got[len(ranges) - len(tails):])
+            got = iter(got)
+
+            stale = {id(idx) for _, idx in tails.values() if _first_cell(next(tail_values)).strip()}
+            out = []
+            for (ws, idx, key, _), row_no in zip(checks, rows):
+                values = (next(got) or [[]])[0] if row_no else []
+                if row_no and (not values or str(values[0]) != key):
+                    stale.add(id(idx))
+                out.append((row_no, values) if row_no else (None, []))
+            if not stale:
+                return out
+            for _, idx in tails.values():
+                if id(idx) in stale:
+                    idx.invalidate()
+
+        # stale twice in a row (sheet is being edited): trust a fresh column A read
+        out = []
+        for ws, idx, key, _ in checks:
+            row_no = self._ready(ws, idx).rows.get(key)
+            out.append((row_no, ws.row_values(row_no)) if row_no else (None, []))
+        return out
+
+    @staticmethod
+    def _append_indexed(ws, idx: RowIndex, key: str, values: list, **kwargs):
+        resp = ws.append_row(values, **kwargs)
+        new_row = _row_from_range(((resp or {}).get("updates") or {}).get("updatedRange", ""))
+        if new_row:
+            idx.add(key, new_row)
+        else:
+            idx.invalidate()
+
+    @_forget_ws_on_error
+    def fetch_summary(self, ds: str):
+        headers = summary_headers()
+        ws = self._open_ws(SUMMARY_SHEET, headers)
+
+        row_no, values = self._locate(ws, self.summary_index, ds, col_letter(len(headers)))
+        if not row_no:
+            return None, None
+        return pad_row(headers, values), row_no
+
+    @_forget_ws_on_error
+    def upsert_summary(self, values: list) -> str:
+        # one values_batch_get (the day's row, its month's rollup row, both tails) + one values_batch_update,
+        # so the day and the rollup change together or not at all
+        headers, r_headers = summary_headers(), rollup_headers()
+        ws = self._open_ws(SUMMARY_SHEET, headers)
+        rws = self._open_ws(ROLLUP_SHEET, r_headers)
+        ds, month = values[0], month_key(values[0])
+        last_col, r_last_col = col_letter(len(headers)), col_letter(len(r_headers))
+
+        (row_no, old), (r_row_no, current) = self._locate_many([
+            (ws, self.summary_index, ds, last_col),
+            (rws, self.rollup_index, month, r_last_col),
+        ])
+        rollup = rollup_add(
+            pad_row(r_headers, current) if r_row_no else None, month,
+            pad_row(headers, old) if row_no else None, dict(zip(headers, values)),
+        )
+        rollup[0] = "'" + month   # keep "2024-05" text under USER_ENTERED
+
+        target = row_no or self.summary_index.last_row + 1
+        r_target = r_row_no or self.rollup_index.last_row + 1
+        ws.spreadsheet.values_batch_update({
+            "valueInputOption": "USER_ENTERED",
+            "data": [
+                {"range": f"{_a1_tab(ws.title)}!A{target}:{last_col}{target}", "values": [values]},
+                {"range": f"{_a1_tab(rws.title)}!A{r_target}:{r_last_col}{r_target}", "values": [rollup]},
+            ],
+        })
+        # both tails were just verified empty, so new rows landed right below them
+        if not row_no:
+            self.summary_index.add(ds, target)
+        if not r_row_no:
+            self.rollup_index.add(month, r_target)
+        return "updated" if row_no else "appended"
+
+    def _read_range(self, ws, idx: RowIndex, headers: list[str], start: date, end: date) -> list[dict]:
+        """Rows whose key (column A, starting with an ISO date) falls in [start, end), via the index."""
+        key_col, last_col = headers[0], col_letter(len(headers))
+
+        def in_range(rows):
+            return [r for r in rows if _in_range(r.get("date", ""), start, end)]
+
+        for _ in range(2):
+            idx = self._ready(ws, idx)
+            target_rows = idx.rows_in_range(start, end)
+            if not target_rows:
+                if self._probe(ws, idx, []) is None:
+                    continue
+                return []
+
+            # Read only the matching rows (min..max), then check the index still points at them
+            lo, hi = min(target_rows), max(target_rows)
+            got = self._probe(ws, idx, [f"A{lo}:{last_col}{hi}"])
+            if got is None:
+                continue
+            rows = [pad_row(headers, v) for v in got[0]]
+            expected = {r: key for key, r in idx.rows.items() if lo <= r <= hi}
+            if any(r - lo >= len(rows) or str(rows[r - lo][key_col]) != key for r, key in expected.items()):
+                idx.invalidate()
+                continue
+            return in_range(rows)
+
+        idx = self._ready(ws, idx)
+        target_rows = idx.rows_in_range(start, end)
+        if not target_rows:
+            return []
+        return in_range(pad_row(headers, v) for v in ws.get(f"A{min(target_rows)}:{last_col}{max(target_rows)}"))
+
+    @_forget_ws_on_error
+    def fetch_summary_range(self, start: date, end: date) -> list[dict]:
+        headers = summary_headers()
+        ws = self._open_ws(SUMMARY_SHEET, headers)
+        return self._read_range(ws, self.summary_index, headers, start, end)
+
+    @_forget_ws_on_error
+    def load_rollups(self, start_month: str, end_month: str) -> list[dict]:
+        ws = self._open_ws(ROLLUP_SHEET, rollup_headers())
+        rows = [r for r in ws.get_all_records() if start_month <= str(r.get("month", "")) <= end_month]
+        return sorted(rows, key=lambda r: str(r["month"]))
+
+    @_forget_ws_on_error
+    def write_rollups(self, rows: list[list]):
+        ws = self._open_ws(ROLLUP_SHEET, rollup_headers())
+        ws.clear()
+        ws.update("A1", [rollup_headers()] + [list(r) for r in rows])
+        self.rollup_index.rebuild([rollup_headers()[0]] + [r[0] for r in rows])
+
+    def _item_tab(self, kind: str):
+        return self._open_ws(ITEM_KINDS[kind][0], item_headers(kind)), self.item_index[kind]
+
+    @_forget_ws_on_error
+    def replace_day_items(self, ds: str, items: dict):
+        # one values_batch_get over the three tabs (the day's rows + each tail), one batchUpdate
+        tabs = {kind: self._item_tab(kind) for kind in ITEM_KINDS}
+        prefix = item_key(ds, "")
+
+        for attempt in range(3):
+            ranges, plan = [], []
+            for kind, (ws, idx) in tabs.items():
+                self._ready(ws, idx)
+                current = idx.with_prefix(prefix)
+                plan.append((kind, ws, idx, current))
+                ranges += [f"{_a1_tab(ws.title)}!A{r}" for _, r in current]
+                ranges.append(f"{_a1_tab(ws.title)}!{idx.tail_cell()}")
+            if attempt == 2:
+                break   # stale twice (tab being edited): go with the freshly rebuilt index
+            got = iter(_value_ranges(tabs["credit"][0].spreadsheet.values_batch_get(ranges)))
+            stale = False
+            for kind, ws, idx, current in plan:
+                keys_ok = all(_first_cell(next(got)) == key for key, _ in current)
+                tail_ok = not _first_cell(next(got)).strip()
+                if not (keys_ok and tail_ok):
+                    idx.invalidate()
+                    stale = True
+            if not stale:
+                break
+
+        batch = BatchWrite()
+        appended = []
+        for kind, ws, idx, current in plan:
+            new = [[item_key(ds, i), ds, name, amount] for i, (name, amount) in enumerate(items.get(kind) or [], start=1)]
+            for (old_key, row_no), values in zip(current, new):
+                batch.update_row(ws, row_no, values)
+                if old_key != values[0]:
+                    idx.drop(old_key)
+                    idx.add(values[0], row_no)
+            for old_key, row_no in current[len(new):]:
+                batch.update_row(ws, row_no, [""] * len(item_headers(kind)))
+                idx.drop(old_key)
+            extra = new[len(current):]
+            batch.append_rows(ws, extra)
+            appended.append((idx, extra))
+        batch.commit()
+
+        # appendCells doesn't return rows; assume the verified tail (re-checked before use)
+        for idx, rows in appended:
+            first = idx.last_row + 1
+            for i, values in enumerate(rows):
+                idx.add(values[0], first + i)
+
+    @_forget_ws_on_error
+    def load_items(self, kind: str, start: date, end: date) -> list[dict]:
+        ws, idx = self._item_tab(kind)
+        name_col = ITEM_KINDS[kind][1]
+        rows = self._read_range(ws, idx, item_headers(kind), start, end)
+        return [{"date": r["date"], name_col: r[name_col], "Amount": r["Amount"]} for r in rows]
+
+    @_forget_ws_on_error
+    def bulk_load_items(self, items: dict):
+        for kind in ITEM_KINDS:
+            ws, idx = self._item_tab(kind)
+            rows = _keyed_items(items.get(kind) or [])
+            ws.clear()
+            ws.update("A1", [item_headers(kind)])
+            if rows:
+                ws.update("A2", rows)
+            idx.rebuild([item_headers(kind)[0]] + [r[0] for r in rows])
+
+    @_forget_ws_on_error
+    def items_empty(self) -> bool:
+        for kind in ITEM_KINDS:
+            ws, idx = self._item_tab(kind)
+            if self._ready(ws, idx).rows:
+                return False
+        return True
+
+    @_forget_ws_on_error
+    def load_ledger(self) -> list[dict]:
+        ws = self._open_ws(LEDGER_SHEET, ledger_headers())
+        # rows blanked by a writer that lost a race to append the same customer are skipped
+        return [{k: r.get(k, "") for k in ("Customer", "Outstanding")} for r in ws.get_all_records() if r.get("Customer")]
+
+    @_forget_ws_on_error
+    def get_ledger_balance(self, customer: str) -> float:
+        ws = self._open_ws(LEDGER_SHEET, ledger_headers())
+        row_no, values = self._locate(ws, self.ledger_index, customer, "B")
+        return _cell_num(values[1]) if row_no and len(values) > 1 else 0.0
+
+    @_forget_ws_on_error
+    def get_ledger_balances(self, customers: list[str]) -> dict:
+        ws = self._open_ws(LEDGER_SHEET, ledger_headers())
+        found = self._locate_keys(ws, self.ledger_index, list(customers), "B")
+        return {c: _cell_num(v[1]) if len(v) > 1 else 0.0 for c, (row_no, v) in found.items() if row_no}
+
+    def _claim(self, targets: list[tuple]) -> list[dict] | None:
+        """Claim keyed rows of one or more tabs by swapping their Rev cells, in one batchUpdate.
+
+        `targets`: (ws, idx, rev_col, rows, new) per tab; `rows` {key: (row_no, values)}
+        are the rows to claim, `new` the keys to append in the same batchUpdate, as
+        claimed rows holding only the key (read as zero until the commit).
+
+        Two writers may append the same key at once: re-reading the tab then shows
+        both rows, the earlier one wins and the later one is blanked. (Appends land
+        after the last row with data, which can be above the indexed tail once a row
+        was blanked, so the tabs are re-read whole; it only happens for keys new to a
+        tab.) Returns {key: row_no} of the appended rows per target, or None if
+        another writer holds or just won any row; whatever this call did claim is
+        then given back, so nothing stays claimed.
+        """
+        now = time.time()
+        revs = [{k: str(v[col - 1]) if len(v) >= col else "" for k, (_, v) in rows.items()}
+                for _, _, col, rows, _ in targets]
+        if any(now - _rev(text)[1] < LEDGER_CLAIM_TTL for r in revs for text in r.values()):
+            return None
+        batch = BatchWrite()
+        for (ws, _, col, rows, _), r in zip(targets, revs):
+            for k, text in r.items():
+                if not text:
+                    batch.update_row(ws, rows[k][0], ["0"], first_col=col)
+        if batch.requests:
+            # rows written before the Rev column: findReplace can't match an empty cell
+            batch.commit()
+            return None
+
+        mark = f"0~{int(now)}~{secrets.token_hex(4)}"
+        claims = [{k: f"{_rev(text)[0]}{mark[1:]}" for k, text in r.items()} for r in revs]
+        for (ws, _, col, rows, new), r, c in zip(targets, revs, claims):
+            for k, text in r.items():
+                batch.swap_cell(ws, rows[k][0], col, text, c[k])
+            batch.append_rows(ws, [[k] + [""] * (col - 2) + [mark] for k in new])
+        won = swapped(batch.commit())
+
+        appended, lost, ours = [{} for _ in targets], [[] for _ in targets], [{} for _ in targets]
+        reread = [i for i, t in enumerate(targets) if t[4]]
+        if reread:
+            ranges = [f"{_a1_tab(targets[i][0].title)}!A1:{col_letter(targets[i][2])}" for i in reread]
+            for i, values in zip(reread, _value_ranges(targets[0][0].spreadsheet.values_batch_get(ranges))):
+                _, idx, col, _, new = targets[i]
+                keys = [str(v[0]) if v else "" for v in values]
+                for row_no, v in enumerate(values[1:], start=2):
+                    if len(v) >= col and str(v[col - 1]) == mark:
+                        ours[i][keys[row_no - 1]] = row_no
+                idx.rebuild(keys)   # first row of each key, i.e. the winners
+                for k in new:
+                    if k in ours[i] and idx.rows.get(k) == ours[i][k]:
+                        appended[i][k] = ours[i][k]
+                    else:
+                        lost[i].append(k)
+        if all(won) and not any(lost):
+            return appended
+
+        won = iter(won)
+        for i, ((ws, _, col, rows, _), r) in enumerate(zip(targets, revs)):
+            for k, text in r.items():
+                if next(won):
+                    batch.swap_cell(ws, rows[k][0], col, claims[i][k], text)
+            for row_no in appended[i].values():
+                batch.swap_cell(ws, row_no, col, mark, "0")
+            for k in lost[i]:
+                if k in ours[i]:
+                    batch.update_row(ws, ours[i][k], [""] * col)
+        batch.commit()
+        return None
+
+    def _commit_ledger(self, read, plan):
+        """Read-modify-write of Ledger rows (and Ledger_Postings rows) that can't lose a concurrent writer's update.
+
+        `read()` -> ({customer: (row_no, values A..C)} of the Ledger rows involved, state);
+        `plan(balances, state, batch)` changes `balances` (customer -> balance) in place,
+        queues its append-only writes (log rows) on `batch` and returns (result,
+        customers changed, keyed) where `keyed` are writes to other tabs with a Rev
+        column: [(ws, idx, rev_col, {key: (row_no, values)} as read, {key: values
+        before Rev, or None to blank the row})]. With `cas` every row written is
+        claimed first, keys new to a tab being appended as part of the claim; when
+        that fails the claims are dropped and, after a jittered backoff, the change is
+        planned again on a fresh read. The commit writes each row with Rev + 1, which
+        also releases the claim.
+        """
+        for attempt in range(LEDGER_CAS_ATTEMPTS):
+            rows, state = read()
+            # range reads are formatted ("1,234.50"), unlike get_all_records
+            balances = {c: _cell_num(v[1]) if row_no and len(v) > 1 else 0.0 for c, (row_no, v) in rows.items()}
+            batch = BatchWrite()
+            result, changed, keyed = plan(balances, state, batch)
+            targets = list(keyed)
+            if changed:
+                ws = self._open_ws(LEDGER_SHEET, ledger_headers())
+                targets.insert(0, (ws, self.ledger_index, 3, rows, {c: [c, balances[c]] for c in changed}))
+            if not targets and not batch.requests:
+                return result
+
+            appended = [{} for _ in targets]
+            if self.cas and targets:
+                appended = self._claim([
+                    (ws, idx, col, {k: found[k] for k in writes if found.get(k, (None,))[0]},
+                     [k for k, v in writes.items() if v is not None and not found.get(k, (None,))[0]])
+                    for ws, idx, col, found, writes in targets
+                ])
+                if appended is None:
+                    _backoff(attempt)
+                    continue
+
+            unclaimed = []
+            for (ws, idx, col, found, writes), app in zip(targets, appended):
+                new = []
+                for k, values in writes.items():
+                    row_no, old = found.get(k) or (None, [])
+                    row_no, old = (row_no, old) if row_no else (app.get(k), [])
+                    if values is None:
+                        if row_no:
+                            batch.update_row(ws, row_no, [""] * col)
+                            idx.drop(k)
+                    elif row_no:
+                        rev = _rev(old[col - 1] if len(old) >= col else "")[0] + 1
+                        batch.update_row(ws, row_no, list(values) + [""] * (col - 1 - len(values)) + [str(rev)])
+                    else:
+                        # without cas keys new to a tab are appended unclaimed (last writer wins)
+                        new.append(k)
+                        batch.append_rows(ws, [list(values) + [""] * (col - 1 - len(values)) + ["1"]])
+                unclaimed.append((idx, new))
+            batch.commit()
+            # appendCells doesn't return rows; the tails were just verified empty, and
+            # _locate re-checks the key cell before an entry is ever used
+            for idx, new in unclaimed:
+                for k in new:
+                    idx.add(k, idx.last_row + 1)
+            return result
+        raise RuntimeError("Ledger rows are busy (other attendants are posting); try again")
+
+    @_forget_ws_on_error
+    def set_ledger_balance(self, customer: str, outstanding: float):
+        ws = self._open_ws(LEDGER_SHEET, ledger_headers())
+
+        def read():
+            row_no, values = self._locate(ws, self.ledger_index, customer, "C")
+            return {customer: (row_no, values)}, None
+
+        def plan(balances, _, batch):
+            balances[customer] = outstanding
+            return None, [customer], []
+
+        self._commit_ledger(read, plan)
+
+    @_forget_ws_on_error
+    def post_ledger_entry(self, customer: str, delta: float, log_row) -> tuple[float, float]:
+        return self.post_ledger_entries([(customer, delta)], lambda i, before, after: log_row(before, after))[0]
+
+    @_forget_ws_on_error
+    def post_ledger_entries(self, entries: list[tuple[str, float]], log_row) -> list[tuple[float, float]]:
+        # one batch_get (every customer's row + tail probe), one batchUpdate claiming the rows,
+        # then one batchUpdate for both tabs; a lost claim redoes all three on fresh balances
+        ws = self._open_ws(LEDGER_SHEET, ledger_headers())
+        log_ws = self._open_ws(LEDGER_LOG_SHEET, ledger_log_headers())
+        customers = list(dict.fromkeys(c for c, _ in entries))
+
+        def read():
+            return self._locate_keys(ws, self.ledger_index, customers, "C"), None
+
+        def plan(balances, _, batch):
+            results, logs = _fold_entries(entries, balances, log_row)
+            batch.append_rows(log_ws, logs)
+            return results, customers, []
+
+        return self._commit_ledger(read, plan)
+
+    @_forget_ws_on_error
+    def save_ledger(self, rows: list[list]):
+        """Rewrite the whole Ledger tab; balances are last-writer-wins.
+
+        Every Rev moves past the highest one on the tab, so a writer that read a row
+        before the rewrite can't swap its claim into whatever row lands there. With
+        `cas` the rows are claimed first, so a writer between claim and commit keeps
+        them until it is done. The tab is written in one update, blanking leftover rows.
+        """
+        ws = self._open_ws(LEDGER_SHEET, ledger_headers())
+        for attempt in range(LEDGER_CAS_ATTEMPTS):
+            current = ws.get("A1:C")
+            held = {str(n): (n, v) for n, v in enumerate(current[1:], start=2) if v and str(v[0])}
+            if self.cas and held and self._claim([(ws, self.ledger_index, 3, held, [])]) is None:
+                _backoff(attempt)
+                continue
+            rev = max((_rev(v[2] if len(v) > 2 else "")[0] for v in current[1:]), default=0) + 1
+            body = [ledger_headers()] + [list(r[:2]) + [str(rev)] for r in rows]
+            ws.update("A1", body + [[""] * 3] * (len(current) - len(body)))
+            self.ledger_index.rebuild([ledger_headers()[0]] + [str(r[0]) for r in rows])
+            return
+        raise RuntimeError("Ledger rows are busy (other attendants are posting); try again")
+
+    def _locate_day_postings(self, ds: str, customers, with_ledger: bool = False) -> tuple[dict, dict]:
+        """Verified Ledger_Postings rows of day `ds` and, optionally, the Ledger rows of every customer involved.
+
+        One values_batch_get for both tabs. Returns ({customer: (row_no, values)} for
+        postings, the same for Ledger); customers are those already posted plus `customers`.
+        """
+        pws = self._open_ws(LEDGER_POSTINGS_SHEET, ledger_posting_headers())
+        ws = self._open_ws(LEDGER_SHEET, ledger_headers()) if with_ledger else None
+        pidx, prefix = self.posting_index, item_key(ds, "")
+        last_col = col_letter(len(ledger_posting_headers()))
+        for _ in range(3):
+            posted = [k[len(prefix):] for k, _ in self._ready(pws, pidx).with_prefix(prefix)]
+            names = list(dict.fromkeys(posted + [str(c) for c in customers]))
+            if not names:
+                return {}, {}
+            checks = [(pws, pidx, item_key(ds, c), last_col) for c in names]
+            if with_ledger:
+                checks += [(ws, self.ledger_index, c, "C") for c in names]
+            found = self._locate_many(checks)
+            # a stale index rebuilt by _locate_many may know rows of this day we didn't ask for
+            if {k for k, _ in pidx.with_prefix(prefix)} <= {item_key(ds, c) for c in names}:
+                break
+        return dict(zip(names, found[:len(names)])), dict(zip(names, found[len(names):]))
+
+    def _day_posting_writes(self, ds: str, found: dict, net: dict) -> list[tuple]:
+        """The `keyed` writes (see `_commit_ledger`) taking day `ds`'s posting rows from `found` to `net`.
+
+        Only rows whose amount changes are written; a zero amount is the same as no row.
+        """
+        pws = self._open_ws(LEDGER_POSTINGS_SHEET, ledger_posting_headers())
+        rows, writes = {}, {}
+        for customer, (row_no, values) in found.items():
+            key, amount = item_key(ds, customer), round(_num(net.get(customer)), 2)
+            rows[key] = (row_no, values)
+            posted = round(_cell_num(values[3]), 2) if row_no and len(values) > 3 else None
+            if amount and amount != posted:
+                writes[key] = [key, ds, customer, net[customer]]
+            elif not amount and row_no:
+                writes[key] = None
+        return [(pws, self.posting_index, len(ledger_posting_headers()), rows, writes)] if writes else []
+
+    @_forget_ws_on_error
+    def day_postings(self, ds: str) -> dict:
+        found, _ = self._locate_day_postings(ds, [])
+        return {c: _cell_num(v[3]) for c, (row_no, v) in found.items() if row_no and len(v) > 3}
+
+    @_forget_ws_on_error
+    def replace_day_postings(self, ds: str, net: dict):
+        # claimed like Ledger rows, so two saves of one date can't both append a customer's row
+        def read():
+            found, _ = self._locate_day_postings(ds, net)
+            return {}, found
+
+        def plan(_, found, batch):
+            return None, [], self._day_posting_writes(ds, found, net)
+
+        self._commit_ledger(read, plan)
+
+    @_forget_ws_on_error
+    def load_postings(self) -> list[dict]:
+        ws = self._open_ws(LEDGER_POSTINGS_SHEET, ledger_posting_headers())
+        return [{k: r.get(k, "") for k in ("date", "Customer", "Posted")} for r in ws.get_all_records() if r.get("Customer")]
+
+    @_forget_ws_on_error
+    def post_day_ledger(self, ds: str, net: dict, log_row) -> list[tuple[str, float, float, float]]:
+        # one values_batch_get (the day's postings, the customers' Ledger rows, tails), one
+        # batchUpdate claiming the Ledger and Ledger_Postings rows (plus a re-read when rows
+        # are new), then one batchUpdate for Ledger + Ledger_Log + Ledger_Postings -- or no
+        # write if nothing changed
+        log_ws = self._open_ws(LEDGER_LOG_SHEET, ledger_log_headers())
+
+        def read():
+            found, rows = self._locate_day_postings(ds, net, with_ledger=True)
+            return rows, found
+
+        def plan(balances, found, batch):
+            posted = {c: _cell_num(v[3]) for c, (row_no, v) in found.items() if row_no and len(v) > 3}
+            entries = posting_entries(posted, net)
+            if not entries:
+                return [], [], []
+            results, logs = _fold_entries(entries, balances, lambda i, before, after: log_row(*entries[i], before, after))
+            batch.append_rows(log_ws, logs)
+            posts = [(c, d, before, after) for (c, d), (before, after) in zip(entries, results)]
+            return posts, list(dict.fromkeys(c for c, _ in entries)), self._day_posting_writes(ds, found, net)
+
+        return self._commit_ledger(read, plan)
+
+    @_forget_ws_on_error
+    def append_ledger_log(self, row: list):
+        ws = self._open_ws(LEDGER_LOG_SHEET, ledger_log_headers())
+        ws.append_row(row, value_input_option="USER_ENTERED")
+
+    @_forget_ws_on_error
+    def append_ledger_logs(self, rows: list[list]):
+        if not rows:
+            return
+        ws = self._open_ws(LEDGER_LOG_SHEET, ledger_log_headers())
+        ws.append_rows(rows, value_input_option="USER_ENTERED")
+
+    @_forget_ws_on_error
+    def load_ledger_logs(self) -> list[dict]:
+        ws = self._open_ws(LEDGER_LOG_SHEET, ledger_log_headers())
+        return ws.get_all_records()
+
+    # Ledger_Log rows are read by range from the tail; the customer column lives in D
+    LOG_CUSTOMER_COL = "D"
+    LOG_BATCH_RANGES = 200   # ranges per batch_get, keeps the request URL short
+
+    def _log_catch_up(self, ws, extra_ranges: list[str]) -> tuple[list, bool]:
+        """Bring log_index up to date, reading `extra_ranges` in the same batch_get.
+
+        Returns (values of extra_ranges, whether they are still valid), i.e. False
+        when new rows showed up or the index had to be rebuilt.
+        """
+        idx, c = self.log_index, self.LOG_CUSTOMER_COL
+        if idx.valid:
+            n = idx.last_row
+            got = ws.batch_get([f"A{n}", f"A{n + 1}:A", f"{c}{n + 1}:{c}"] + extra_ranges)
+            if _first_cell(got[0]) == idx.last_stamp:
+                stamps = _column(got[1])
+                idx.extend(n + 1, stamps, _column(got[2]))
+                return got[3:], not stamps
+            idx.invalidate()
+        got = ws.batch_get(["A1:A", f"{c}1:{c}"])
+        idx.rebuild(_column(got[0]), _column(got[1]))
+        return [], False
+
+    @_forget_ws_on_error
+    def ledger_log_page(self, offset: int = 0, limit: int = 500) -> tuple[list[dict], int]:
+        headers = ledger_log_headers()
+        ws = self._open_ws(LEDGER_LOG_SHEET, headers)
+        last_col, idx = col_letter(len(headers)), self.log_index
+
+        def page():
+            hi = idx.last_row - offset
+            return f"A{max(2, hi - limit + 1)}:{last_col}{hi}" if hi >= 2 else None
+
+        # normally one call: the catch-up probe and the page (from the index as it was)
+        rng = page() if idx.valid else None
+        got, still_valid = self._log_catch_up(ws, [rng] if rng else [])
+        if still_valid:
+            values = got[0] if rng else []
+        else:
+            rng = page()
+            values = ws.get(rng) if rng else []
+        rows = [pad_row(headers, v) for v in values if any(v)]
+        return rows[::-1], idx.last_row - 1
+
+    @_forget_ws_on_error
+    def ledger_log_for_customer(self, customer: str, limit: int | None = None) -> list[dict]:
+        headers = ledger_log_headers()
+        ws = self._open_ws(LEDGER_LOG_SHEET, headers)
+        last_col, idx = col_letter(len(headers)), self.log_index
+        customer = customer.strip()
+
+        for _ in range(2):
+            self._log_catch_up(ws, [])
+            wanted = idx.rows.get(customer, [])
+            wanted = wanted[-limit:] if limit else wanted
+            runs = _runs(wanted)
+            values = []
+            for i in range(0, len(runs), self.LOG_BATCH_RANGES):
+                chunk = runs[i:i + self.LOG_BATCH_RANGES]
+                for got in ws.batch_get([f"A{a}:{last_col}{b}" for a, b in chunk]):
+                    values += list(got)
+            rows = [pad_row(headers, v) for v in values]
+            if len(rows) == len(wanted) and all(str(r["Customer"]).strip() == customer for r in rows):
+                return rows[::-1]
+            idx.invalidate()   # rows moved without touching the last one (e.g. sorted by hand)
+        return rows[::-1]
+
+    @_forget_ws_on_error
+    def load_ledger_events(self, after_seq: int = 0) -> list[tuple[int, dict]]:
+        # seq = sheet row - 1, so the tail starts at row after_seq + 2
+        headers = ledger_log_headers()
+        ws = self._open_ws(LEDGER_LOG_SHEET, headers)
+        values = ws.get(f"A{after_seq + 2}:{col_letter(len(headers))}")
+        return [(after_seq + i, pad_row(headers, v)) for i, v in enumerate(values, start=1) if any(v)]
+
+    @_forget_ws_on_error
+    def load_ledger_snapshots(self) -> list[dict]:
+        ws = self._open_ws(LEDGER_SNAPSHOT_SHEET, ledger_snapshot_headers())
+        return ws.get_all_records()
+
+    @_forget_ws_on_error
+    def append_ledger_snapshot(self, row: list):
+        ws = self._open_ws(LEDGER_SNAPSHOT_SHEET, ledger_snapshot_headers())
+        ws.append_row(row, value_input_option="RAW")
+
+
+# =========================
+# LOCAL SQLITE
+# =========================
+def _q(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+class Transaction:
+    """A SQLite connection and the lock serializing its writers.
+
+    `with tx:` takes the lock and commits on leaving (rolls back on an error).
+    Blocks nested on the same thread join the outermost one, so writes from
+    several calls (a store write and its sync outbox entry) commit together.
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.lock = threading.RLock()
+        self._depth = 0
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.lock.acquire()
+        self._depth += 1
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self._depth -= 1
+        try:
+            if not self._depth:
+                if exc_type is None:
+                    self.conn.commit()
+                else:
+                    self.conn.rollback()
+        finally:
+            self.lock.release()
+
+
+class SQLiteBackend(StorageBackend):
+    """Local SQLite file: the same tabs as tables, indexed by date / customer.
+
+    One connection shared by all sessions of the process; a lock serializes writers.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._tx = Transaction(self._conn)
+        self._lock = self._tx.lock
+        self._init_schema()
+
+    def transaction(self) -> Transaction:
+        return self._tx
+
+    def _init_schema(self):
+        summary_cols = ", ".join(
+            f"{_q(h)} TEXT PRIMARY KEY" if h == "date" else _q(h) for h in summary_headers()
+        )
+        log_cols = ", ".join(_q(h) for h in ledger_log_headers())
+        with self._tx:
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS summary ({summary_cols})")
+            self._conn.execute('CREATE TABLE IF NOT EXISTS settings ("Key" TEXT PRIMARY KEY, "Value")')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS ledger ("Customer" TEXT PRIMARY KEY, "Outstanding" REAL)')
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS ledger_log (id INTEGER PRIMARY KEY AUTOINCREMENT, {log_cols})"
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS ledger_log_customer ON ledger_log ("Customer")')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS ledger_log_entry_date ON ledger_log ("Entry_Date")')
+            snap_cols = ", ".join(_q(h) for h in ledger_snapshot_headers())
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS ledger_snapshots (id INTEGER PRIMARY KEY AUTOINCREMENT, {snap_cols})"
+            )
+            for kind, (_, name_col, _) in ITEM_KINDS.items():
+                self._conn.execute(
+                    f'CREATE TABLE IF NOT EXISTS {kind}_items ("date" TEXT, "Line" INTEGER, {_q(name_col)} TEXT,'
+                    f' "Amount" REAL, PRIMARY KEY ("date", "Line"))'
+                )
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS {kind}_items_name ON {kind}_items ({_q(name_col)})")
+            rollup_cols = ", ".join(_q(h) for h in rollup_headers()[1:])
+            self._conn.execute(f'CREATE TABLE IF NOT EXISTS monthly_rollup ("month" TEXT PRIMARY KEY, {rollup_cols})')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS ledger_postings ("date" TEXT, "Customer" TEXT, "Posted" REAL,'
+                ' PRIMARY KEY ("date", "Customer"))'
+            )
+
+    def _rows(self, sql: str, params=()) -> list[dict]:
+        with self._lock:
+            return [dict(r) for r in self._conn.execute(sql, params).fetchall()]
+
+    def read_settings(self) -> list[dict]:
+        return self._rows('SELECT "Key", "Value" FROM settings ORDER BY rowid')
+
+    def read_settings_version(self) -> str | None:
+        rows = self._rows('SELECT "Value" FROM settings WHERE "Key" = ?', (SETTINGS_VERSION_KEY,))
+        return str(rows[0]["Value"]) if rows and rows[0]["Value"] else None
+
+    def write_settings(self, payload: list[list]):
+        with self._tx:
+            self._conn.execute("DELETE FROM settings")
+            self._conn.executemany('INSERT INTO settings ("Key", "Value") VALUES (?, ?)', payload)
+
+    def fetch_summary(self, ds: str):
+        rows = self._rows('SELECT rowid AS _rowid, * FROM summary WHERE "date" = ?', (ds,))
+        if not rows:
+            return None, None
+        row = rows[0]
+        return pad_row(summary_headers(), [row.get(h, "") for h in summary_headers()]), row["_rowid"]
+
+    def upsert_summary(self, values: list) -> str:
+        headers = summary_headers()
+        cols = ", ".join(_q(h) for h in headers)
+        marks = ", ".join("?" for _ in headers)
+        updates = ", ".join(f"{_q(h)} = excluded.{_q(h)}" for h in headers[1:])
+        with self._tx:
+            exists = self._conn.execute('SELECT 1 FROM summary WHERE "date" = ?', (values[0],)).fetchone()
+            self._conn.execute(
+                f'INSERT INTO summary ({cols}) VALUES ({marks}) ON CONFLICT("date") DO UPDATE SET {updates}',
+                list(values),
+            )
+            self._refresh_rollup(month_key(values[0]))
+        return "updated" if exists else "appended"
+
+    def _refresh_rollup(self, month: str):
+        # re-summing <= 31 indexed rows is as cheap as applying a delta, and can't drift
+        sums = ", ".join(f"ROUND(TOTAL({_q(f)}), 2)" for f in ROLLUP_FIELDS)
+        self._conn.execute(
+            f"INSERT OR REPLACE INTO monthly_rollup ({', '.join(_q(h) for h in rollup_headers())})"
+            f' SELECT ?, COUNT(*), {sums} FROM summary WHERE "date" >= ? AND "date" < ?',
+            (month, f"{month}-01", f"{month}-32"),
+        )
+
+    def load_rollups(self, start_month: str, end_month: str) -> list[dict]:
+        return self._rows(
+            'SELECT * FROM monthly_rollup WHERE "month" >= ? AND "month" <= ? ORDER BY "month"',
+            (start_month, end_month),
+        )
+
+    def write_rollups(self, rows: list[list]):
+        cols = ", ".join(_q(h) for h in rollup_headers())
+        marks = ", ".join("?" for _ in rollup_headers())
+        with self._tx:
+            self._conn.execute("DELETE FROM monthly_rollup")
+            self._conn.executemany(f"INSERT INTO monthly_rollup ({cols}) VALUES ({marks})", [list(r) for r in rows])
+
+    def fetch_summary_range(self, start: date, end: date) -> list[dict]:
+        rows = self._rows(
+            'SELECT * FROM summary WHERE "date" >= ? AND "date" < ? ORDER BY "date"',
+            (start.isoformat(), end.isoformat()),
+        )
+        return [r for r in rows if _in_range(r.get("date", ""), start, end)]
+
+    def replace_day_items(self, ds: str, items: dict):
+        with self._tx:
+            for kind, (_, name_col, _) in ITEM_KINDS.items():
+                self._conn.execute(f'DELETE FROM {kind}_items WHERE "date" = ?', (ds,))
+                self._conn.executemany(
+                    f'INSERT INTO {kind}_items ("date", "Line", {_q(name_col)}, "Amount") VALUES (?, ?, ?, ?)',
+                    [(ds, i, name, amount) for i, (name, amount) in enumerate(items.get(kind) or [], start=1)],
+                )
+
+    def load_items(self, kind: str, start: date, end: date) -> list[dict]:
+        name_col = ITEM_KINDS[kind][1]
+        return self._rows(
+            f'SELECT "date", {_q(name_col)}, "Amount" FROM {kind}_items'
+            ' WHERE "date" >= ? AND "date" < ? ORDER BY "date", "Line"',
+            (start.isoformat(), end.isoformat()),
+        )
+
+    def bulk_load_items(self, items: dict):
+        with self._tx:
+            for kind, (_, name_col, _) in ITEM_KINDS.items():
+                self._conn.execute(f"DELETE FROM {kind}_items")
+                self._conn.executemany(
+                    f'INSERT INTO {kind}_items ("date", "Line", {_q(name_col)}, "Amount") VALUES (?, ?, ?, ?)',
+                    [(ds, int(key.rsplit("#", 1)[1]), name, amount)
+                     for key, ds, name, amount in _keyed_items(items.get(kind) or [])],
+                )
+
+    def items_empty(self) -> bool:
+        return not any(self._rows(f"SELECT 1 FROM {kind}_items LIMIT 1") for kind in ITEM_KINDS)
+
+    def load_ledger(self) -> list[dict]:
+        return self._rows('SELECT "Customer", "Outstanding" FROM ledger')
+
+    def get_ledger_balance(self, customer: str) -> float:
+        rows = self._rows('SELECT "Outstanding" FROM ledger WHERE "Customer" = ?', (customer,))
+        return _num(rows[0]["Outstanding"]) if rows else 0.0
+
+    def set_ledger_balance(self, customer: str, outstanding: float):
+        with self._tx:
+            self._conn.execute(
+                'INSERT INTO ledger ("Customer", "Outstanding") VALUES (?, ?)'
+                ' ON CONFLICT("Customer") DO UPDATE SET "Outstanding" = excluded."Outstanding"',
+                (customer, outstanding),
+            )
+
+    def save_ledger(self, rows: list[list]):
+        with self._tx:
+            self._conn.execute("DELETE FROM ledger")
+            self._conn.executemany('INSERT INTO ledger ("Customer", "Outstanding") VALUES (?, ?)', rows)
+
+    def _post_entries(self, entries: list[tuple[str, float]], log_row) -> list[tuple[float, float]]:
+        """post_ledger_entries inside the caller's transaction."""
+        cols = ", ".join(_q(h) for h in ledger_log_headers())
+        marks = ", ".join("?" for _ in ledger_log_headers())
+        balances = {}
+        for customer, _ in entries:
+            if customer not in balances:
+                r = self._conn.execute('SELECT "Outstanding" FROM ledger WHERE "Customer" = ?', (customer,)).fetchone()
+                balances[customer] = _num(r[0]) if r else 0.0
+        results, logs = _fold_entries(entries, balances, log_row)
+        self._conn.executemany(
+            'INSERT INTO ledger ("Customer", "Outstanding") VALUES (?, ?)'
+            ' ON CONFLICT("Customer") DO UPDATE SET "Outstanding" = excluded."Outstanding"',
+            list(balances.items()),
+        )
+        self._conn.executemany(f"INSERT INTO ledger_log ({cols}) VALUES ({marks})", [list(r) for r in logs])
+        return results
+
+    def post_ledger_entries(self, entries: list[tuple[str, float]], log_row) -> list[tuple[float, float]]:
+        # one transaction: all balances and log rows, or none
+        with self._tx:
+            return self._post_entries(entries, log_row)
+
+    def day_postings(self, ds: str) -> dict:
+        rows = self._rows('SELECT "Customer", "Posted" FROM ledger_postings WHERE "date" = ?', (ds,))
+        return {r["Customer"]: _num(r["Posted"]) for r in rows}
+
+    def _replace_day_postings(self, ds: str, net: dict):
+        self._conn.execute('DELETE FROM ledger_postings WHERE "date" = ?', (ds,))
+        self._conn.executemany(
+            'INSERT INTO ledger_postings ("date", "Customer", "Posted") VALUES (?, ?, ?)',
+            [(ds, c, amount) for c, amount in net.items()],
+        )
+
+    def replace_day_postings(self, ds: str, net: dict):
+        with self._tx:
+            self._replace_day_postings(ds, net)
+
+    def load_postings(self) -> list[dict]:
+        return self._rows('SELECT "date", "Customer", "Posted" FROM ledger_postings ORDER BY "date", rowid')
+
+    def post_day_ledger(self, ds: str, net: dict, log_row) -> list[tuple[str, float, float, float]]:
+        # one transaction: the diff against the day's postings, balances, log rows and the new postings
+        with self._tx:
+            posted = {c: _num(v) for c, v in self._conn.execute(
+                'SELECT "Customer", "Posted" FROM ledger_postings WHERE "date" = ?', (ds,)
+            ).fetchall()}
+            entries = posting_entries(posted, net)
+            if not entries:
+                return []
+            results = self._post_entries(entries, lambda i, before, after: log_row(*entries[i], before, after))
+            self._replace_day_postings(ds, net)
+        return [(c, d, before, after) for (c, d), (before, after) in zip(entries, results)]
+
+    def append_ledger_log(self, row: list):
+        self.append_ledger_logs([row])
+
+    def append_ledger_logs(self, rows: list[list]):
+        cols = ", ".join(_q(h) for h in ledger_log_headers())
+        marks = ", ".join("?" for _ in ledger_log_headers())
+        with self._tx:
+            self._conn.executemany(f"INSERT INTO ledger_log ({cols}) VALUES ({marks})", [list(r) for r in rows])
+
+    def load_ledger_logs(self) -> list[dict]:
+        cols = ", ".join(_q(h) for h in ledger_log_headers())
+        return self._rows(f"SELECT {cols} FROM ledger_log ORDER BY id")
+
+    def ledger_log_page(self, offset: int = 0, limit: int = 500) -> tuple[list[dict], int]:
+        cols = ", ".join(_q(h) for h in ledger_log_headers())
+        rows = self._rows(f"SELECT {cols} FROM ledger_log ORDER BY id DESC LIMIT ? OFFSET ?", (limit, offset))
+        return rows, self._rows("SELECT COUNT(*) AS n FROM ledger_log")[0]["n"]
+
+    def ledger_log_for_customer(self, customer: str, limit: int | None = None) -> list[dict]:
+        cols = ", ".join(_q(h) for h in ledger_log_headers())
+        return self._rows(
+            f'SELECT {cols} FROM ledger_log WHERE "Customer" = ? ORDER BY id DESC LIMIT ?',
+            (customer.strip(), -1 if limit is None else limit),
+        )
+
+    def load_ledger_events(self, after_seq: int = 0) -> list[tuple[int, dict]]:
+        cols = ", ".join(_q(h) for h in ledger_log_headers())
+        rows = self._rows(f"SELECT id AS _seq, {cols} FROM ledger_log WHERE id > ? ORDER BY id", (after_seq,))
+        return [(r.pop("_seq"), r) for r in rows]
+
+    def load_ledger_snapshots(self) -> list[dict]:
+        cols = ", ".join(_q(h) for h in ledger_snapshot_headers())
+        return self._rows(f"SELECT {cols} FROM ledger_snapshots ORDER BY id")
+
+    def append_ledger_snapshot(self, row: list):
+        cols = ", ".join(_q(h) for h in ledger_snapshot_headers())
+        marks = ", ".join("?" for _ in ledger_snapshot_headers())
+        with self._tx:
+            self._conn.execute(f"INSERT INTO ledger_snapshots ({cols}) VALUES ({marks})", list(row))
+
+
+def copy_all(src: StorageBackend, dst: StorageBackend) -> dict:
+    """One-off seed of `dst` from `src` (e.g. Google -> local). Returns row counts."""
+    settings = [[r.get("Key", ""), r.get("Value", "")] for r in src.read_settings() if r.get("Key")]
+    dst.write_settings(settings)
+
+    headers = summary_headers()
+    summary = src.fetch_summary_range(date.min, date.max)
+    for r in summary:
+        dst.upsert_summary([r.get(h, "") for h in headers])
+
+    ledger = [[r.get("Customer", ""), r.get("Outstanding", 0)] for r in src.load_ledger()]
+    dst.save_ledger(ledger)
+
+    logs = src.load_ledger_logs()
+    dst.append_ledger_logs([[r.get(h, "") for h in ledger_log_headers()] for r in logs])
+
+    items = {
+        kind: [[r.get("date", ""), r.get(name_col, ""), r.get("Amount", 0)] for r in src.load_items(kind, date.min, date.max)]
+        for kind, (_, name_col, _) in ITEM_KINDS.items()
+    }
+    dst.bulk_load_items(items)
+    rollups = rebuild_rollups(dst)
+
+    postings: dict[str, dict] = {}
+    for r in src.load_postings():
+        postings.setdefault(str(r.get("date", ""))[:10], {})[str(r.get("Customer", ""))] = _cell_num(r.get("Posted"))
+    for ds, net in postings.items():
+        dst.replace_day_postings(ds, net)
+
+    return {
+        "settings": len(settings), "summary": len(summary), "ledger": len(ledger), "ledger_log": len(logs),
+        **{f"{kind}_items": len(rows) for kind, rows in items.items()},
+        "monthly_rollup": rollups,
+        "ledger_postings": sum(len(net) for net in postings.values()),
+    }
+
+
+def items_from_details(details_json) -> dict:
+    """Summary.details_json -> kind -> [[name, amount], ...] (blank names / non-positive amounts dropped)."""
+    try:
+        details = json.loads(details_json) if isinstance(details_json, str) and details_json.strip() else {}
+    except Exception:
+        details = {}
+    if not isinstance(details, dict):
+        details = {}
+    out = {}
+    for kind, (_, name_col, key) in ITEM_KINDS.items():
+        rows = []
+        for item in details.get(key) or []:
+            if not isinstance(item, dict):
+                continue
+            name, amount = str(item.get(name_col) or "").strip(), _num(item.get("Amount"))
+            if name and amount > 0:
+                rows.append([name, amount])
+        out[kind] = rows
+    return out
+
+
+def rebuild_rollups(backend: StorageBackend) -> int:
+    """Recompute Monthly_Rollup from every Summary row (first use, or after editing Summary by hand)."""
+    rows = rollup_rows(backend.fetch_summary_range(date.min, date.max))
+    backend.write_rollups(rows)
+    return len(rows)
+
+
+def migrate_items(backend: StorageBackend) -> dict:
+    """One-time build of the item tables from every Summary row's details_json. Returns item counts."""
+    items = {kind: [] for kind in ITEM_KINDS}
+    for r in sorted(backend.fetch_summary_range(date.min, date.max), key=lambda r: str(r.get("date", ""))):
+        ds = str(r.get("date", ""))[:10]
+        for kind, rows in items_from_details(r.get("details_json")).items():
+            items[kind] += [[ds, name, amount] for name, amount in rows]
+    backend.bulk_load_items(items)
+    return {kind: len(rows) for kind, rows in items.items()}
+
+
+def settings_version(rows: list[list]) -> str:
+    blob = json.dumps([r for r in rows if r[0] != SETTINGS_VERSION_KEY], ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+
+
+def settings_payload(settings: dict) -> list[list]:
+    rows = [
+        ["employees", json.dumps(settings.get("employees", []), ensure_ascii=False)],
+        ["customers", json.dumps(settings.get("customers", []), ensure_ascii=False)],
+        ["expense_names", json.dumps(settings.get("expense_names", []), ensure_ascii=False)],
+        ["oil_prices", json.dumps(settings.get("oil_prices", []), ensure_ascii=False)],
+    ]
+    return [[SETTINGS_VERSION_KEY, settings_version(rows)]] + rows
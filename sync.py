@@ -0,0 +1,455 @@
+"""Write-behind sync from the local store to Google Sheets.
+
+Saves commit to the local backend right away and drop an entry into a durable
+on-disk outbox. With a SQLite store the outbox is a table in the store's
+database, and each write commits in the same transaction as its entry. A
+background worker drains the outbox in FIFO batches, coalescing repeated
+writes, with exponential backoff + jitter while the network is down.
+"""
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from storage import StorageBackend, Transaction
+
+
+MAX_ATTEMPTS = 10
+BATCH_SIZE = 100
+BACKOFF_BASE = 2.0      # seconds
+BACKOFF_CAP = 300.0     # seconds
+IDLE_POLL = 30.0        # seconds between checks when nothing is queued
+
+# kinds that touch the same data and must keep their relative order;
+# anything else only depends on writes of its own kind
+FAMILIES = {
+    "save_ledger": "ledger",
+    "set_ledger_balance": "ledger",
+    "upsert_summary": "summary",
+    "write_rollups": "summary",
+    "replace_day_items": "items",
+    "bulk_load_items": "items",
+}
+
+
+class Outbox:
+    """Durable FIFO queue of pending writes.
+
+    Its own SQLite file at `path`, or with `store` (a SQLiteBackend) a table in
+    the store's database: a write to the store and its entry then share one
+    transaction (`store.transaction()`), so a crash keeps both or neither.
+    Entries left in a standalone file at `path` are moved into the store.
+    """
+
+    def __init__(self, path: str, store: StorageBackend | None = None):
+        self.path = path
+        if store is None:
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._tx = Transaction(conn)
+        else:
+            self._tx = store.transaction()
+        self._lock, self._conn = self._tx.lock, self._tx.conn
+        with self._tx:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS outbox ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " kind TEXT NOT NULL,"
+                " payload TEXT NOT NULL,"
+                " created REAL NOT NULL,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " status TEXT NOT NULL DEFAULT 'pending',"   # pending | dead
+                " last_error TEXT)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS outbox_status ON outbox (status, id)")
+        if store is not None and os.path.exists(path):
+            self._move_in(path)
+
+    def _move_in(self, path: str):
+        """Take over the entries of a standalone outbox file (as older versions kept), then delete it."""
+        old = sqlite3.connect(path)
+        try:
+            rows = old.execute(
+                "SELECT kind, payload, created, attempts, status, last_error FROM outbox ORDER BY id"
+            ).fetchall()
+        except sqlite3.OperationalError:   # no outbox table
+            rows = []
+        finally:
+            old.close()
+        with self._tx:
+            # skip what an earlier, interrupted move already copied
+            self._conn.executemany(
+                "INSERT INTO outbox (kind, payload, created, attempts, status, last_error)"
+                " SELECT ?, ?, ?, ?, ?, ? WHERE NOT EXISTS"
+                " (SELECT 1 FROM outbox WHERE created = ? AND kind = ? AND payload = ?)",
+                [(*r, r[2], r[0], r[1]) for r in rows],
+            )
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    def put(self, kind: str, payload) -> int:
+        with self._tx:
+            cur = self._conn.execute(
+                "INSERT INTO outbox (kind, payload, created) VALUES (?, ?, ?)",
+                (kind, json.dumps(payload, ensure_ascii=False, default=str), time.time()),
+            )
+            return cur.lastrowid
+
+    def head(self, limit: int = BATCH_SIZE) -> list[tuple[int, str, object]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, kind, payload FROM outbox WHERE status = 'pending' ORDER BY id LIMIT ?", (limit,)
+            ).fetchall()
+        return [(i, k, json.loads(p)) for i, k, p in rows]
+
+    def ack(self, ids: list[int]):
+        with self._tx:
+            self._conn.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i in ids])
+
+    def fail(self, ids: list[int], error: str):
+        """Count a failed attempt; entries past MAX_ATTEMPTS are parked as 'dead'."""
+        with self._tx:
+            self._conn.executemany(
+                "UPDATE outbox SET attempts = attempts + 1, last_error = ?,"
+                " status = CASE WHEN attempts + 1 >= ? THEN 'dead' ELSE status END WHERE id = ?",
+                [(error[:500], MAX_ATTEMPTS, i) for i in ids],
+            )
+
+    def retry_dead(self) -> int:
+        with self._tx:
+            return self._conn.execute("UPDATE outbox SET status = 'pending', attempts = 0 WHERE status = 'dead'").rowcount
+
+    def counts(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall()
+        out = {"pending": 0, "dead": 0}
+        out.update(dict(rows))
+        return out
+
+    def last_error(self) -> str:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_error FROM outbox WHERE last_error IS NOT NULL ORDER BY id LIMIT 1"
+            ).fetchone()
+        return row[0] if row else ""
+
+
+# =========================
+# BATCH HANDLERS
+# =========================
+def _last_per_key(payloads: list, key) -> list:
+    """Keep only the newest payload per key, in order of last write."""
+    latest = {}
+    for p in payloads:
+        latest.pop(key(p), None)
+        latest[key(p)] = p
+    return list(latest.values())
+
+
+def sheets_handlers(target: StorageBackend) -> dict:
+    """Outbox kind -> fn(list_of_payloads) that pushes one coalesced batch to `target`."""
+    def summary(payloads):
+        for values in _last_per_key(payloads, key=lambda v: v[0]):
+            target.upsert_summary(values)
+
+    def ledger(payloads):
+        target.save_ledger(payloads[-1])
+
+    def ledger_balance(payloads):
+        for customer, outstanding in _last_per_key(payloads, key=lambda p: p[0]):
+            target.set_ledger_balance(customer, outstanding)
+
+    def ledger_log(payloads):
+        target.append_ledger_logs(payloads)
+
+    def settings(payloads):
+        target.write_settings(payloads[-1])
+
+    def rollups(payloads):
+        target.write_rollups(payloads[-1])
+
+    def day_items(payloads):
+        for ds, items in _last_per_key(payloads, key=lambda p: p[0]):
+            target.replace_day_items(ds, items)
+
+    def day_postings(payloads):
+        for ds, net in _last_per_key(payloads, key=lambda p: p[0]):
+            target.replace_day_postings(ds, net)
+
+    def all_items(payloads):
+        target.bulk_load_items(payloads[-1])
+
+    def snapshot(payloads):
+        for row in payloads:
+            target.append_ledger_snapshot(row)
+
+    return {
+        "upsert_summary": summary,
+        "save_ledger": ledger,
+        "set_ledger_balance": ledger_balance,
+        "append_ledger_log": ledger_log,
+        "write_settings": settings,
+        "write_rollups": rollups,
+        "replace_day_items": day_items,
+        "bulk_load_items": all_items,
+        "replace_day_postings": day_postings,
+        "append_ledger_snapshot": snapshot,
+    }
+
+
+class SyncWorker(threading.Thread):
+    """Daemon thread that drains the outbox through `handlers`.
+
+    `idle(force)`, if given, runs at most every `idle_every` seconds while nothing
+    is queued (offline-first mode pulls the Sheets data into the local mirror
+    there); `force` is True when the UI asked for it.
+    """
+
+    def __init__(self, outbox: Outbox, handlers: dict, idle=None, idle_every: float = IDLE_POLL):
+        super().__init__(name="hp-sync-worker", daemon=True)
+        self.outbox = outbox
+        self.handlers = handlers
+        self.idle = idle
+        self.idle_every = idle_every
+        self.failures = 0
+        self.last_sync = None
+        self.last_idle = None
+        self.idle_error = ""
+        self._idle_lock = threading.Lock()
+        self._wake = threading.Event()
+
+    def notify(self):
+        self._wake.set()
+
+    def backoff_delay(self) -> float:
+        if not self.failures:
+            return 0.0
+        delay = min(BACKOFF_CAP, BACKOFF_BASE * (2 ** (self.failures - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def drain_once(self) -> bool:
+        """Push one batch. Returns False if a group failed (the rest of the batch waits)."""
+        batch = self.outbox.head()
+        if not batch:
+            return True
+
+        # group by family; inside a family, consecutive entries of one kind form a run
+        families = {}
+        for i, kind, payload in batch:
+            runs = families.setdefault(FAMILIES.get(kind, kind), [])
+            if not runs or runs[-1][0] != kind:
+                runs.append((kind, [], []))
+            runs[-1][1].append(i)
+            runs[-1][2].append(payload)
+
+        for runs in families.values():
+            for kind, ids, payloads in runs:
+                handler = self.handlers.get(kind)
+                try:
+                    if handler is None:
+                        raise KeyError(f"no handler for outbox kind '{kind}'")
+                    handler(payloads)
+                except Exception as e:
+                    self.outbox.fail(ids, f"{type(e).__name__}: {e}")
+                    return False
+                self.outbox.ack(ids)
+        self.last_sync = time.time()
+        return True
+
+    def run_idle(self, force: bool = False):
+        """Run `idle(force)` if it is due (or `force`) and nothing is queued; also callable from the UI thread."""
+        if self.idle is None or self.outbox.counts()["pending"]:
+            return
+        with self._idle_lock:
+            if not force and self.last_idle is not None and time.time() - self.last_idle < self.idle_every:
+                return
+            try:
+                self.idle(force)
+                self.idle_error = ""
+            except Exception as e:
+                self.idle_error = f"{type(e).__name__}: {e}"
+            self.last_idle = time.time()
+
+    def run(self):
+        while True:
+            ok = self.drain_once()
+            self.failures = 0 if ok else self.failures + 1
+            if not ok:
+                time.sleep(self.backoff_delay())
+                continue
+            if self.outbox.counts()["pending"]:
+                continue
+            self.run_idle()
+            self._wake.wait(min(IDLE_POLL, self.idle_every) if self.idle else IDLE_POLL)
+            self._wake.clear()
+
+
+# =========================
+# WRITE-BEHIND BACKEND
+# =========================
+class WriteBehindBackend(StorageBackend):
+    """Reads and writes hit `local`; every write is also queued for the remote target."""
+
+    def __init__(self, local: StorageBackend, outbox: Outbox, worker: SyncWorker):
+        self.local = local
+        self.outbox = outbox
+        self.worker = worker
+        self.name = f"{local.name} → sheets (write-behind)"
+
+    @contextmanager
+    def _journal(self):
+        """Local write(s) plus their outbox entries: one transaction when the outbox is in the local store."""
+        with self.local.transaction():
+            yield
+        self.worker.notify()
+
+    def pending(self) -> dict:
+        return self.outbox.counts()
+
+    def read_settings(self) -> list[dict]:
+        return self.local.read_settings()
+
+    def read_settings_version(self) -> str | None:
+        return self.local.read_settings_version()
+
+    def write_settings(self, payload: list[list]):
+        with self._journal():
+            self.local.write_settings(payload)
+            self.outbox.put("write_settings", payload)
+
+    def fetch_summary(self, ds: str):
+        return self.local.fetch_summary(ds)
+
+    def upsert_summary(self, values: list) -> str:
+        with self._journal():
+            action = self.local.upsert_summary(values)
+            self.outbox.put("upsert_summary", values)
+        return action
+
+    def fetch_summary_range(self, start, end) -> list[dict]:
+        return self.local.fetch_summary_range(start, end)
+
+    def load_rollups(self, start_month: str, end_month: str) -> list[dict]:
+        return self.local.load_rollups(start_month, end_month)
+
+    def write_rollups(self, rows: list[list]):
+        with self._journal():
+            self.local.write_rollups(rows)
+            self.outbox.put("write_rollups", rows)
+
+    def replace_day_items(self, ds: str, items: dict):
+        with self._journal():
+            self.local.replace_day_items(ds, items)
+            self.outbox.put("replace_day_items", [ds, items])
+
+    def load_items(self, kind: str, start, end) -> list[dict]:
+        return self.local.load_items(kind, start, end)
+
+    def bulk_load_items(self, items: dict):
+        with self._journal():
+            self.local.bulk_load_items(items)
+            self.outbox.put("bulk_load_items", items)
+
+    def items_empty(self) -> bool:
+        return self.local.items_empty()
+
+    def load_ledger(self) -> list[dict]:
+        return self.local.load_ledger()
+
+    def get_ledger_balance(self, customer: str) -> float:
+        return self.local.get_ledger_balance(customer)
+
+    def get_ledger_balances(self, customers: list[str]) -> dict:
+        return self.local.get_ledger_balances(customers)
+
+    def set_ledger_balance(self, customer: str, outstanding: float):
+        with self._journal():
+            self.local.set_ledger_balance(customer, outstanding)
+            self.outbox.put("set_ledger_balance", [customer, outstanding])
+
+    def post_ledger_entries(self, entries: list[tuple[str, float]], log_row) -> list[tuple[float, float]]:
+        logs = []
+
+        def keep(i, before, after):
+            logs.append(log_row(i, before, after))
+            return logs[-1]
+
+        with self._journal():
+            results = self.local.post_ledger_entries(entries, keep)
+            final = {customer: after for (customer, _), (_, after) in zip(entries, results)}
+            for customer, outstanding in final.items():
+                self.outbox.put("set_ledger_balance", [customer, outstanding])
+            for row in logs:
+                self.outbox.put("append_ledger_log", row)
+        return results
+
+    def day_postings(self, ds: str) -> dict:
+        return self.local.day_postings(ds)
+
+    def replace_day_postings(self, ds: str, net: dict):
+        with self._journal():
+            self.local.replace_day_postings(ds, net)
+            self.outbox.put("replace_day_postings", [ds, net])
+
+    def load_postings(self) -> list[dict]:
+        return self.local.load_postings()
+
+    def post_day_ledger(self, ds: str, net: dict, log_row) -> list[tuple[str, float, float, float]]:
+        logs = []
+
+        def keep(*args):
+            logs.append(log_row(*args))
+            return logs[-1]
+
+        with self._journal():
+            results = self.local.post_day_ledger(ds, net, keep)
+            if not results:
+                return results
+            final = {customer: after for customer, _, _, after in results}
+            for customer, outstanding in final.items():
+                self.outbox.put("set_ledger_balance", [customer, outstanding])
+            for row in logs:
+                self.outbox.put("append_ledger_log", row)
+            self.outbox.put("replace_day_postings", [ds, net])
+        return results
+
+    def save_ledger(self, rows: list[list]):
+        with self._journal():
+            self.local.save_ledger(rows)
+            self.outbox.put("save_ledger", rows)
+
+    def append_ledger_log(self, row: list):
+        with self._journal():
+            self.local.append_ledger_log(row)
+            self.outbox.put("append_ledger_log", row)
+
+    def append_ledger_logs(self, rows: list[list]):
+        with self._journal():
+            self.local.append_ledger_logs(rows)
+            for row in rows:
+                self.outbox.put("append_ledger_log", row)
+
+    def load_ledger_logs(self) -> list[dict]:
+        return self.local.load_ledger_logs()
+
+    def ledger_log_page(self, offset: int = 0, limit: int = 500) -> tuple[list[dict], int]:
+        return self.local.ledger_log_page(offset, limit)
+
+    def ledger_log_for_customer(self, customer: str, limit: int | None = None) -> list[dict]:
+        return self.local.ledger_log_for_customer(customer, limit)
+
+    def load_ledger_events(self, after_seq: int = 0) -> list[tuple[int, dict]]:
+        return self.local.load_ledger_events(after_seq)
+
+    def load_ledger_snapshots(self) -> list[dict]:
+        return self.local.load_ledger_snapshots()
+
+    def append_ledger_snapshot(self, row: list):
+        with self._journal():
+            self.local.append_ledger_snapshot(row)
+            self.outbox.put("append_ledger_snapshot", row)
@@ -0,0 +1,35 @@
+"""Parquet Summary archive: month partitions round-trip with one schema and one row per date."""
+import os
+
+import pandas as pd
+
+from archive import TEXT_COLUMNS, SummaryArchive
+from storage import summary_headers
+
+
+def _row(ds: str, employee: str = "Ravi", total_sales=1000.0, **extra) -> dict:
+    row = {h: "" for h in summary_headers()}
+    row.update(date=ds, employee_name=employee, total_sales=total_sales, petrol_liters_sold="12.500", **extra)
+    return row
+
+
+def test_upserts_round_trip_across_partitions(tmp_path):
+    archive = SummaryArchive(str(tmp_path / "summary"), summary_headers())
+    archive.upsert(_row("2024-05-31", notes="end of month"))
+    archive.upsert(_row("2024-06-01", total_sales=2000.0))
+    archive.upsert(_row("2024-05-02", oil_packets=3))
+    archive.upsert(_row("2024-05-31", employee="Sita", total_sales=1500.5))   # the same day again
+
+    assert [os.path.basename(p) for p in archive.partitions()] == ["2024-05.parquet", "2024-06.parquet"]
+    df = archive.read_all()
+    assert df["date"].tolist() == ["2024-05-02", "2024-05-31", "2024-06-01"]
+    assert not df["date"].duplicated().any()
+    assert list(df.columns) == summary_headers()
+    for h in summary_headers():
+        typed = pd.api.types.is_string_dtype(df[h]) if h in TEXT_COLUMNS else df[h].dtype == "float64"
+        assert typed, h
+
+    day = df.set_index("date").loc["2024-05-31"]
+    assert (day["employee_name"], day["total_sales"], day["notes"]) == ("Sita", 1500.5, "")
+    assert df["petrol_liters_sold"].tolist() == [12.5] * 3
+    assert df["oil_packets"].iloc[0] == 3.0 and pd.isna(df["oil_packets"].iloc[1])
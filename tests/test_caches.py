@@ -0,0 +1,95 @@
+"""Process-wide caches: Settings expire on TTL and `_version` bumps, months on saves, worksheets on SCHEMA_VERSION."""
+from datetime import date
+
+import pytest
+
+import month_cache
+import settings_cache
+from month_cache import MonthCache
+from settings_cache import SettingsCache
+from sheets_io import WorksheetCache
+from storage import SCHEMA_VERSION
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(settings_cache.time, "monotonic", clock)
+    monkeypatch.setattr(month_cache.time, "monotonic", clock)
+    return clock
+
+
+def test_settings_are_served_until_the_ttl_then_reread_only_on_a_version_bump(clock):
+    sheet = {"settings": {"p_rate": 100.0}, "version": "v1"}
+    cache = SettingsCache(lambda: (dict(sheet["settings"]), sheet["version"]), lambda: sheet["version"], ttl=60)
+
+    assert cache.get() == {"p_rate": 100.0}
+    sheet["settings"] = {"p_rate": 101.0}   # edited without bumping `_version`
+    clock.now += 59
+    assert cache.get() == {"p_rate": 100.0} and cache.version_checks == 0
+
+    clock.now += 2   # past the TTL: the version cell is read, still v1
+    assert cache.get() == {"p_rate": 100.0}
+    assert (cache.loads, cache.version_checks) == (1, 1)
+
+    sheet["version"] = "v2"
+    clock.now += 30   # the check above restarted the TTL
+    assert cache.get() == {"p_rate": 100.0}
+    clock.now += 31
+    assert cache.get() == {"p_rate": 101.0}
+    assert (cache.loads, cache.version_checks, cache.version) == (2, 2, "v2")
+
+
+def test_a_save_drops_its_month_while_closed_months_stay_pinned(clock):
+    today = date.today()
+    open_month, closed = today.strftime("%Y-%m"), f"{today.year - 1}-04"
+    sheet = {open_month: "open v1", closed: "closed v1"}
+    cache = MonthCache(ttl=60)
+
+    def read(month):
+        return cache.get(month, lambda: sheet[month])
+
+    assert read(open_month) == "open v1" and read(closed) == "closed v1"
+    sheet[open_month], sheet[closed] = "open v2", "closed v2"   # edited straight in the sheet
+    clock.now += 61
+    assert read(open_month) == "open v2"      # the open month expires
+    assert read(closed) == "closed v1"        # a closed month never does
+
+    sheet[open_month] = "open v3"
+    cache.invalidate(open_month)              # what saving a day in it does
+    assert read(open_month) == "open v3"
+    assert read(closed) == "closed v1"
+    cache.invalidate(closed)
+    assert read(closed) == "closed v2"
+    assert cache.stats() == {"months": 2, "pinned": 1, "hits": 2, "loads": 5}
+
+
+def test_worksheets_are_reverified_when_schema_version_or_headers_change():
+    opened, verified = [], []
+    cache = WorksheetCache(SCHEMA_VERSION)
+
+    def get(headers=("Date", "Employee")):
+        return cache.get("Summary", list(headers), lambda name: opened.append(name) or name,
+                         lambda ws, h: verified.append(h))
+
+    get()
+    get()
+    assert (len(opened), cache.verifications) == (1, 1)
+
+    cache.schema_version = SCHEMA_VERSION + 1   # a release that changes a tab's layout
+    get()
+    get(["Date", "Employee", "Notes"])
+    assert (len(opened), cache.verifications) == (3, 3)
+    assert verified[-1] == ["Date", "Employee", "Notes"]
+
+    cache.forget("Summary")   # after a failed call
+    get(["Date", "Employee", "Notes"])
+    assert cache.verifications == 4
@@ -0,0 +1,56 @@
+"""Event-sourced ledger: seeded opening balances, balances as of a date, statements agreeing with them."""
+from datetime import date
+
+import pytest
+
+from ledger import LedgerProjection
+from storage import SQLiteBackend
+
+
+def _event(entry_date: str, customer: str, typ: str, amount: float) -> list:
+    return [f"{entry_date} 10:00:00", entry_date, typ, customer, amount, 0, 0, "test", ""]
+
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "hp_bunk.sqlite3"))
+    backend.append_ledger_logs([
+        _event("2024-05-01", "A", "CREDIT", 100.0),
+        _event("2024-05-10", "A", "PAYMENT", 30.0),
+        _event("2024-05-10", "B", "CREDIT", 50.0),
+        _event("2024-05-20", "A", "CREDIT", 5.0),
+    ])
+    return backend
+
+
+def test_seeded_openings_count_for_earlier_dates(backend):
+    proj = LedgerProjection(backend)
+    # the Ledger tab had A at 575 (500 owed before logging) and C, never logged, at 40
+    proj.seed({"A": 575.0, "B": 50.0, "C": 40.0})
+
+    assert proj.opening == {"A": 500.0, "C": 40.0}
+    assert proj.balance_as_of(date(2024, 4, 30)) == {"A": 500.0, "C": 40.0}
+    assert proj.balance_as_of(date(2024, 5, 10)) == {"A": 570.0, "B": 50.0, "C": 40.0}
+    assert proj.balance_as_of(date(2024, 5, 31)) == {"A": 575.0, "B": 50.0, "C": 40.0}
+
+    # a fresh process reads the same from Ledger_Snapshots
+    later = LedgerProjection(backend).refresh()
+    assert later.balances == {"A": 575.0, "B": 50.0, "C": 40.0}
+    assert later.balance_as_of(date(2024, 5, 5)) == {"A": 600.0, "C": 40.0}
+
+
+def test_statement_closing_equals_the_projection(backend):
+    proj = LedgerProjection(backend, snapshot_every=2)
+    proj.seed({"A": 575.0, "B": 50.0})
+    backend.append_ledger_logs([_event("2024-06-02", "B", "PAYMENT", 20.0), _event("2024-05-15", "A", "CREDIT", 1.0)])
+    proj.refresh()
+    proj.snapshot()
+
+    start, end = date(2024, 5, 5), date(2024, 5, 31)
+    statements = proj.statements(start, end)
+    assert statements["A"].opening == 600.0
+    assert statements["A"].closing == 576.0
+    for customer, st in statements.items():
+        assert st.opening == pytest.approx(proj.balance_as_of(date(2024, 5, 4)).get(customer, 0.0))
+        assert st.closing == pytest.approx(proj.balance_as_of(end).get(customer, 0.0))
+    assert [line["Type"] for line in statements["A"].lines] == ["PAYMENT", "CREDIT", "CREDIT"]
@@ -0,0 +1,118 @@
+"""Ledger compare-and-swap on SheetsBackend: concurrent posts, stale claims, the retry limit, compaction."""
+import random
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+import storage
+from fake_gspread import FakeSpreadsheet
+from storage import LEDGER_LOG_SHEET, LEDGER_SHEET, SheetsBackend, _num, ledger_headers, ledger_log_headers
+
+
+def _log_row(customer: str, delta: float, before: float, after: float) -> list:
+    now = datetime.now()
+    return [now.strftime("%Y-%m-%d %H:%M:%S"), now.strftime("%Y-%m-%d"), "CREDIT" if delta > 0 else "PAYMENT",
+            customer, abs(delta), before, after, "test", ""]
+
+
+def _sheet(jitter: float = 0.0) -> FakeSpreadsheet:
+    sh = FakeSpreadsheet(jitter=jitter, seed=3)
+    sh.add_worksheet(LEDGER_SHEET, ledger_headers())
+    sh.add_worksheet(LEDGER_LOG_SHEET, ledger_log_headers())
+    return sh
+
+
+def _backend(sh: FakeSpreadsheet) -> SheetsBackend:
+    return SheetsBackend(lambda name, headers: sh.worksheet(name), cas=True)
+
+
+def _post(backend: SheetsBackend, entries: list[tuple[str, float]]):
+    return backend.post_ledger_entries(entries, lambda i, before, after: _log_row(*entries[i], before, after))
+
+
+def _ledger(sh: FakeSpreadsheet) -> list[tuple[str, float]]:
+    return [(r["Customer"], _num(r["Outstanding"])) for r in _backend(sh).load_ledger()]
+
+
+@pytest.mark.parametrize("names", [["Customer 0", "Customer 1", "Customer 2"], ["New Guy"]])
+def test_concurrent_posts_lose_nothing(names):
+    sh = _sheet(jitter=0.002)
+    posted, lock = [], threading.Lock()
+    barrier = threading.Barrier(4)
+
+    def attendant(n: int):
+        rnd = random.Random(n)
+        backend = _backend(sh)   # own row indexes, like a separate app process
+        barrier.wait()
+        for _ in range(6):
+            entries = [(rnd.choice(names), round(rnd.uniform(-200, 500), 2))]
+            _post(backend, entries)
+            with lock:
+                posted.extend(entries)
+
+    workers = [threading.Thread(target=attendant, args=(n,)) for n in range(4)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+
+    ledger = _ledger(sh)
+    assert len(ledger) == len({c for c, _ in ledger}), "duplicate customer rows"
+    expected = {}
+    for c, d in posted:
+        expected[c] = round(expected.get(c, 0.0) + d, 2)
+    assert {c: round(v, 2) for c, v in ledger} == expected
+    assert len(_backend(sh).load_ledger_logs()) == len(posted)
+
+
+def test_stale_claim_is_taken_over_after_ttl():
+    sh = _sheet()
+    _post(_backend(sh), [("A", 100.0)])
+    # a writer claimed A's row and died before committing
+    dead = int(time.time() - storage.LEDGER_CLAIM_TTL - 5)
+    sh.worksheet(LEDGER_SHEET).rows[1][2] = f"1~{dead}~deadbeef"
+
+    _post(_backend(sh), [("A", 50.0)])
+    assert sh.worksheet(LEDGER_SHEET).rows[1][:3] == ["A", 150.0, "2"]
+
+
+def test_gives_up_after_the_retry_limit(monkeypatch):
+    monkeypatch.setattr(storage, "_backoff", lambda attempt: None)
+    sh = _sheet()
+    _post(_backend(sh), [("A", 100.0)])
+    held = f"1~{int(time.time())}~0123abcd"   # another writer's live claim
+    sh.worksheet(LEDGER_SHEET).rows[1][2] = held
+    sh.reset_calls()
+
+    with pytest.raises(RuntimeError, match="busy"):
+        _post(_backend(sh), [("A", 50.0)])
+    assert sh.worksheet(LEDGER_SHEET).rows[1][:3] == ["A", 100.0, held]
+    assert len(_backend(sh).load_ledger_logs()) == 1
+    assert not sh.reset_calls()["batch_update"]   # never wrote while the row was held
+
+
+def test_compaction_waits_for_a_claimed_row_and_moves_every_rev_on(monkeypatch):
+    monkeypatch.setattr(storage, "_backoff", lambda attempt: time.sleep(0.05))
+    sh = _sheet()
+    _post(_backend(sh), [("A", 100.0), ("B", 7.0)])
+    writer, claimed = _backend(sh), threading.Event()
+    claim = writer._claim
+
+    def slow_claim(targets):   # holds A's claim for a while before committing
+        got = claim(targets)
+        claimed.set()
+        time.sleep(0.2)
+        return got
+
+    writer._claim = slow_claim
+    posting = threading.Thread(target=_post, args=(writer, [("A", 50.0)]))
+    posting.start()
+    assert claimed.wait(5)
+    _backend(sh).save_ledger([["B", 7.0], ["A", 100.0]])   # moves A off the row being committed
+    posting.join()
+
+    rows = sh.worksheet(LEDGER_SHEET).rows
+    assert [r[:3] for r in rows[1:]] == [["B", 7.0, "3"], ["A", 100.0, "3"]]
+    assert _ledger(sh) == [("B", 7.0), ("A", 100.0)]
@@ -0,0 +1,96 @@
+"""Bulk ledger import: row validation, all-or-nothing batches, and one write per batch on Sheets."""
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from fake_gspread import FakeSpreadsheet
+from ledger_import import BULK_COLUMNS, post_batch, validate_bulk_transactions
+from storage import LEDGER_LOG_SHEET, LEDGER_SHEET, SheetsBackend, _num, ledger_headers, ledger_log_headers
+
+KNOWN = ["Ravi Transport", "Sita Stores"]
+
+
+def _grid(*rows) -> pd.DataFrame:
+    return pd.DataFrame([dict(zip(BULK_COLUMNS, r)) for r in rows], columns=BULK_COLUMNS)
+
+
+def _validate(*rows):
+    return validate_bulk_transactions(_grid(*rows), KNOWN, "Manoj")
+
+
+@pytest.mark.parametrize("row, problem", [
+    (("2024-13-01", "Ravi Transport", "CREDIT", "100"), "bad date"),
+    (("yesterday", "Ravi Transport", "CREDIT", "100"), "bad date"),
+    (("2024-05-01", "Ravi Transport", "REFUND", "100"), "type must be CREDIT or PAYMENT"),
+    (("2024-05-01", "Ravi Transport", "", "100"), "type must be CREDIT or PAYMENT"),
+    (("2024-05-01", "Ravi Transport", "PAYMENT", "0"), "amount must be > 0"),
+    (("2024-05-01", "Ravi Transport", "PAYMENT", "-50"), "amount must be > 0"),
+    (("2024-05-01", "Ravi Transport", "PAYMENT", "abc"), "amount must be > 0"),
+    (("2024-05-01", "Ravi Transport", "PAYMENT", "nan"), "amount must be > 0"),
+    (("2024-05-01", "", "CREDIT", "100"), "no customer"),
+    (("2024-05-01", "Nobody", "CREDIT", "100"), "unknown customer 'Nobody'"),
+])
+def test_invalid_rows_are_rejected_with_the_reason(row, problem):
+    txs, errors = _validate(row)
+    assert txs == [] and errors == [f"Row 1: {problem}"]
+
+
+def test_valid_rows_are_normalised():
+    txs, errors = _validate(
+        ("01-05-2024", " Ravi Transport ", "credit", "1,250.456", "", "diesel"),
+        ("", "", "", "", "", ""),   # blank grid rows are skipped
+        ("2024-5-2", "Sita Stores", "Payment received", "300", "Sita", ""),
+    )
+    assert errors == []
+    assert txs == [
+        {"date": date(2024, 5, 1), "customer": "Ravi Transport", "type": "CREDIT", "amount": 1250.46,
+         "employee": "Manoj", "notes": "diesel"},
+        {"date": date(2024, 5, 2), "customer": "Sita Stores", "type": "PAYMENT", "amount": 300.0,
+         "employee": "Sita", "notes": ""},
+    ]
+
+
+def test_one_invalid_row_rejects_the_whole_batch():
+    txs, errors = _validate(
+        ("2024-05-01", "Ravi Transport", "CREDIT", "100"),
+        ("2024-05-01", "Sita Stores", "CREDIT", "-5"),
+        ("2024-05-02", "Sita Stores", "PAYMENT", "40"),
+    )
+    assert txs == [] and errors == ["Row 2: amount must be > 0"]
+
+
+def _log_row(txs):
+    def log_row(i, before, after):
+        tx = txs[i]
+        return ["2024-05-02 10:00:00", tx["date"].isoformat(), tx["type"], tx["customer"], tx["amount"],
+                before, after, tx["employee"], tx["notes"]]
+    return log_row
+
+
+def test_a_valid_batch_posts_in_one_write():
+    sh = FakeSpreadsheet(seed=5)
+    sh.add_worksheet(LEDGER_SHEET, ledger_headers())
+    sh.add_worksheet(LEDGER_LOG_SHEET, ledger_log_headers())
+    backend = SheetsBackend(lambda name, headers: sh.worksheet(name))
+    backend.post_ledger_entries([("Ravi Transport", 500.0)], lambda i, before, after: [""] * len(ledger_log_headers()))
+    shown = pd.DataFrame([{"Customer": "Ravi Transport", "Outstanding": 500.0}])
+
+    txs, errors = _validate(
+        ("2024-05-01", "Ravi Transport", "CREDIT", "100"),
+        ("2024-05-01", "Sita Stores", "CREDIT", "250"),
+        ("2024-05-02", "Ravi Transport", "PAYMENT", "400"),
+        ("2024-05-02", "Sita Stores", "PAYMENT", "50"),
+    )
+    assert errors == []
+    sh.reset_calls()
+    new_df, results = post_batch(backend, shown, txs, _log_row(txs))
+
+    calls = sh.reset_calls()
+    assert calls["batch_update"] == 2   # the claim on both customers' rows, then every write at once
+    assert calls["values_batch_update"] == calls["append_rows"] == calls["update"] == 0
+    assert results == [(500.0, 600.0), (0.0, 250.0), (600.0, 200.0), (250.0, 200.0)]
+    assert new_df.values.tolist() == [["Ravi Transport", 200.0], ["Sita Stores", 200.0]]
+    assert {r["Customer"]: _num(r["Outstanding"]) for r in backend.load_ledger()} == {
+        "Ravi Transport": 200.0, "Sita Stores": 200.0}
+    assert [r["Balance_After"] for r in backend.load_ledger_logs()[-4:]] == [600, 250, 200, 200]
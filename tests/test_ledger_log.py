@@ -0,0 +1,74 @@
+"""Ledger_Log reads on SheetsBackend: pages from the tail and the per-customer row index (LogIndex)."""
+import pytest
+
+from fake_gspread import FakeSpreadsheet
+from storage import LEDGER_LOG_SHEET, SheetsBackend, ledger_log_headers
+
+
+def _row(n: int, customer: str) -> list:
+    return [f"2024-05-01 10:00:{n:02d}", "2024-05-01", "CREDIT", customer, n, 0, n, "test", f"#{n}"]
+
+
+@pytest.fixture
+def sh():
+    sh = FakeSpreadsheet()
+    ws = sh.add_worksheet(LEDGER_LOG_SHEET, ledger_log_headers())
+    ws.rows += [_row(n, "A" if n % 2 else "B") for n in range(1, 8)]   # A: 1 3 5 7, B: 2 4 6
+    return sh
+
+
+def _backend(sh, tmp_path=None) -> SheetsBackend:
+    return SheetsBackend(lambda name, headers: sh.worksheet(name), str(tmp_path) if tmp_path else None)
+
+
+def _reads(sh) -> int:
+    calls = sh.reset_calls()
+    return calls["batch_get"] + calls["get"]
+
+
+def _notes(rows: list[dict]) -> list[str]:
+    return [r["Notes"] for r in rows]
+
+
+def test_page_spanning_the_header_stops_at_the_first_row(sh):
+    backend = _backend(sh)
+    rows, total = backend.ledger_log_page(0, 3)
+    assert _notes(rows) == ["#7", "#6", "#5"] and total == 7
+
+    rows, total = backend.ledger_log_page(5, 3)   # rows 1..2 only, not the header
+    assert _notes(rows) == ["#2", "#1"] and total == 7
+    assert backend.ledger_log_page(7, 3) == ([], 7)
+
+
+def test_pages_catch_up_after_rows_are_appended(sh, tmp_path):
+    backend = _backend(sh, tmp_path)
+    backend.ledger_log_page(0, 3)
+    other = _backend(sh)   # another session appends
+    other.append_ledger_logs([_row(8, "B"), _row(9, "A")])
+
+    sh.reset_calls()
+    rows, total = backend.ledger_log_page(0, 3)
+    assert _notes(rows) == ["#9", "#8", "#7"] and total == 9
+    assert _reads(sh) == 2   # probe + the page re-read once new rows showed up
+
+    rows, _ = backend.ledger_log_page(0, 3)
+    assert _notes(rows) == ["#9", "#8", "#7"]
+    assert _reads(sh) == 1
+
+    # the index on disk is caught up too
+    assert _notes(_backend(sh, tmp_path).ledger_log_for_customer("B")) == ["#8", "#6", "#4", "#2"]
+
+
+def test_customer_rows_with_a_limit_are_the_newest(sh):
+    backend = _backend(sh)
+    assert _notes(backend.ledger_log_for_customer("A", limit=2)) == ["#7", "#5"]
+    assert _notes(backend.ledger_log_for_customer(" A ")) == ["#7", "#5", "#3", "#1"]
+    assert backend.ledger_log_for_customer("Nobody") == []
+
+
+def test_customer_rows_survive_a_hand_sort(sh):
+    backend = _backend(sh)
+    backend.ledger_log_for_customer("A")
+    ws = sh.worksheet(LEDGER_LOG_SHEET)
+    ws.rows[1:7] = sorted(ws.rows[1:7], key=lambda r: r[3])   # rows moved, the last one kept
+    assert _notes(backend.ledger_log_for_customer("A")) == ["#7", "#5", "#3", "#1"]
@@ -0,0 +1,145 @@
+"""Offline-first mirror: three-way pull, conflicts and their resolution, Ledger merges, incremental pulls."""
+from datetime import date, datetime
+
+import pytest
+
+from fake_gspread import FakeSpreadsheet
+from offline import Mirror, pull, resolve, versioned_handlers
+from storage import (
+    ITEM_KINDS, LEDGER_LOG_SHEET, LEDGER_SHEET, ROLLUP_SHEET, SETTINGS_SHEET, SUMMARY_SHEET, SQLiteBackend,
+    SheetsBackend, item_headers, ledger_headers, ledger_log_headers, rollup_headers, settings_headers,
+    summary_headers,
+)
+from sync import Outbox, SyncWorker, WriteBehindBackend
+
+OLD_DAY = "2024-05-01"
+
+
+def _summary(ds: str, employee: str = "Ravi", total_sales=100.0) -> list:
+    row = {"date": ds, "employee_name": employee, "total_sales": total_sales}
+    return [row.get(h, "") for h in summary_headers()]
+
+
+def _log_row(customer: str, delta: float, before: float, after: float) -> list:
+    return [datetime.now().strftime("%Y-%m-%d %H:%M:%S"), OLD_DAY, "CREDIT" if delta > 0 else "PAYMENT",
+            customer, abs(delta), before, after, "test", ""]
+
+
+class Setup:
+    def __init__(self, tmp_path):
+        sh = FakeSpreadsheet(seed=1)
+        for name, headers in [(SUMMARY_SHEET, summary_headers()), (LEDGER_SHEET, ledger_headers()),
+                              (LEDGER_LOG_SHEET, ledger_log_headers()), (ROLLUP_SHEET, rollup_headers()),
+                              (SETTINGS_SHEET, settings_headers())]:
+            sh.add_worksheet(name, headers)
+        for kind in ITEM_KINDS:
+            sh.add_worksheet(ITEM_KINDS[kind][0], item_headers(kind))
+        self.sh = sh
+        self.remote = SheetsBackend(lambda name, headers: sh.worksheet(name))
+        self.local = SQLiteBackend(str(tmp_path / "hp_bunk.sqlite3"))
+        self.mirror = Mirror(str(tmp_path / "mirror_state.sqlite3"))
+        outbox = Outbox(str(tmp_path / "outbox.sqlite3"), store=self.local)
+        handlers = versioned_handlers(self.remote, self.local, self.mirror)
+        self.backend = WriteBehindBackend(self.local, outbox, SyncWorker(outbox, handlers))
+
+    def pull(self, full: bool = False) -> dict:
+        return pull(self.remote, self.local, self.mirror, full=full)
+
+    def sync(self):
+        assert self.backend.worker.drain_once()
+
+    def post_remote(self, customer: str, delta: float):
+        self.remote.post_ledger_entry(customer, delta, lambda before, after: _log_row(customer, delta, before, after))
+
+    def post_local(self, customer: str, delta: float):
+        self.backend.post_ledger_entry(customer, delta, lambda before, after: _log_row(customer, delta, before, after))
+
+
+@pytest.fixture
+def s(tmp_path):
+    s = Setup(tmp_path)
+    s.remote.upsert_summary(_summary(OLD_DAY))
+    s.post_remote("A", 100.0)
+    s.pull()
+    return s
+
+
+def _employee(backend, ds: str = OLD_DAY) -> str:
+    return backend.fetch_summary(ds)[0]["employee_name"]
+
+
+def test_remote_only_edit_is_pulled(s):
+    s.remote.upsert_summary(_summary(OLD_DAY, "Sita", total_sales=150.0))
+    s.post_remote("A", 25.0)
+
+    taken = s.pull()
+    assert taken["summary"] == 1 and taken["ledger"] == 1 and taken["ledger_log"] == 1
+    assert _employee(s.local) == "Sita"
+    assert s.local.get_ledger_balance("A") == 125.0
+    assert s.mirror.counts() == {"open": 0, "merged": 0}
+
+
+def test_local_only_edit_survives_a_pull(s):
+    s.local.upsert_summary(_summary(OLD_DAY, "Manoj", total_sales=150.0))
+    s.local.set_ledger_balance("A", 130.0)
+
+    assert s.pull(full=True)["summary"] == 0
+    assert _employee(s.local) == "Manoj"
+    assert s.local.get_ledger_balance("A") == 130.0
+
+
+def test_both_sides_edited_records_a_conflict_that_resolve_applies(s):
+    s.backend.upsert_summary(_summary(OLD_DAY, "Manoj", total_sales=150.0))
+    s.remote.upsert_summary(_summary(OLD_DAY, "Sita", total_sales=120.0))
+
+    s.sync()   # the replay finds Sheets moved away from the base: parked, Sheets untouched
+    (conflict,) = s.mirror.conflicts()
+    assert conflict["tab"] == SUMMARY_SHEET and conflict["key"] == OLD_DAY
+    assert _employee(s.remote) == "Sita"
+
+    resolve(conflict, "mine", s.backend, s.mirror)
+    s.sync()
+    assert _employee(s.remote) == "Manoj"
+    assert s.mirror.conflicts() == []
+    assert s.pull()["summary"] == 0
+
+
+def test_keep_google_takes_the_sheets_row_locally(s):
+    s.local.upsert_summary(_summary(OLD_DAY, "Manoj", total_sales=150.0))
+    s.remote.upsert_summary(_summary(OLD_DAY, "Sita", total_sales=120.0))
+    s.pull()
+    (conflict,) = s.mirror.conflicts()
+
+    resolve(conflict, "theirs", s.backend, s.mirror)
+    assert _employee(s.local) == "Sita"
+    assert s.pull()["summary"] == 0 and s.mirror.conflicts() == []
+
+
+def test_ledger_edited_on_both_sides_is_merged_not_parked(s):
+    s.post_remote("A", 50.0)    # Sheets: 150
+    s.post_local("A", 30.0)     # local: 130, queued
+
+    s.sync()
+    assert s.remote.get_ledger_balance("A") == 180.0
+    assert s.local.get_ledger_balance("A") == 180.0
+    assert s.mirror.counts() == {"open": 0, "merged": 1}
+
+    s.pull()
+    assert s.local.get_ledger_balance("A") == 180.0
+    assert len(s.local.load_ledger_logs()) == len(s.remote.load_ledger_logs()) == 3
+
+
+def test_incremental_pull_skips_what_it_already_saw(s, monkeypatch):
+    months = []
+    fetch = s.remote.fetch_summary_range
+    monkeypatch.setattr(s.remote, "fetch_summary_range", lambda start, end: months.append(start) or fetch(start, end))
+
+    assert s.pull() == {"summary": 0, "ledger": 0, "ledger_log": 0, "settings": 0}
+    assert date.fromisoformat(OLD_DAY).replace(day=1) not in months   # its rollup row didn't change
+    assert len(s.local.load_ledger_logs()) == 1
+
+    # an edit that leaves an old month's sums alone is only seen by a full pull
+    s.remote.upsert_summary(_summary(OLD_DAY, "Sita"))
+    assert s.pull()["summary"] == 0
+    assert s.pull(full=True)["summary"] == 1
+    assert _employee(s.local) == "Sita"
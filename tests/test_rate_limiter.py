@@ -0,0 +1,112 @@
+"""Sheets RateLimiter on an injected clock: priority reserves, 429 backoff, bucket refill."""
+import threading
+import time
+
+import pytest
+
+import sheets_io
+from sheets_io import HIGH, LOW, NORMAL, CallStats, RateLimiter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class Response:
+    def __init__(self, headers=None):
+        self.status_code = 429
+        self.headers = headers or {}
+
+
+class QuotaError(Exception):
+    def __init__(self, headers=None):
+        super().__init__("429: Quota exceeded")
+        self.response = Response(headers)
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def _limiter(clock, per_minute: float = 60, **kwargs) -> RateLimiter:
+    return RateLimiter(per_minute, per_minute, clock=clock, sleep=clock.sleep, **kwargs)
+
+
+def _drain_to(limiter: RateLimiter, kind: str, tokens: int):
+    while limiter.headroom()[0 if kind == "read" else 1]["burst available"] > tokens:
+        assert limiter.acquire(kind, HIGH) == 0.0
+
+
+def _wait_until(cond):
+    deadline = time.monotonic() + 5
+    while not cond():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_low_waits_in_the_reserve_while_high_goes_through(clock):
+    limiter = _limiter(clock, per_minute=20)   # burst 10: LOW keeps 3 back, NORMAL 1, HIGH none
+    _drain_to(limiter, "read", 3)
+    waited = []
+    low = threading.Thread(target=lambda: waited.append(limiter.acquire("read", LOW)))
+    low.start()
+    _wait_until(lambda: limiter.waiting()["low"] == 1)
+
+    assert limiter.acquire("read", HIGH) == 0.0     # 3 -> 2 tokens, below LOW's reserve
+    assert limiter.acquire("read", NORMAL) == 0.0   # 2 -> 1, NORMAL's reserve
+    assert low.is_alive() and limiter.waiting()["low"] == 1
+
+    clock.now += 12   # 1 token per 3 s: back up to 5
+    assert limiter.acquire("read", HIGH) == 0.0     # 4 left, and the release wakes LOW: 4 - 1 >= 3
+    low.join(5)
+    assert waited == [12.0]
+    assert limiter.headroom()[0]["burst available"] == 3.0
+
+
+def test_a_429_empties_the_bucket_and_retries_after_backoff(clock, monkeypatch):
+    monkeypatch.setattr(sheets_io.random, "uniform", lambda a, b: b)
+    limiter = _limiter(clock)
+    answers = [QuotaError(), QuotaError({"Retry-After": "5"}), "ok"]
+
+    def batch_update():
+        answer = answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    with CallStats().action("daily_save"):
+        assert limiter.call("batch_update", batch_update) == "ok"
+    assert clock.slept == [1, 5.0]   # 2 ** 0, then the server's Retry-After
+    write = limiter.headroom()[1]
+    assert (write["429s"], write["retries"], write["calls"]) == (2, 2, 3)
+    assert write["burst available"] == 4.0   # emptied at the second 429, 5 s of refill, one taken
+
+
+def test_a_429_past_max_retries_is_raised(clock, monkeypatch):
+    monkeypatch.setattr(sheets_io.random, "uniform", lambda a, b: b)
+    limiter = _limiter(clock, max_retries=1)
+
+    def down():
+        raise QuotaError()
+
+    with CallStats().action("daily_save"), pytest.raises(QuotaError):
+        limiter.call("update", down)
+    assert len(clock.slept) == 1
+
+
+@pytest.mark.parametrize("per_minute, elapsed, tokens", [(60, 10, 10.0), (60, 100, 30.0), (120, 5, 10.0)])
+def test_buckets_refill_at_the_configured_rate_up_to_the_burst(clock, per_minute, elapsed, tokens):
+    limiter = _limiter(clock, per_minute)
+    _drain_to(limiter, "write", 0)
+    clock.now += elapsed
+    assert limiter.headroom()[1]["burst available"] == tokens
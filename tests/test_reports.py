@@ -0,0 +1,101 @@
+"""Range reports: financial-year and quarter bounds, month spans, range tables and rebuilt rollups."""
+import random
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+from reports import financial_year, fy_bounds, month_spans, quarter_bounds, range_table
+from storage import ROLLUP_FIELDS, SQLiteBackend, rebuild_rollups, summary_headers
+
+
+@pytest.mark.parametrize("d, fy", [
+    (date(2024, 3, 31), 2023),
+    (date(2024, 4, 1), 2024),
+    (date(2024, 12, 31), 2024),
+    (date(2025, 1, 1), 2024),
+    (date(2025, 3, 31), 2024),
+])
+def test_financial_year_starts_in_april(d, fy):
+    assert financial_year(d) == fy
+
+
+def test_fy_bounds_are_half_open():
+    assert fy_bounds(2024) == (date(2024, 4, 1), date(2025, 4, 1))
+
+
+@pytest.mark.parametrize("q, bounds", [
+    (1, (date(2024, 4, 1), date(2024, 7, 1))),
+    (2, (date(2024, 7, 1), date(2024, 10, 1))),
+    (3, (date(2024, 10, 1), date(2025, 1, 1))),   # ends on the calendar year boundary
+    (4, (date(2025, 1, 1), date(2025, 4, 1))),    # lies in the next calendar year
+])
+def test_quarter_bounds(q, bounds):
+    assert quarter_bounds(2024, q) == bounds
+
+
+@pytest.mark.parametrize("start, end, spans", [
+    (date(2024, 4, 1), date(2024, 6, 1), [
+        ("2024-04", date(2024, 4, 1), date(2024, 5, 1), True),
+        ("2024-05", date(2024, 5, 1), date(2024, 6, 1), True)]),
+    (date(2024, 4, 15), date(2024, 6, 10), [
+        ("2024-04", date(2024, 4, 15), date(2024, 5, 1), False),
+        ("2024-05", date(2024, 5, 1), date(2024, 6, 1), True),
+        ("2024-06", date(2024, 6, 1), date(2024, 6, 10), False)]),
+    (date(2024, 12, 20), date(2025, 1, 5), [
+        ("2024-12", date(2024, 12, 20), date(2025, 1, 1), False),
+        ("2025-01", date(2025, 1, 1), date(2025, 1, 5), False)]),
+    (date(2024, 5, 3), date(2024, 5, 9), [("2024-05", date(2024, 5, 3), date(2024, 5, 9), False)]),
+    (date(2024, 5, 3), date(2024, 5, 3), []),
+])
+def test_month_spans_cut_at_month_boundaries(start, end, spans):
+    assert month_spans(start, end) == spans
+
+
+def _summary_rows(start: date, days: int, seed: int = 11) -> list[dict]:
+    rnd = random.Random(seed)
+    out = []
+    for n in range(days):
+        row = {h: "" for h in summary_headers()}
+        row.update({f: round(rnd.uniform(0, 5000), 2) for f in ROLLUP_FIELDS})
+        row.update(date=(start + timedelta(days=n)).isoformat(), employee_name="Ravi", oil_packets=rnd.randint(0, 9))
+        out.append(row)
+    return out
+
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "hp_bunk.sqlite3"))
+    for row in _summary_rows(date(2024, 3, 20), 120):   # 2024-03-20 .. 2024-07-17
+        backend.upsert_summary([row[h] for h in summary_headers()])
+    return backend
+
+
+def _direct(backend, start: date, end: date) -> pd.DataFrame:
+    df = pd.DataFrame(backend.fetch_summary_range(start, end))
+    df["month"] = df["date"].str[:7]
+    return df.groupby("month")[ROLLUP_FIELDS].sum().astype(float).round(2)
+
+
+def test_rebuilt_rollups_match_a_direct_sum_of_summary(backend):
+    assert rebuild_rollups(backend) == 5
+    rollups = pd.DataFrame(backend.load_rollups("2024-01", "2024-12")).set_index("month")
+    assert rollups["days"].tolist() == [12, 30, 31, 30, 17]
+    pd.testing.assert_frame_equal(rollups[ROLLUP_FIELDS].astype(float), _direct(backend, date.min, date.max),
+                                  check_names=False)
+
+
+@pytest.mark.parametrize("start, end", [
+    (date(2024, 4, 1), date(2024, 7, 1)),     # whole months only
+    (date(2024, 3, 25), date(2024, 6, 12)),   # starts and ends mid-month
+    (date(2024, 5, 10), date(2024, 5, 20)),   # inside one month
+])
+def test_range_table_uses_rollups_for_whole_months_and_rows_for_the_rest(backend, start, end):
+    spans = month_spans(start, end)
+    whole = [m for m, _, _, full in spans if full]
+    rollups = [r for r in backend.load_rollups(whole[0], whole[-1]) if r["month"] in whole] if whole else []
+    partial = [r for _, lo, hi, full in spans if not full for r in backend.fetch_summary_range(lo, hi)]
+
+    table = range_table(rollups, partial).set_index("month")
+    assert table["days"].sum() == (end - start).days
+    pd.testing.assert_frame_equal(table[ROLLUP_FIELDS].round(2), _direct(backend, start, end), check_names=False)
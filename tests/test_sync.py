@@ -0,0 +1,123 @@
+"""Write-behind sync: a local write and its outbox entry are kept or lost together; the worker retries with backoff."""
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+import sync
+from storage import SQLiteBackend, ledger_log_headers, summary_headers
+from sync import Outbox, SyncWorker, WriteBehindBackend
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _summary(ds: str) -> list:
+    return [ds, "Ravi"] + [""] * (len(summary_headers()) - 2)
+
+
+def _backend(tmp_path, handlers=None):
+    local = SQLiteBackend(str(tmp_path / "hp_bunk.sqlite3"))
+    outbox = Outbox(str(tmp_path / "outbox.sqlite3"), store=local)
+    return WriteBehindBackend(local, outbox, SyncWorker(outbox, handlers or {}))
+
+
+# the child saves a day and dies: before the outbox entry is written, or after the save returned
+CHILD = textwrap.dedent("""
+    import os, sys
+    sys.path.insert(0, {root!r})
+    from storage import SQLiteBackend, summary_headers
+    from sync import Outbox, SyncWorker, WriteBehindBackend
+
+    local = SQLiteBackend({db!r})
+    outbox = Outbox({legacy!r}, store=local)
+    backend = WriteBehindBackend(local, outbox, SyncWorker(outbox, {{}}))
+    if {crash!r} == "before_outbox":
+        outbox.put = lambda kind, payload: os._exit(3)
+    backend.upsert_summary(["2024-05-01", "Ravi"] + [""] * (len(summary_headers()) - 2))
+    os._exit(3)
+""")
+
+
+@pytest.mark.parametrize("crash, kept", [("before_outbox", False), ("after_save", True)])
+def test_crash_keeps_save_and_outbox_entry_together(tmp_path, crash, kept):
+    db, legacy = str(tmp_path / "hp_bunk.sqlite3"), str(tmp_path / "outbox.sqlite3")
+    child = CHILD.format(root=ROOT, db=db, legacy=legacy, crash=crash)
+    assert subprocess.run([sys.executable, "-c", child]).returncode == 3
+
+    local = SQLiteBackend(db)
+    outbox = Outbox(legacy, store=local)
+    row, _ = local.fetch_summary("2024-05-01")
+    assert (row is not None) == kept
+    assert outbox.counts()["pending"] == (1 if kept else 0)
+
+
+def test_failed_outbox_entry_rolls_back_the_local_write(tmp_path):
+    backend = _backend(tmp_path)
+
+    def broken(kind, payload):
+        raise OSError("disk full")
+
+    backend.outbox.put = broken
+    with pytest.raises(OSError):
+        backend.post_ledger_entries([("A", 100.0)], lambda i, before, after: [""] * len(ledger_log_headers()))
+    assert backend.get_ledger_balance("A") == 0.0
+    assert backend.load_ledger_logs() == []
+
+
+def test_standalone_outbox_is_moved_into_the_store(tmp_path):
+    legacy = str(tmp_path / "outbox.sqlite3")
+    old = Outbox(legacy)
+    old.put("set_ledger_balance", ["A", 1.0])
+    old.put("set_ledger_balance", ["B", 2.0])
+    old._conn.close()
+
+    backend = _backend(tmp_path)
+    assert [(k, p) for _, k, p in backend.outbox.head()] == [
+        ("set_ledger_balance", ["A", 1.0]), ("set_ledger_balance", ["B", 2.0])]
+    assert not os.path.exists(legacy)
+
+
+def test_worker_retries_failed_batches_with_backoff(tmp_path, monkeypatch):
+    pushed, failures = [], [2]
+
+    def flaky(payloads):
+        if failures[0]:
+            failures[0] -= 1
+            raise ConnectionError("offline")
+        pushed.extend(payloads)
+
+    backend = _backend(tmp_path, {"set_ledger_balance": flaky})
+    worker = backend.worker
+    backend.set_ledger_balance("A", 10.0)
+    backend.set_ledger_balance("A", 20.0)
+
+    for _ in range(2):
+        assert not worker.drain_once()
+        worker.failures += 1
+        assert backend.pending()["pending"] == 2
+        assert "ConnectionError: offline" in backend.outbox.last_error()
+    monkeypatch.setattr(sync.random, "uniform", lambda a, b: b)
+    assert worker.backoff_delay() == sync.BACKOFF_BASE * 2
+    worker.failures = 50
+    assert worker.backoff_delay() == sync.BACKOFF_CAP
+
+    assert worker.drain_once()
+    assert pushed == [["A", 10.0], ["A", 20.0]]
+    assert backend.pending()["pending"] == 0
+
+
+def test_entries_past_max_attempts_are_parked_until_retried(tmp_path, monkeypatch):
+    monkeypatch.setattr(sync, "MAX_ATTEMPTS", 2)
+
+    def down(payloads):
+        raise ConnectionError("offline")
+
+    backend = _backend(tmp_path, {"upsert_summary": down})
+    backend.upsert_summary(_summary("2024-05-01"))
+    assert not backend.worker.drain_once()
+    assert not backend.worker.drain_once()
+    assert backend.pending() == {"pending": 0, "dead": 1}
+    assert backend.outbox.retry_dead() == 1
+    assert backend.pending()["pending"] == 1